@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import csv
+import sys
+import argparse
+import tracemalloc
+from wldata.wldata import WLData
+from wlhotfixmod.wlhotfixmod import Balance, BVC
+
+# Reports on how much memory our Balance/PartCategory/Part/BVC objects take
+# up when every balance from the gen_item_balances.py "long" CSVs is loaded
+# at once.  The serialized JSON gets loaded (and cached) in a first pass so
+# that we're only measuring the objects built by `Balance.from_data()`,
+# rather than WLData's own object cache.
+
+parser = argparse.ArgumentParser(
+        description='Reports memory usage of loading all known Balances',
+        )
+parser.add_argument('-t', '--top',
+        type=int,
+        default=10,
+        help='Number of top allocation sites to report',
+        )
+args = parser.parse_args()
+
+data = WLData()
+
+# Load a list of balances
+balance_names = []
+seen = set()
+for filename in sorted(os.listdir('.')):
+    if filename.endswith('_balances_long.csv'):
+        with open(filename) as df:
+            reader = csv.DictReader(df)
+            for row in reader:
+                if row['Balance'] not in seen:
+                    seen.add(row['Balance'])
+                    balance_names.append(row['Balance'])
+if not balance_names:
+    print('No *_balances_long.csv files found -- run gen_item_balances.py first')
+    sys.exit(1)
+
+# Warm up WLData's cache (and our shared-BVC cache)
+print('Warming up data cache with {} balances...'.format(len(balance_names)))
+for bal_name in balance_names:
+    Balance.from_data(data, bal_name)
+
+# Now the actual measurement
+tracemalloc.start()
+before = tracemalloc.take_snapshot()
+balances = [Balance.from_data(data, bal_name) for bal_name in balance_names]
+after = tracemalloc.take_snapshot()
+current, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+num_cats = 0
+num_parts = 0
+weights = set()
+for bal in balances:
+    for cat in bal.categories:
+        num_cats += 1
+        num_parts += len(cat)
+        for part in cat.partlist:
+            weights.add(id(part.weight))
+
+print('')
+print('Balances loaded: {}'.format(len(balances)))
+print('Categories: {}'.format(num_cats))
+print('Parts: {}'.format(num_parts))
+print('Distinct weight objects: {} (shared constant BVCs: {})'.format(len(weights), len(BVC._shared)))
+print('Memory retained: {:.2f} MiB (peak {:.2f} MiB)'.format(
+    current/1024/1024,
+    peak/1024/1024,
+    ))
+print('')
+print('Top allocation sites:')
+for stat in after.compare_to(before, 'lineno')[:args.top]:
+    print('  {}'.format(stat))
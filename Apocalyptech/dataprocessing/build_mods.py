@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import argparse
+from wlhotfixmod.modbuild import ModBuilder
+
+# Incrementally rebuilds mods: finds all the `gen_*.py` mod-generation scripts
+# underneath the given directory, and re-runs just the ones whose inputs
+# (their own source, the library code they use, or the game data they read)
+# have changed since their last successful build.  See `ModBuilder` for the
+# details.
+
+parser = argparse.ArgumentParser(
+        description='Incrementally rebuilds mods from their gen_*.py scripts',
+        )
+parser.add_argument('root',
+        nargs='?',
+        default='.',
+        help='Directory to search for gen_*.py scripts',
+        )
+parser.add_argument('-s', '--state',
+        type=str,
+        help='Build state file (defaults to .wlbuild_state.json inside the root dir)',
+        )
+parser.add_argument('-j', '--jobs',
+        type=int,
+        help='Number of scripts to run at once (defaults to the CPU count)',
+        )
+parser.add_argument('-f', '--force',
+        action='store_true',
+        help='Rebuild everything, even if it looks up to date',
+        )
+parser.add_argument('-n', '--dry-run',
+        action='store_true',
+        help="Only report what would be rebuilt, and why",
+        )
+args = parser.parse_args()
+
+if args.state is None:
+    args.state = os.path.join(args.root, '.wlbuild_state.json')
+
+builder = ModBuilder(args.state, jobs=args.jobs)
+scripts = builder.discover(args.root)
+
+if args.dry_run:
+    for script in scripts:
+        reason = builder.stale_reason(script)
+        if reason is not None:
+            print('{}: {}'.format(script, reason))
+    sys.exit(0)
+
+built, skipped, failed = builder.build(scripts, force=args.force)
+print('Built {}, skipped {} up-to-date, {} failed'.format(
+    len(built),
+    len(skipped),
+    len(failed),
+    ), file=sys.stderr)
+if failed:
+    sys.exit(1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import time
+import argparse
+from wldata.wldata import WLData
+from wldata.datadiff import DataDiff
+
+# Compares two extracted data roots (generally an old and new patch), and
+# reports which objects were added, removed, or changed.  Balances,
+# PartSets, ItemPools, and DataTables get a structured report of what
+# actually changed (part weights and the like), so we know which mods need
+# regenerating.  The old data root is the one from the wldata config file,
+# unless `--old` is specified.
+
+kinds = ['balance', 'partset', 'itempool', 'datatable', 'other']
+
+parser = argparse.ArgumentParser(
+        description='Reports differences between two patches of extracted data',
+        )
+parser.add_argument('-o', '--old',
+        type=str,
+        help='Old data root (defaults to the data_dir from the wldata config)',
+        )
+parser.add_argument('new',
+        type=str,
+        help='New data root',
+        )
+parser.add_argument('-b', '--base',
+        type=str,
+        default='/',
+        help='Only compare objects underneath this path (such as /Game/Gear)',
+        )
+parser.add_argument('-k', '--kind',
+        choices=kinds,
+        action='append',
+        help='Only report on changed objects of this kind (can be specified more than once)',
+        )
+parser.add_argument('-c', '--checksum',
+        action='store_true',
+        help='Compare file contents even if their sizes and modification times match',
+        )
+parser.add_argument('-j', '--jobs',
+        type=int,
+        help='Number of processes to use when comparing files (defaults to the CPU count)',
+        )
+parser.add_argument('-l', '--list',
+        action='store_true',
+        help='Only list changed objects, without the structured diffs',
+        )
+args = parser.parse_args()
+if args.kind:
+    report_kinds = set(args.kind)
+else:
+    report_kinds = set(kinds)
+
+old_data = WLData(data_dir=args.old)
+new_data = WLData(data_dir=args.new)
+diff = DataDiff(old_data, new_data, base=args.base, checksum=args.checksum, jobs=args.jobs)
+
+start_time = time.time()
+diff.find_changed_objects()
+print('Compared {} to {} in {:.1f}s: {} added, {} removed, {} changed'.format(
+    old_data.data_dir,
+    new_data.data_dir,
+    time.time()-start_time,
+    len(diff.added),
+    len(diff.removed),
+    len(diff.changed),
+    ), file=sys.stderr)
+
+for label, obj_names in [('Added', diff.added), ('Removed', diff.removed)]:
+    if obj_names:
+        print(label)
+        print('-'*len(label))
+        for obj_name in obj_names:
+            print(obj_name)
+        print('')
+
+if args.list:
+    if diff.changed:
+        print('Changed')
+        print('-------')
+        for obj_name in diff.changed:
+            print(obj_name)
+        print('')
+    sys.exit(0)
+
+# Structured diffs, grouped by kind
+by_kind = {kind: [] for kind in kinds}
+for obj_name in diff.changed:
+    kind, changes = diff.diff_object(obj_name)
+    by_kind[kind].append((obj_name, changes))
+
+for kind in kinds:
+    if kind not in report_kinds or not by_kind[kind]:
+        continue
+    label = 'Changed: {} ({})'.format(kind, len(by_kind[kind]))
+    print(label)
+    print('-'*len(label))
+    for obj_name, changes in by_kind[kind]:
+        print(obj_name)
+        for change in changes:
+            print(' - {}'.format(change))
+    print('')
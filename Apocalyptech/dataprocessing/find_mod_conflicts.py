@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+import argparse
+from wlhotfixmod.wlhotfixmod import Mod
+from wlhotfixmod.modconflicts import ModIndex
+
+# Finds hotfix conflicts between a bunch of mods: places where more than one
+# mod writes a different value to the same attribute.  Files/directories are
+# taken to be in load order (directories are searched recursively, and their
+# `.wlhotfix` files sorted by path).
+
+parser = argparse.ArgumentParser(
+        description='Reports hotfix conflicts between mod files',
+        )
+parser.add_argument('paths',
+        nargs='+',
+        help='Mod files and/or directories containing mod files, in load order',
+        )
+parser.add_argument('-j', '--jobs',
+        type=int,
+        help='Number of processes to use when parsing mods (defaults to the CPU count)',
+        )
+parser.add_argument('-v', '--values',
+        action='store_true',
+        help='Show the values written by each mod',
+        )
+parser.add_argument('-l', '--list',
+        action='store_true',
+        help='Only list conflicting objects/attributes, without load-order notes',
+        )
+args = parser.parse_args()
+
+index = ModIndex(jobs=args.jobs)
+start_time = time.time()
+for path in args.paths:
+    if os.path.isdir(path):
+        index.add_tree(path)
+    else:
+        index.add_files([path])
+conflicts = index.find_conflicts()
+print('Indexed {} hotfix targets from {} mods in {:.1f}s: {} conflicts'.format(
+    len(index.index),
+    len(index.files),
+    time.time()-start_time,
+    len(conflicts),
+    ), file=sys.stderr)
+for filename, error in index.errors.items():
+    print('ERROR reading {}: {}'.format(filename, error), file=sys.stderr)
+
+for conflict in conflicts:
+    if conflict.row_name is None:
+        label = '{}.{}'.format(conflict.obj_name, conflict.attr_name)
+    else:
+        label = '{} [{}] {}'.format(conflict.obj_name, conflict.row_name, conflict.attr_name)
+    print(label)
+    if args.list:
+        continue
+    print('-'*len(label))
+    for write in conflict.writes:
+        if write.attr_name == conflict.attr_name:
+            attr = ''
+        else:
+            attr = ' ({})'.format(write.attr_name)
+        print(' - {}:{} [{}]{}'.format(write.filename, write.lineno, Mod.TYPE[write.hf_type], attr))
+        if args.values:
+            if write.prev_val != '':
+                print('     if: {}'.format(write.prev_val))
+            print('    set: {}'.format(write.new_val))
+    for note in conflict.implications():
+        print(' * {}'.format(note))
+    print('')
@@ -18,12 +18,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import os
 import sys
-import csv
 import gzip
 import json
 from wldata.wldata import WLData
+from wldata.balancedb import BalanceDB
 from wlhotfixmod.wlhotfixmod import BVC
 
 # Getting a feel for which balances use what enchantment drop rate, just
@@ -33,6 +32,7 @@ from wlhotfixmod.wlhotfixmod import BVC
 # Anyway, results here basically only ever come up 1.0 or `Init_EnchantmentWeight`
 
 data = WLData()
+bdb = BalanceDB('item_balances.sqlite3')
 
 # Load name mapping
 with gzip.open('balance_name_mapping.json.gz') as df:
@@ -69,36 +69,32 @@ ignore = {
         'armor',
         }
 
-# Load a list of balances (the mapping is lowercase, so eh)
+# Loop through our balances (the mapping is lowercase, so eh)
 balances = set()
-for filename in sorted(os.listdir('.')):
-    if filename.endswith('_balances_long.csv'):
-        label = filename[:-18]
-        if label in ignore:
-            continue
-        with open(filename) as df:
-            reader = csv.DictReader(df)
-            for row in reader:
-                balance_name = row['Balance']
-                if balance_name not in balances:
-                    balances.add(balance_name)
-                    prefix = ''
-                    found_invbal = False
-                    balance = data.get_data(balance_name)
-                    for export in balance:
-                        if export['export_type'] == 'InventoryBalanceData':
-                            found_invbal = True
-                            if 'PartList' in export['RuntimeGenericPartList'] \
-                                    and type(export['RuntimeGenericPartList']['PartList']) == list \
-                                    and len(export['RuntimeGenericPartList']['PartList']) > 0:
-                                prefix = '(HAS PRE-FILLED) '
-                            break
-                    if not found_invbal:
-                        raise RuntimeError(f"Didn't find InvBal for {balance_name}")
-                    if balance_name not in enchantable:
-                        print('{}{} | {}'.format(
-                            prefix,
-                            name_map[balance_name.lower()],
-                            balance_name,
-                            ))
+for label in sorted([s.name for s in bdb.get_sheets()]):
+    if label in ignore:
+        continue
+    for balance_info in bdb.get_balances(label):
+        balance_name = balance_info.name
+        if balance_name not in balances:
+            balances.add(balance_name)
+            prefix = ''
+            found_invbal = False
+            balance = data.get_data(balance_name)
+            for export in balance:
+                if export['export_type'] == 'InventoryBalanceData':
+                    found_invbal = True
+                    if 'PartList' in export['RuntimeGenericPartList'] \
+                            and type(export['RuntimeGenericPartList']['PartList']) == list \
+                            and len(export['RuntimeGenericPartList']['PartList']) > 0:
+                        prefix = '(HAS PRE-FILLED) '
+                    break
+            if not found_invbal:
+                raise RuntimeError(f"Didn't find InvBal for {balance_name}")
+            if balance_name not in enchantable:
+                print('{}{} | {}'.format(
+                    prefix,
+                    name_map[balance_name.lower()],
+                    balance_name,
+                    ))
 
@@ -18,13 +18,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import os
 import sys
-import csv
 import gzip
 import json
 import argparse
 from wldata.wldata import WLData
+from wldata.balancedb import BalanceDB
 from wlhotfixmod.wlhotfixmod import BVC
 
 # Getting a feel for which balances use what enchantment drop rate, just
@@ -43,6 +42,7 @@ parser.add_argument('-b', '--balance',
 args = parser.parse_args()
 
 data = WLData()
+bdb = BalanceDB('item_balances.sqlite3')
 
 # Load name mapping
 with gzip.open('balance_name_mapping.json.gz') as df:
@@ -54,48 +54,44 @@ ignore = {
         'armor',
         }
 
-# Load a list of balances (the mapping is lowercase, so eh)
+# Loop through our balances (the mapping is lowercase, so eh)
 balances = set()
-for filename in sorted(os.listdir('.')):
-    if filename.endswith('_balances_long.csv'):
-        label = filename[:-18]
-        if label in ignore:
-            continue
-        with open(filename) as df:
-            print(label)
-            print('-'*len(label))
-            reader = csv.DictReader(df)
-            for row in reader:
-                balance_name = row['Balance']
-                if balance_name not in balances:
-                    balances.add(row['Balance'])
-                    #print(f'Processing {balance_name}...')
-                    name = name_map[balance_name.lower()]
-                    balance = data.get_data(balance_name)
-                    for export in balance:
-                        if export['export_type'] == 'InventoryBalanceData':
-                            report = '(no enchants?)'
-                            if 'RuntimeGenericPartList' in export:
-                                rgpl = export['RuntimeGenericPartList']
-                                if 'Enabled' in rgpl and not rgpl['Enabled']:
-                                    report = '(no enchants)'
-                                else:
-                                    weight = BVC.from_data_struct(rgpl['Weight'])
-                                    if weight.ai != 'None':
-                                        report = weight.ai.rsplit('/', 1)[-1]
-                                    else:
-                                        report = weight.bvc
-                                    if weight.bvs != 1:
-                                        report += f' * {weight.bvs}'
-                                if 'PartList' in rgpl \
-                                        and type(rgpl['PartList']) == list \
-                                        and len(rgpl['PartList']) > 0:
-                                    prefix = '(HAS PRE-FILLED: {}) '.format(len(rgpl['PartList']))
-                                else:
-                                    prefix = ''
-                            if args.balance:
-                                print(f'{prefix}{name} - {report} | {balance_name}')
+for label in sorted([s.name for s in bdb.get_sheets()]):
+    if label in ignore:
+        continue
+    print(label)
+    print('-'*len(label))
+    for balance_info in bdb.get_balances(label):
+        balance_name = balance_info.name
+        if balance_name not in balances:
+            balances.add(balance_name)
+            #print(f'Processing {balance_name}...')
+            name = name_map[balance_name.lower()]
+            balance = data.get_data(balance_name)
+            for export in balance:
+                if export['export_type'] == 'InventoryBalanceData':
+                    report = '(no enchants?)'
+                    if 'RuntimeGenericPartList' in export:
+                        rgpl = export['RuntimeGenericPartList']
+                        if 'Enabled' in rgpl and not rgpl['Enabled']:
+                            report = '(no enchants)'
+                        else:
+                            weight = BVC.from_data_struct(rgpl['Weight'])
+                            if weight.ai != 'None':
+                                report = weight.ai.rsplit('/', 1)[-1]
                             else:
-                                print(f'{prefix}{name} - {report}')
-            print('')
+                                report = weight.bvc
+                            if weight.bvs != 1:
+                                report += f' * {weight.bvs}'
+                        if 'PartList' in rgpl \
+                                and type(rgpl['PartList']) == list \
+                                and len(rgpl['PartList']) > 0:
+                            prefix = '(HAS PRE-FILLED: {}) '.format(len(rgpl['PartList']))
+                        else:
+                            prefix = ''
+                    if args.balance:
+                        print(f'{prefix}{name} - {report} | {balance_name}')
+                    else:
+                        print(f'{prefix}{name} - {report}')
+    print('')
 
@@ -18,26 +18,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import csv
 import json
 import gzip
+from wldata.balancedb import BalanceDB
 
 # Generating a mapping of balance name to english label, for use in
 # ttwl-cli-saveedit.  I basically already did this for my Balance
 # spreadsheets, so I may as well just reuse that data.  Note that we're
-# now using an alternate CSV export from my balance-sheet-generation
-# which uses full object paths -- BL3 had two artifacts with the same
-# "short" name, so we're protecting for that here, too.
+# using the balance database from my balance-sheet-generation, which uses
+# full object paths -- BL3 had two artifacts with the same "short" name,
+# so we're protecting for that here, too.
 
 output_file = 'balance_name_mapping.json.gz'
-files = [
-        'amulet_balances_long.csv',
-        'armor_balances_long.csv',
-        'gun_balances_long.csv',
-        'melee_balances_long.csv',
-        'ring_balances_long.csv',
-        'spell_balances_long.csv',
-        'ward_balances_long.csv',
+bdb = BalanceDB('item_balances.sqlite3')
+sheets = [
+        'amulet',
+        'armor',
+        'gun',
+        'melee',
+        'ring',
+        'spell',
+        'ward',
         ]
 
 rarity_map = {
@@ -69,67 +70,62 @@ mapping = {}
 #        }.items():
 #    mapping[k.lower()] = v
 
-# Now loop through our CSVs and pull out the info.
-for filename in files:
-    with open(filename) as df:
-        reader = csv.DictReader(df)
-
-        # First get some info about the file
-        label_col = 'Type/Name'
-        item_type_col = None
-        item_type = None
-        trim_type = False
-        if 'gun' in filename:
-            label_col = 'Manufacturer/Name'
-            item_type_col = 'Gun Type'
-            trim_type = True
-        elif 'melee' in filename:
-            item_type_col = 'Melee Type'
-        elif 'ward' in filename:
-            label_col = 'Manufacturer/Name'
-            item_type = 'Ward'
-        elif 'amulet' in filename:
-            item_type = 'Amulet'
-        elif 'ring' in filename:
-            item_type = 'Ring'
-        elif 'spell' in filename:
-            item_type = 'Spell'
-        elif 'armor' in filename:
-            item_type = 'Armor'
+# Now loop through our balances and pull out the info.
+for sheet in sheets:
+
+    # First get some info about the sheet
+    use_item_type_col = False
+    item_type = None
+    trim_type = False
+    if sheet == 'gun':
+        use_item_type_col = True
+        trim_type = True
+    elif sheet == 'melee':
+        use_item_type_col = True
+    elif sheet == 'ward':
+        item_type = 'Ward'
+    elif sheet == 'amulet':
+        item_type = 'Amulet'
+    elif sheet == 'ring':
+        item_type = 'Ring'
+    elif sheet == 'spell':
+        item_type = 'Spell'
+    elif sheet == 'armor':
+        item_type = 'Armor'
+    else:
+        raise RuntimeError('Unknown manufacturer-based type')
+
+    for balance_info in bdb.get_balances(sheet):
+
+        # Get our item type
+        if not use_item_type_col:
+            row_item_type = item_type
         else:
-            raise RuntimeError('Unknown manufacturer-based type')
-
-        for row in reader:
-
-            # Get our item type
-            if item_type_col is None:
-                row_item_type = item_type
-            else:
-                # TODO: ??? @ -1 index here
-                #row_item_type = row[item_type_col][:-1]
-                row_item_type = row[item_type_col]
-                if trim_type:
-                    row_item_type = row_item_type[:-1]
-
-            # Pull some other info out
-            balance = row['Balance'].lower()
-            rarity = row['Rarity'].lower()
-
-            # Full label
-            if rarity.startswith('named '):
-                label = row[label_col]
+            # TODO: ??? @ -1 index here
+            #row_item_type = balance_info.gear_type[:-1]
+            row_item_type = balance_info.gear_type
+            if trim_type:
+                row_item_type = row_item_type[:-1]
+
+        # Pull some other info out
+        balance = balance_info.name.lower()
+        rarity = balance_info.rarity.lower()
+
+        # Full label
+        if rarity.startswith('named '):
+            label = balance_info.manufacturer
+        else:
+            if balance_info.manufacturer == 'Generic':
+                middle = ''
             else:
-                if row[label_col] == 'Generic':
-                    middle = ''
-                else:
-                    middle = ' {}'.format(row[label_col])
-                label = '{}{} {}'.format(
-                        rarity_map[rarity],
-                        middle,
-                        row_item_type,
-                        )
-
-            mapping[balance] = label
+                middle = ' {}'.format(balance_info.manufacturer)
+            label = '{}{} {}'.format(
+                    rarity_map[rarity],
+                    middle,
+                    row_item_type,
+                    )
+
+        mapping[balance] = label
 
 # Write out
 with gzip.open(output_file, 'wt') as df:
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import argparse
+import multiprocessing
+from wldata.wldata import WLData
+from wldata.bpchar import BPChar
+from wldata.dropdb import DropDB
+from wldata.poolprobs import PoolProbabilities
+
+# Generates an SQLite database of every enemy's drops, using the same
+# SpawnOption/BPChar resolution as `get_boss_drops.py`, but without any of its
+# filtering of "ordinary" world-drop pools.  Every pool is flattened down to
+# the Balances it can produce, along with their drop probabilities.  See
+# `wldata.dropdb` for how to query the result.
+#
+# BPChars are processed in parallel (each worker process keeps its own BPChar
+# cache); the pools they reference are then flattened once each, in the main
+# process, with a single shared `PoolProbabilities` cache.
+
+parser = argparse.ArgumentParser(
+        description='Generates an SQLite database of enemy drops',
+        )
+parser.add_argument('-o', '--output',
+        type=str,
+        default='enemy_drops.sqlite3',
+        help='Filename to write the database to',
+        )
+parser.add_argument('-j', '--jobs',
+        type=int,
+        default=1,
+        help="""Number of worker processes to use when processing characters.
+            Output is identical regardless of how many are used.""",
+        )
+args = parser.parse_args()
+jobs = max(1, args.jobs)
+
+data = WLData()
+
+# Playthroughs to report on
+playthroughs = [0, 1]
+
+# Per-process caches
+bpchar_cache = {}
+name_cache = {}
+
+def init_worker():
+    """
+    Initializer for our worker processes, when running with `--jobs`.  Each
+    worker gets its own WLData object rather than sharing the parent's.
+    """
+    global data
+    data = WLData()
+
+def get_uiname(uiname_obj):
+    """
+    Resolves the UI name object `uiname_obj` into a string
+    """
+    if uiname_obj is None:
+        return None
+    if uiname_obj not in name_cache:
+        uiname_data = data.get_data(uiname_obj)[0]
+        if 'DisplayName' in uiname_data and 'string' in uiname_data['DisplayName']:
+            name_cache[uiname_obj] = uiname_data['DisplayName']['string']
+        else:
+            name_cache[uiname_obj] = f'(invalid uiname: {uiname_obj})'
+    return name_cache[uiname_obj]
+
+def get_bpchar(bpchar_name):
+    """
+    Returns a (cached) BPChar object for `bpchar_name`
+    """
+    if bpchar_name not in bpchar_cache:
+        bpchar_cache[bpchar_name] = BPChar(data, bpchar_name, bpchar_cache)
+    return bpchar_cache[bpchar_name]
+
+def entry_probability(entry):
+    """
+    Returns the combined PoolProbability and NumberOfTimesToSelectFromThisPool
+    for the ItemPoolListEntry `entry`, or `None` if it can't be computed.
+    """
+    try:
+        return data.process_bvc(entry.probability)*data.process_bvc(entry.num)
+    except Exception:
+        return None
+
+def get_sources(bpchar, so_name=None, so_pool=None, so_pool_additive=True, so_uiname=None):
+    """
+    Returns a list of drop sources for `bpchar`, one per playthrough, as
+    spawned by the SpawnOption `so_name` (if any), which might specify its
+    own extra pool and UI name.  Each source is a tuple of `(character,
+    spawn_option, playthrough, uiname, pools)`, where `pools` is a list of
+    `(pool_name, probability)` tuples.  Sources which don't drop anything
+    are omitted.
+    """
+    sources = []
+    for pt in playthroughs:
+        pools = [(e.pool_name, entry_probability(e)) for e in bpchar.get_pool_entries(pt)]
+        if so_pool is not None:
+            # As with get_boss_drops.py, assume that a non-additive pool only
+            # replaces the ItemPools, not the ItemPoolLists
+            if so_pool_additive:
+                pools.append((so_pool, 1))
+            else:
+                pools = [(so_pool, 1)]
+        pools.extend([(pool_list, 1) for pool_list in bpchar.get_pool_lists(pt)])
+        if not pools:
+            continue
+        if so_uiname is None:
+            uiname = get_uiname(bpchar.get_uiname(pt))
+        else:
+            uiname = get_uiname(so_uiname)
+        sources.append((bpchar.path, so_name, pt, uiname, pools))
+    return sources
+
+def process_spawn_options(so_names):
+    """
+    Processes a chunk of SpawnOption objects.  Returns a tuple: the first
+    element is a list of drop sources (see `get_sources`), and the second is
+    the set of BPChar names we loaded along the way (including `OwnerClass`
+    BPChars).
+    """
+    sources = []
+    for so_name in so_names:
+        so = data.get_data(so_name)
+        if not so:
+            continue
+        for so_export in so:
+            if so_export['export_type'] != 'SpawnOptionData':
+                continue
+            if 'Options' not in so_export or type(so_export['Options']) != list:
+                continue
+            for option in so_export['Options']:
+                if 'Factory' not in option \
+                        or '_jwp_export_dst_type' not in option['Factory'] \
+                        or not option['Factory']['_jwp_export_dst_type'].endswith('OakAI'):
+                    continue
+                factory = so[option['Factory']['export']-1]
+                if 'AIActorClass' not in factory or 'asset_path_name' not in factory['AIActorClass']:
+                    continue
+                bpchar_name = factory['AIActorClass']['asset_path_name'].rsplit('.', 1)[0]
+                so_pool = None
+                if 'ItemPoolToDropOnDeath' in factory and 'export' not in factory['ItemPoolToDropOnDeath']:
+                    so_pool = factory['ItemPoolToDropOnDeath'][1]
+                so_pool_additive = factory.get('ItemPoolToDropOnDeathAdditive', True)
+                so_uiname = None
+                if 'UINameOverride' in factory and 'export' not in factory['UINameOverride']:
+                    so_uiname = factory['UINameOverride'][1]
+                sources.extend(get_sources(get_bpchar(bpchar_name),
+                    so_name=so_name,
+                    so_pool=so_pool,
+                    so_pool_additive=so_pool_additive,
+                    so_uiname=so_uiname,
+                    ))
+    return (sources, set(bpchar_cache.keys()))
+
+def process_bpchars(bpchar_names):
+    """
+    Processes a chunk of BPChars which aren't referenced by any SpawnOption.
+    Returns a list of drop sources (see `get_sources`).
+    """
+    sources = []
+    for bpchar_name in bpchar_names:
+        sources.extend(get_sources(get_bpchar(bpchar_name)))
+    return sources
+
+def run_chunks(func, items, chunk_size=50):
+    """
+    Runs `func` over chunks of `items`, using our worker pool if we have one.
+    Results are returned in order.
+    """
+    chunks = [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+    if pool is None:
+        return [func(chunk) for chunk in chunks]
+    else:
+        return pool.map(func, chunks)
+
+# Set up our worker pool, if we've been told to use one.  As with
+# gen_item_balances.py, this relies on the `fork` start method.
+if jobs > 1:
+    pool = multiprocessing.get_context('fork').Pool(jobs, initializer=init_worker)
+else:
+    pool = None
+
+# First up: all SpawnOption objects.
+start_time = time.time()
+so_names = sorted(set(data.find('/', 'SpawnOption')) | set(data.find('/', 'Spawn_')))
+print('Processing {} SpawnOption objects...'.format(len(so_names)))
+sources = []
+seen_bpchars = set()
+for chunk_sources, chunk_bpchars in run_chunks(process_spawn_options, so_names):
+    sources.extend(chunk_sources)
+    seen_bpchars |= chunk_bpchars
+
+# Then any BPChars which didn't show up in there.
+bpchar_names = sorted(set(data.find('/', 'BPChar_')) - seen_bpchars)
+print('Processing {} other BPChars...'.format(len(bpchar_names)))
+for chunk_sources in run_chunks(process_bpchars, bpchar_names):
+    sources.extend(chunk_sources)
+
+if pool is not None:
+    pool.close()
+    pool.join()
+
+# Now flatten all the pools we found.
+pool_names = sorted(set(pool_name for source in sources for pool_name, prob in source[4]))
+print('Flattening {} pools...'.format(len(pool_names)))
+pools = PoolProbabilities(data)
+flattened = {}
+for pool_name in pool_names:
+    try:
+        flattened[pool_name] = pools.get(pool_name)
+    except Exception as e:
+        print('WARNING: Could not process {}: {}'.format(pool_name, e))
+
+# And write everything out
+db = DropDB(args.output, create=True)
+for character, spawn_option, pt, uiname, source_pools in sources:
+    db.add_source(character, spawn_option, pt, uiname, source_pools)
+for pool_name, pool_flattened in flattened.items():
+    db.add_pool(pool_name, pool_flattened)
+db.close()
+
+print('Wrote {} sources ({} pools) to {} in {:.1f}s'.format(
+    len(sources),
+    len(flattened),
+    args.output,
+    time.time() - start_time,
+    ))
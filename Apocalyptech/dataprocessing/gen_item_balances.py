@@ -21,9 +21,12 @@
 import re
 import sys
 import csv
+import time
 import argparse
+import multiprocessing
 import xlsxwriter
 from wldata.wldata import WLData
+from wldata.balancedb import BalanceDB
 from wlhotfixmod.wlhotfixmod import Balance
 
 # Data generated by this script lives online at:
@@ -36,8 +39,15 @@ parser.add_argument('-v', '--verbose',
         action='store_true',
         help='Display verbose output while generating',
         )
+parser.add_argument('-j', '--jobs',
+        type=int,
+        default=1,
+        help="""Number of worker processes to use when processing balances.
+            Output is identical regardless of how many are used.""",
+        )
 args = parser.parse_args()
 verbose = args.verbose
+jobs = max(1, args.jobs)
 
 data = WLData()
 
@@ -526,9 +536,13 @@ for (aname, aobj) in [
         aobj,
         ))
 
-# Write out to an Excel file as well!
+# Write out to an Excel file as well!  This uses xlsxwriter's `constant_memory`
+# mode, which flushes each row out to disk as soon as we move on to the next
+# one, so memory usage stays flat regardless of how many balances we process.
+# The catch is that every sheet (including "About") has to be written strictly
+# in row order; anything written to an earlier row gets silently dropped.
 xlsx_filename = 'item_balances.xlsx'
-wb = xlsxwriter.Workbook(xlsx_filename)
+wb = xlsxwriter.Workbook(xlsx_filename, {'constant_memory': True})
 header_format = wb.add_format({
     'bold': True,
     'align': 'center',
@@ -566,6 +580,13 @@ infoblock_bold_format = wb.add_format({
     })
 
 class BlockRange:
+    """
+    A bordered, colored block of cells on a worksheet.  Since our workbook is
+    in `constant_memory` mode, cells have to be written in row order: the
+    formatted blank cells for each row are only written out once we've moved
+    on to a later row (or on `close()`), skipping any cells which have been
+    written to in the meantime.
+    """
 
     def __init__(self, wb, ws, row, col, last_row, last_col, bg_color, border_color, border_style=5):
         self.cells = {}
@@ -575,6 +596,8 @@ class BlockRange:
         self.col = col
         self.last_row = last_row
         self.last_col = last_col
+        self.next_row = row
+        self.filled = set()
         height = last_row-row+1
         width = last_col-col+1
         for y in range(height):
@@ -599,7 +622,17 @@ class BlockRange:
                 if y+1 == height:
                     fmt['bottom'] = border_style
                     fmt['bottom_color'] = border_color
-                ws.write_blank(this_row, this_col, None, wb.add_format(fmt))
+
+    def _finish_rows(self, row):
+        """
+        Writes out the formatted blank cells for all rows before `row` which
+        we haven't finished yet.
+        """
+        while self.next_row < row:
+            for this_col, fmt in self.cells[self.next_row].items():
+                if (self.next_row, this_col) not in self.filled:
+                    self.ws.write_blank(self.next_row, this_col, None, self.wb.add_format(fmt))
+            self.next_row += 1
 
     def style(self, row, col, new_params):
         new_fmt = dict(self.cells[row][col])
@@ -607,16 +640,20 @@ class BlockRange:
         return self.wb.add_format(new_fmt)
 
     def write(self, row, col, data, new_params=None):
+        self._finish_rows(row)
+        self.filled.add((row, col))
         if new_params:
             self.ws.write(row, col, data, self.style(row, col, new_params))
         else:
             self.ws.write(row, col, data)
 
     def merge(self, row, col, last_row, last_col, data, new_params=None):
+        self._finish_rows(row)
         cur_fmt = {}
         for y in range(row, last_row+1):
             for x in range(col, last_col+1):
                 cur_fmt.update(self.cells[y][x])
+                self.filled.add((y, x))
         if new_params:
             cur_fmt.update(new_params)
         self.ws.merge_range(row, col, last_row, last_col, data, self.wb.add_format(cur_fmt))
@@ -624,15 +661,19 @@ class BlockRange:
     def merge_row(self, row, data, new_params=None):
         self.merge(row, self.col, row, self.last_col, data, new_params)
 
+    def close(self):
+        self._finish_rows(self.last_row+1)
+
 # "About" page
 block_width = 10
 block_col = 1
 block_end_col = block_col + block_width - 1
 ws = wb.add_worksheet('About')
-ws.write(1, 1, 'About This Sheet')
 ws.set_column(1, block_width, 15)
 
-# Info Block
+# Info Block.  This is a single tall row rather than a merge across multiple
+# rows, since the rich text has to be written into the merged cell afterwards,
+# and `constant_memory` mode won't let us go back to an earlier row.
 info_row = 1
 info_height = 16
 info_paragraphs = [
@@ -670,14 +711,15 @@ info_paragraphs = [
         and excluders.""",
 
         ]
-ws.merge_range(info_row, block_col, info_row+info_height-1, block_end_col, '', infoblock_format)
+ws.set_row(info_row, info_height*15)
+ws.merge_range(info_row, block_col, info_row, block_end_col, '', infoblock_format)
 ws.write_rich_string(info_row, block_col,
         infoblock_bold_format, 'About This Sheet',
         infoblock_format, "\n\n",
         infoblock_format, "\n\n".join([' '.join(p.split()) for p in info_paragraphs]),
         infoblock_format,
         )
-cur_row = info_row+info_height+1
+cur_row = info_row+2
 
 # URL Block
 url_paragraphs = [
@@ -699,6 +741,7 @@ for text, url in url_paragraphs:
     br.merge_row(cur_row, ' '.join(text.split()))
     br.merge_row(cur_row+1, url, {'indent': 2})
     cur_row += 3
+br.close()
 cur_row += 1
 
 # Changelog
@@ -752,6 +795,7 @@ for date, changes in changelog:
     for change in changes:
         br.merge(cur_row, block_col+1, cur_row, block_end_col, f' - {change}')
         cur_row += 1
+br.close()
 cur_row += 2
 
 # Wonderlands is *in general* pretty good about using DataTables for defining
@@ -836,9 +880,300 @@ def early_bloomer_check(data, export):
     else:
         return False
 
+# Parts we've already done Early Bloomer reporting for
+early_bloomer_parts = set()
+
+def init_worker():
+    """
+    Initializer for our worker processes, when running with `--jobs`.  Each
+    worker gets its own WLData object rather than sharing the parent's.
+    """
+    global data
+    data = WLData()
+
+def process_balance(balance_info):
+    """
+    Processes a single balance, given `balance_info` as a tuple of
+    `(manufacturer, gun_type, rarity, bal_name, type_col_name)`.  Returns a
+    tuple: the first element is a list of rows to write out, each of which is
+    a tuple of `(datarow, datarow_long, dependencies, excluders)`, where the
+    last two are sorted lists of full part names.  The second element is a list of
+    any messages we should report to the user, so that output from worker
+    processes gets reported in a consistent order.
+    """
+    global data
+    global early_bloomer_parts
+
+    manufacturer, gun_type, rarity, bal_name, type_col_name = balance_info
+    rows = []
+    messages = []
+
+    if verbose:
+        print(f'Balance: {bal_name}')
+
+    # Grab a Balance object
+    bal = Balance.from_data(data, bal_name)
+
+    # Do some reporting for Early Bloomer mod construction, if told to do so.
+    if check_early_bloomer:
+        for man_idx, man in enumerate(bal.raw_bal_data['Manufacturers']):
+            if 'GameStageWeight' in man:
+                if early_bloomer_check(data, man['GameStageWeight']):
+                    messages.append('{} (man idx {}): {}'.format(
+                        bal_name,
+                        man_idx,
+                        man['GameStageWeight']['MinGameStage'],
+                        ))
+
+    # Loop through partlists
+    seen_labels = set()
+    for apl_idx, category in enumerate(bal.categories):
+
+        # Check for multiple-part selection
+        if category.select_multiple:
+            parts_min = category.num_min
+            parts_max = category.num_max
+            # Some items (such as the Storm Front grenade) have a bunch of parts defined
+            # in a multi-select category but have Min/Max of 0.  These parts are never
+            # actually selected, so ignore 'em.
+            if parts_min == 0 and parts_max == 0:
+                # Turns out there's a few guns too, but those rows were already getting pruned later.
+                #print('Skipping category {} for {}; zero min/max on multi-select'.format(apl_idx, partset_name))
+                continue
+        else:
+            parts_min = 1
+            parts_max = 1
+
+        processed_parts = []
+
+        for part_idx, part in enumerate(category.partlist):
+
+            part_name = part.part_name
+            if verbose:
+                print(f' - Part: {part_name}')
+            if category.select_multiple and not category.use_weight_with_mult:
+                weight = 'n/a'
+            else:
+                weight = data.process_bvc(part.weight)
+            if verbose:
+                print(part.weight)
+                print(f'   Weight: {weight}')
+
+            # Do some reporting for Early Bloomer mod construction, if told to do so.
+            if check_early_bloomer and part_name != 'None' and part_name not in early_bloomer_parts:
+                early_bloomer_parts.add(part_name)
+                for export in data.get_data(part_name):
+                    if export['export_type'].startswith('BPInvPart_'):
+                        if early_bloomer_check(data, export):
+                            messages.append('{}: {}'.format(
+                                part_name,
+                                export['MinGameStage'],
+                                ))
+                        break
+
+            # Excluders + Dependencies
+            (excluders, dependencies) = data.get_part_constraints(part_name)
+            processed_parts.append((part_name, excluders, dependencies, weight))
+
+        # If we have no parts, skip it
+        if len(processed_parts) == 0:
+            continue
+
+        # Special case!  A partset with literally just *one* part, with a name of None.
+        # No reason to show this, has no actual bearing on the weapon.
+        if len(processed_parts) == 1 and processed_parts[0][0] == 'None':
+            continue
+
+        # Figure out what the main label should be for this part type
+        label_text = data.get_parts_category_name([p[0] for p in processed_parts], bal_name, apl_idx)
+
+        # Hardcoded fixes.  Grr.
+        if label_text is None:
+            raise Exception('Possible contention (or unknowns) in {}, APL {}: {}'.format(
+                bal_name,
+                apl_idx,
+                ', '.join([p[0].rsplit('/', 1)[-1] for p in processed_parts]),
+                ))
+
+        # Make sure we're not re-using a label
+        if len(processed_parts) > 0:
+            idx = 1
+            label_base = label_text
+            while label_text in seen_labels:
+                idx += 1
+                label_text = '{} {}'.format(label_base, idx)
+            seen_labels.add(label_text)
+
+        for (part_name, excluders, dependencies, weight) in processed_parts:
+            datarow = [manufacturer]
+            datarow_long = [manufacturer]
+            if type_col_name:
+                datarow.append(gun_type)
+                datarow_long.append(gun_type)
+
+            # A bit nicer to see ints if a weight is just .0
+            if weight != 'n/a':
+                if round(weight, 6) == int(weight):
+                    weight = int(weight)
+
+            # The DLC6 patch introduced a "Mysterious Artifact," which looks identical to
+            # the "Mysterious Amulet" introduced in the DLC5 patch, and has the same "short" name.
+            # We're going to report the full path for these, rather than just the short name,
+            # because otherwise it'd be impossible to know which one we're referring to.  Do this
+            # for the individual part, as well.
+            #if 'InvBalD_Artifact_MysteriousAmulet' in bal_name:
+            #    bal_name_report = bal_name
+            #else:
+            bal_name_report = bal_name.split('/')[-1]
+            #if 'Artifact_Part_Ability_MysteriousAmulet' in part_name:
+            #    part_name_report = part_name
+            #else:
+            part_name_report = part_name.split('/')[-1]
+
+            # Row for our "main" CSV (and XLSX)
+            datarow.extend([
+                rarity,
+                bal_name_report,
+                label_text,
+                parts_min,
+                parts_max,
+                weight,
+                part_name_report,
+                ', '.join(sorted([d.split('/')[-1] for d in dependencies])),
+                ', '.join(sorted([e.split('/')[-1] for e in excluders])),
+                ])
+
+            # Row for an alternate "long" CSV (used by ttwl-cli-saveedit mostly)
+            datarow_long.extend([
+                rarity,
+                bal_name,
+                label_text,
+                parts_min,
+                parts_max,
+                weight,
+                part_name,
+                ', '.join(sorted(dependencies)),
+                ', '.join(sorted(excluders)),
+                ])
+
+            rows.append((datarow, datarow_long, sorted(dependencies), sorted(excluders)))
+
+    return (rows, messages)
+
+class CSVRowWriter:
+    """
+    Writes balance rows out to the CSV file `filename` as they're generated.
+    If `long` is `True`, we'll write out the "long" version of each row (with
+    full object paths, used by ttwl-cli-saveedit mostly) instead of the main
+    one.
+    """
+
+    def __init__(self, filename, header, long=False):
+        self.odf = open(filename, 'w')
+        self.writer = csv.writer(self.odf)
+        self.long = long
+        self.writer.writerow(header)
+
+    def write_row(self, datarow, datarow_long, dependencies, excluders):
+        if self.long:
+            self.writer.writerow(datarow_long)
+        else:
+            self.writer.writerow(datarow)
+
+    def close(self):
+        self.odf.close()
+
+class XLSXRowWriter:
+    """
+    Writes balance rows out to the worksheet `ws` as they're generated.  The
+    worksheet should be in `constant_memory` mode, so only the current row is
+    held in memory.
+    """
+
+    def __init__(self, ws, header, header_format):
+        self.ws = ws
+        self.ws.write_row(0, 0, header, header_format)
+        self.cur_row = 1
+
+    def write_row(self, datarow, datarow_long, dependencies, excluders):
+        # Put an explicit space in deps/excl if necessary, to keep them in
+        # their columns
+        datarow = list(datarow)
+        if datarow[-2] == '':
+            datarow[-2] = ' '
+        if datarow[-1] == '':
+            datarow[-1] = ' '
+        datarow.append(' ')
+        self.ws.write_row(self.cur_row, 0, datarow)
+        self.cur_row += 1
+
+    def close(self):
+        pass
+
+class DBRowWriter:
+    """
+    Writes balance rows out to our balance database `bdb`, as a sheet named
+    `sheet_name`, as they're generated.
+    """
+
+    def __init__(self, bdb, sheet_name, sheet_label, man_col_name, type_col_name):
+        self.bdb = bdb
+        self.sheet_id = bdb.add_sheet(sheet_name, sheet_label, man_col_name, type_col_name)
+        self.has_type = bool(type_col_name)
+
+    def write_row(self, datarow, datarow_long, dependencies, excluders):
+        datarow_long = list(datarow_long)
+        manufacturer = datarow_long.pop(0)
+        if self.has_type:
+            gear_type = datarow_long.pop(0)
+        else:
+            gear_type = None
+        rarity, bal_name, category, parts_min, parts_max, weight, part_name = datarow_long[:7]
+        if weight == 'n/a':
+            weight = None
+        self.bdb.add_part(self.sheet_id, manufacturer, gear_type, rarity, bal_name,
+                category, parts_min, parts_max, weight, part_name,
+                dependencies, excluders)
+
+    def close(self):
+        pass
+
+def balance_rows(balance_infos):
+    """
+    Processes each of the balances in `balance_infos`, yielding row tuples
+    (as described in `process_balance()`) in order as they're generated, and
+    reporting any messages from the balance processing along the way.
+    """
+    for rows, messages in balance_map(balance_infos):
+        for message in messages:
+            if message not in reported:
+                print(message)
+                reported.add(message)
+        yield from rows
+
+# Make sure the part-constraint index has been built before we start, so that
+# worker processes don't each try to build it themselves.
+data.load_part_constraint_index(jobs=jobs)
+
+# Set up our worker pool, if we've been told to use one.  This relies on the
+# `fork` start method, since this script isn't structured to be re-imported
+# by spawned workers.  Results come back via `imap`, so rows are still written
+# out in our sorted balance order, and output is identical to a serial run.
+if jobs > 1:
+    pool = multiprocessing.get_context('fork').Pool(jobs, initializer=init_worker)
+    balance_map = lambda balances: pool.imap(process_balance, balances, chunksize=4)
+else:
+    pool = None
+    balance_map = lambda balances: map(process_balance, balances)
+
+# Our balance database, which other scripts can query rather than having to
+# re-parse the "long" CSVs.
+db_filename = 'item_balances.sqlite3'
+bdb = BalanceDB(db_filename, create=True)
+
 # Loop through
-part_cache = {}
-title_cache = {}
+sheet_timings = []
+reported = set()
 for (sheet_label, filename, filename_long, balances, man_col_name, type_col_name) in [
         ('Guns', 'gun_balances.csv', 'gun_balances_long.csv', gun_balances, 'Manufacturer/Name', 'Gun Type'),
         ('Melee', 'melee_balances.csv', 'melee_balances_long.csv', melee_balances, 'Type/Name', 'Melee Type'),
@@ -851,277 +1186,88 @@ for (sheet_label, filename, filename_long, balances, man_col_name, type_col_name
 
     ws = wb.add_worksheet(sheet_label)
     ws.freeze_panes(1, 0)
+    start_time = time.time()
 
     print('Processing {}'.format(filename))
-    with open(filename, 'w') as odf:
-        with open(filename_long, 'w') as odf_long:
 
-            writer = csv.writer(odf)
-            writer_long = csv.writer(odf_long)
-            header = [man_col_name]
-            fixed_offset = 0
-            if type_col_name:
-                header.append(type_col_name)
-                fixed_offset += 1
-                # Type
-                ws.set_column(2, 2, 22, reg_format)
-            header.extend([
-                'Rarity',
-                'Balance',
-                'Category',
-                'Min Parts',
-                'Max Parts',
-                'Weight',
-                'Part',
-                'Dependencies',
-                'Excluders',
-                ])
-            writer.writerow(header)
-            writer_long.writerow(header)
-
-            # XLSX column formatting/widths
-            # Name
-            if 'amulet' in filename:
-                ws.set_column(0, 0, 32, reg_format)
-            else:
-                ws.set_column(0, 0, 27, reg_format)
-            # Rarity
-            ws.set_column(1, 1, 17, reg_format)
-            # Balance
-            ws.set_column(2+fixed_offset, 2+fixed_offset, 37, fixed_format)
-            # Category
-            ws.set_column(3+fixed_offset, 3+fixed_offset, 23, reg_format)
-            # Min Parts
-            ws.set_column(4+fixed_offset, 4+fixed_offset, 9, reg_format)
-            # Max Parts
-            ws.set_column(5+fixed_offset, 5+fixed_offset, 9, reg_format)
-            # Weight
-            ws.set_column(6+fixed_offset, 6+fixed_offset, 11, reg_format_right)
-            # Part
-            ws.set_column(7+fixed_offset, 7+fixed_offset, 40, fixed_format)
-            # Dependencies
-            ws.set_column(8+fixed_offset, 8+fixed_offset, 60, fixed_format)
-            # Excluders
-            ws.set_column(9+fixed_offset, 9+fixed_offset, 60, fixed_format)
-
-            # Write the header row to XLSX, too.
-            ws.write_row(0, 0, header, header_format)
-            cur_row = 1
-
-            # Now loop through balances
-            for manufacturer, gun_type, rarity, bal_name in balances:
-
-                if verbose:
-                    print(f'Balance: {bal_name}')
-
-                # Grab a Balance object
-                bal = Balance.from_data(data, bal_name)
-
-                # Do some reporting for Early Bloomer mod construction, if told to do so.
-                if check_early_bloomer:
-                    for man_idx, man in enumerate(bal.raw_bal_data['Manufacturers']):
-                        if 'GameStageWeight' in man:
-                            if early_bloomer_check(data, man['GameStageWeight']):
-                                print('{} (man idx {}): {}'.format(
-                                    bal_name,
-                                    man_idx,
-                                    man['GameStageWeight']['MinGameStage'],
-                                    ))
-
-                # Loop through partlists
-                seen_labels = set()
-                for apl_idx, category in enumerate(bal.categories):
-
-                    # Check for multiple-part selection
-                    if category.select_multiple:
-                        parts_min = category.num_min
-                        parts_max = category.num_max
-                        # Some items (such as the Storm Front grenade) have a bunch of parts defined
-                        # in a multi-select category but have Min/Max of 0.  These parts are never
-                        # actually selected, so ignore 'em.
-                        if parts_min == 0 and parts_max == 0:
-                            # Turns out there's a few guns too, but those rows were already getting pruned later.
-                            #print('Skipping category {} for {}; zero min/max on multi-select'.format(apl_idx, partset_name))
-                            continue
-                    else:
-                        parts_min = 1
-                        parts_max = 1
-
-                    processed_parts = []
-
-                    for part_idx, part in enumerate(category.partlist):
-
-                        part_name = part.part_name
-                        if verbose:
-                            print(f' - Part: {part_name}')
-                        if category.select_multiple and not category.use_weight_with_mult:
-                            weight = 'n/a'
-                        else:
-                            weight = data.process_bvc(part.weight)
-                        if verbose:
-                            print(part.weight)
-                            print(f'   Weight: {weight}')
-
-                        # Populate the cache, if we need to
-                        if part_name not in part_cache:
-                            if part_name == 'None':
-                                part_cache[part_name] = (set(), set())
-                            else:
-                                excluders = set()
-                                dependencies = set()
-                                part_data = data.get_data(part_name)
-                                found_export = False
-
-                                for export in part_data:
-                                    if export['export_type'].startswith('BPInvPart_'):
-                                        found_export = True
-
-                                        # Do some reporting for Early Bloomer mod construction, if told to do so.
-                                        if check_early_bloomer:
-                                            if early_bloomer_check(data, export):
-                                                print('{}: {}'.format(
-                                                    part_name,
-                                                    export['MinGameStage'],
-                                                    ))
-
-
-                                        if 'Excluders' in export:
-                                            for excluder in export['Excluders']:
-                                                if 'export' in excluder:
-                                                    # WTF is going on here?  So far, these objects seem to just reference *themselves* in here.
-                                                    # Been ignoring a bunch of these on the BL3 side too, so whatever, do that here as well.
-                                                    if part_name not in {
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_01',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_02',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_03',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_04',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_05',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_06',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_07',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_08',
-                                                            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Hilt_Mod_Mission/Part_M_Sword_HiltMod_07_Mission',
-                                                            '/Game/Gear/Shields/_Design/PartSets/Part_Augment/Safespace/Part_Shield_Aug_Knockback',
-                                                            }:
-                                                        # Also, literally 211 Pauldron-related parts do this.  Whatever, ignore the lot.
-                                                        if not part_name.startswith('/Game/Gear/Pauldrons/_Shared/_Design'):
-                                                            # Also these DLC4 things
-                                                            if not part_name.startswith('/Game/PatchDLC/Indigo4/Gear/Pauldrons/_Shared/_Design/Parts/PlayerStat/Medium/Shaman'):
-                                                                print('WARNING: {} Excluders references itself?'.format(part_name))
-                                                else:
-                                                    excluders.add(excluder[1])
-                                        if 'Dependencies' in export:
-                                            for dependency in export['Dependencies']:
-                                                dependencies.add(dependency[1])
-
-                                        # Pull in dependency expansions, if we've got 'em
-                                        if part_name in data.expansion_dependencies:
-                                            dependencies |= data.expansion_dependencies[part_name].dependencies
-                                            excluders |= data.expansion_dependencies[part_name].excluders
-
-                                        break
-                                if not found_export:
-                                    raise Exception('Could not find export for {}'.format(part_name))
-
-                                part_cache[part_name] = (excluders, dependencies)
-
-                        # Read from Cache
-                        (excluders, dependencies) = part_cache[part_name]
-                        processed_parts.append((part_name, excluders, dependencies, weight))
-
-                    # If we have no parts, skip it
-                    if len(processed_parts) == 0:
-                        continue
-
-                    # Special case!  A partset with literally just *one* part, with a name of None.
-                    # No reason to show this, has no actual bearing on the weapon.
-                    if len(processed_parts) == 1 and processed_parts[0][0] == 'None':
-                        continue
-
-                    # Figure out what the main label should be for this part type
-                    label_text = data.get_parts_category_name([p[0] for p in processed_parts], bal_name, apl_idx)
-
-                    # Hardcoded fixes.  Grr.
-                    if label_text is None:
-                        raise Exception('Possible contention (or unknowns) in {}, APL {}: {}'.format(
-                            bal_name,
-                            apl_idx,
-                            ', '.join([p[0].rsplit('/', 1)[-1] for p in processed_parts]),
-                            ))
-
-                    # Make sure we're not re-using a label
-                    if len(processed_parts) > 0:
-                        idx = 1
-                        label_base = label_text
-                        while label_text in seen_labels:
-                            idx += 1
-                            label_text = '{} {}'.format(label_base, idx)
-                        seen_labels.add(label_text)
-
-                    for (part_name, excluders, dependencies, weight) in processed_parts:
-                        datarow = [manufacturer]
-                        datarow_long = [manufacturer]
-                        if type_col_name:
-                            datarow.append(gun_type)
-                            datarow_long.append(gun_type)
-
-                        # A bit nicer to see ints if a weight is just .0
-                        if weight != 'n/a':
-                            if round(weight, 6) == int(weight):
-                                weight = int(weight)
-
-                        # The DLC6 patch introduced a "Mysterious Artifact," which looks identical to
-                        # the "Mysterious Amulet" introduced in the DLC5 patch, and has the same "short" name.
-                        # We're going to report the full path for these, rather than just the short name,
-                        # because otherwise it'd be impossible to know which one we're referring to.  Do this
-                        # for the individual part, as well.
-                        #if 'InvBalD_Artifact_MysteriousAmulet' in bal_name:
-                        #    bal_name_report = bal_name
-                        #else:
-                        bal_name_report = bal_name.split('/')[-1]
-                        #if 'Artifact_Part_Ability_MysteriousAmulet' in part_name:
-                        #    part_name_report = part_name
-                        #else:
-                        part_name_report = part_name.split('/')[-1]
-
-                        # Write out to our "main" CSV
-                        datarow.extend([
-                            rarity,
-                            bal_name_report,
-                            label_text,
-                            parts_min,
-                            parts_max,
-                            weight,
-                            part_name_report,
-                            ', '.join(sorted([d.split('/')[-1] for d in dependencies])),
-                            ', '.join(sorted([e.split('/')[-1] for e in excluders])),
-                            ])
-                        writer.writerow(datarow)
-
-                        # Write the row to XLSX as well (putting an explicit space in deps/excl if necessary,
-                        # to keep them in their columns)
-                        if datarow[-2] == '':
-                            datarow[-2] = ' '
-                        if datarow[-1] == '':
-                            datarow[-1] = ' '
-                        datarow.append(' ')
-                        ws.write_row(cur_row, 0, datarow)
-                        cur_row += 1
-
-                        # Write out to an alternate "long" CSV (used by ttwl-cli-saveedit mostly)
-                        datarow_long.extend([
-                            rarity,
-                            bal_name,
-                            label_text,
-                            parts_min,
-                            parts_max,
-                            weight,
-                            part_name,
-                            ', '.join(sorted(dependencies)),
-                            ', '.join(sorted(excluders)),
-                            ])
-                        writer_long.writerow(datarow_long)
-
-            print('... done!')
+    header = [man_col_name]
+    fixed_offset = 0
+    if type_col_name:
+        header.append(type_col_name)
+        fixed_offset += 1
+        # Type
+        ws.set_column(2, 2, 22, reg_format)
+    header.extend([
+        'Rarity',
+        'Balance',
+        'Category',
+        'Min Parts',
+        'Max Parts',
+        'Weight',
+        'Part',
+        'Dependencies',
+        'Excluders',
+        ])
+
+    # XLSX column formatting/widths
+    # Name
+    if 'amulet' in filename:
+        ws.set_column(0, 0, 32, reg_format)
+    else:
+        ws.set_column(0, 0, 27, reg_format)
+    # Rarity
+    ws.set_column(1, 1, 17, reg_format)
+    # Balance
+    ws.set_column(2+fixed_offset, 2+fixed_offset, 37, fixed_format)
+    # Category
+    ws.set_column(3+fixed_offset, 3+fixed_offset, 23, reg_format)
+    # Min Parts
+    ws.set_column(4+fixed_offset, 4+fixed_offset, 9, reg_format)
+    # Max Parts
+    ws.set_column(5+fixed_offset, 5+fixed_offset, 9, reg_format)
+    # Weight
+    ws.set_column(6+fixed_offset, 6+fixed_offset, 11, reg_format_right)
+    # Part
+    ws.set_column(7+fixed_offset, 7+fixed_offset, 40, fixed_format)
+    # Dependencies
+    ws.set_column(8+fixed_offset, 8+fixed_offset, 60, fixed_format)
+    # Excluders
+    ws.set_column(9+fixed_offset, 9+fixed_offset, 60, fixed_format)
+
+    # Set up our writers: our "main" CSV, an alternate "long" CSV, XLSX, and
+    # our balance database.  Each row gets written out to all of them as soon
+    # as it's generated.
+    writers = [
+            CSVRowWriter(filename, header),
+            CSVRowWriter(filename_long, header, long=True),
+            XLSXRowWriter(ws, header, header_format),
+            DBRowWriter(bdb, filename[:-len('_balances.csv')], sheet_label, man_col_name, type_col_name),
+            ]
+
+    # Now loop through balances
+    balance_infos = [(manufacturer, gun_type, rarity, bal_name, type_col_name)
+            for manufacturer, gun_type, rarity, bal_name in balances]
+    for row in balance_rows(balance_infos):
+        for writer in writers:
+            writer.write_row(*row)
+
+    for writer in writers:
+        writer.close()
+
+    elapsed = time.time() - start_time
+    sheet_timings.append((sheet_label, len(balances), elapsed))
+    print('... done! ({:.1f}s)'.format(elapsed))
+
+if pool is not None:
+    pool.close()
+    pool.join()
 
 wb.close()
+bdb.close()
 print(f'Also wrote to: {xlsx_filename}')
+print(f'Also wrote to: {db_filename}')
+print('')
+print('Timing summary ({} job{}):'.format(jobs, '' if jobs == 1 else 's'))
+for sheet_label, num_balances, elapsed in sheet_timings:
+    print(' - {}: {} balances in {:.1f}s'.format(sheet_label, num_balances, elapsed))
+print(' - Total: {:.1f}s'.format(sum(t[2] for t in sheet_timings)))
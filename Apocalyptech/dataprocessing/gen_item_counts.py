@@ -21,41 +21,41 @@
 import re
 import sys
 import csv
-import platform
+import math
+import argparse
 import itertools
 from wldata.wldata import WLData
 from wlhotfixmod.wlhotfixmod import Balance
 
-print("Not actually tested fully!  Armor balances are absurd, and I haven't cared")
-print("enough to omit those (or figure out a more efficient way of doing it) and")
-print("check the rest, yet.")
-sys.exit(1)
-
 # Data generated by this script lives online at:
 # ...
 
-if 'cpython' in platform.python_implementation().lower():
-    print("")
-    print("This app is slow and inefficient.  PyPy3 won't help with the")
-    print("inefficiency, but it *will* improve runtimes considerably, by")
-    print("something like 6x.  It's recommended to quit now and re-launch")
-    print("with PyPy3.")
-    print("")
-    print("Hit Enter to continue anyway, but don't expect anything fast.")
-    print("")
-    sys.stdout.write("Ctrl-C to exit, Enter to continue> ")
-    sys.stdout.flush()
-    sys.stdin.readline()
+parser = argparse.ArgumentParser(
+        description='Generates item permutation counts, in CSV',
+        )
+parser.add_argument('-c', '--check',
+        action='store_true',
+        help="""Cross-check our counts against the old brute-force part tree, for
+            balances whose count is at or below --check-max""",
+        )
+parser.add_argument('--check-max',
+        type=int,
+        default=100000,
+        help='Maximum item count for balances to cross-check with --check',
+        )
+args = parser.parse_args()
 
 data = WLData()
 
-part_cache = {}
-
 class PartTreeNode(object):
     """
     A node in a Part tree.  Using some legacy terminology here; "apls" used to refer
     to the PartSet ActorPartLists structure, but we're using our Balance objects
     instead.
+
+    This enumerates every single possible item, so it's far too slow to use on
+    anything but the simplest balances.  It's only used these days to cross-check
+    `BalanceCounter` (with the `--check` argument).
     """
 
     def __init__(self, data, parent, part_set, apls, level=0):
@@ -91,7 +91,7 @@ class PartTreeNode(object):
             if part_name == 'None':
                 parts.append(None)
             else:
-                (excluders, dependencies) = self._get_constraints(part_name)
+                (excluders, dependencies) = self.data.get_part_constraints(part_name)
 
                 # Process exclusions
                 if len(excluders) > 0:
@@ -150,55 +150,6 @@ class PartTreeNode(object):
         # be able to poke through the tree if we wanted, for some reason.
         self.children = None
 
-    def _get_constraints(self, part_name):
-
-        # Breaking OOO here, ah well.
-        global part_cache
-
-        if part_name not in part_cache:
-
-            excluders = set()
-            dependencies = set()
-
-            part_data = self.data.get_data(part_name)
-            found_export = False
-            for export in part_data:
-                if export['export_type'].startswith('BPInvPart_'):
-                    found_export = True
-                    if 'Excluders' in export:
-                        for excluder in export['Excluders']:
-                            if 'export' in excluder:
-                                # WTF is going on here?  So far, these objects seem to just reference *themselves* in here.
-                                # Been ignoring a bunch of these on the BL3 side too, so whatever, do that here as well.
-                                if part_name not in {
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_01',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_02',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_03',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_04',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_05',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_06',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_07',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_08',
-                                        '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Hilt_Mod_Mission/Part_M_Sword_HiltMod_07_Mission',
-                                        '/Game/Gear/Shields/_Design/PartSets/Part_Augment/Safespace/Part_Shield_Aug_Knockback',
-                                        }:
-                                    # Also, literally 211 Pauldron-related parts do this.  Whatever, ignore the lot.
-                                    if not part_name.startswith('/Game/Gear/Pauldrons/_Shared/_Design'):
-                                        print('WARNING: {} Excluders references itself?'.format(part_name))
-                            else:
-                                excluders.add(excluder[1])
-                    if 'Dependencies' in export:
-                        for dependency in export['Dependencies']:
-                            dependencies.add(dependency[1])
-                    break
-
-            if not found_export:
-                raise Exception('Could not find export for {}'.format(part_name))
-
-            part_cache[part_name] = (excluders, dependencies)
-
-        return part_cache[part_name]
-
     def _has_part(self, part_name):
         if part_name in self.part_set:
             return True
@@ -216,24 +167,15 @@ class PartTreeNode(object):
         else:
             return sum([child.count_leaves() for child in self.children])
 
-class BalanceTree(object):
+class BalanceCount(object):
     """
-    A wrapper around the "stock" Balance object to do our recursive tree nonsense.
+    Base class for our item-counting classes.  Subclasses should set `self.bal`
+    and `self.count` (the item count without anointments) when they're created.
     """
 
-    def __init__(self, bal_name, data):
-        self.bal_name = bal_name
-        self.data = data
-
-        # Load ourselves
-        self.bal = Balance.from_data(data, bal_name)
-
-        # Start processing our part tree
-        self.tree = PartTreeNode(self.data, None, set(), self.bal.categories)
-
     def gun_count(self, anointment_additions=None, anointment_exclusions=set()):
         """
-        Counts the leaves of our tree
+        Returns our item count, optionally multiplied by the number of anointments
         """
         if anointment_additions \
                 and 'RuntimeGenericPartList' in self.bal.raw_bal_data \
@@ -251,9 +193,149 @@ class BalanceTree(object):
             for part in self.bal.raw_bal_data['RuntimeGenericPartList']['PartList']:
                 if 'export' in part['PartData'] or part['PartData'][1] not in anointment_exclusions:
                     anoint_count += 1
-            return self.tree.leaf_count * (anoint_count + addition)
+            return self.count * (anoint_count + addition)
         else:
-            return self.tree.leaf_count
+            return self.count
+
+class BalanceTree(BalanceCount):
+    """
+    A wrapper around the "stock" Balance object to do our recursive tree nonsense.
+    """
+
+    def __init__(self, bal_name, data, bal=None):
+        self.bal_name = bal_name
+        self.data = data
+
+        # Load ourselves
+        if bal is None:
+            self.bal = Balance.from_data(data, bal_name)
+        else:
+            self.bal = bal
+
+        # Start processing our part tree
+        self.tree = PartTreeNode(self.data, None, set(), self.bal.categories)
+        self.count = self.tree.leaf_count
+
+class BalanceCounter(BalanceCount):
+    """
+    Counts the possible items for a Balance without enumerating them.  We walk
+    through the categories in order, keeping track of how many partial items
+    we've got for each "state," where the state is just the set of already-chosen
+    parts which are referenced by the excluders/dependencies of parts in later
+    categories.  Everything else about the partial item is irrelevant to what
+    can be chosen later, so all those partial items can be counted together.
+
+    Inside a multi-select category, the parts which don't matter to later
+    categories are counted with binomial coefficients, so only the "relevant"
+    parts need to be combined by hand.  In practice that keeps the number of
+    states tiny, even for armor.
+
+    This follows the same rules as `PartTreeNode`: constraints are only checked
+    against parts in earlier categories, a `None` part counts as a choice, and a
+    category with no valid choices just gets skipped over.
+    """
+
+    def __init__(self, bal_name, data, bal=None):
+        self.bal_name = bal_name
+        self.data = data
+
+        # Load ourselves
+        if bal is None:
+            self.bal = Balance.from_data(data, bal_name)
+        else:
+            self.bal = bal
+
+        self.count = self._count()
+
+    def _count(self):
+
+        # Get the constraints for all our parts, and figure out which parts
+        # are referenced by each category (and any categories after it).
+        categories = []
+        for cat in self.bal.categories:
+            parts = []
+            for part in cat.partlist:
+                if part.part_name == 'None':
+                    parts.append((None, set(), set()))
+                else:
+                    (excluders, dependencies) = self.data.get_part_constraints(part.part_name)
+                    parts.append((part.part_name, excluders, dependencies))
+            categories.append((cat, parts))
+        referenced_after = [set()]
+        for cat, parts in reversed(categories):
+            referenced = set(referenced_after[0])
+            for part_name, excluders, dependencies in parts:
+                referenced |= excluders
+                referenced |= dependencies
+            referenced_after.insert(0, referenced)
+
+        # Now walk through the categories
+        states = {frozenset(): 1}
+        for cat_idx, (cat, parts) in enumerate(categories):
+            relevant = referenced_after[cat_idx+1]
+            new_states = {}
+            for state, state_count in states.items():
+                for new_state, count in self._category_states(cat, parts, state, relevant):
+                    new_states[new_state] = new_states.get(new_state, 0) + state_count*count
+            states = new_states
+
+        return sum(states.values())
+
+    def _category_states(self, cat, parts, state, relevant):
+        """
+        Given a category `cat` with its constrained `parts`, and the incoming
+        `state`, yields `(new_state, count)` tuples for the ways in which parts
+        can be chosen from the category.  `relevant` is the set of part names
+        which need to be tracked in the new state.
+        """
+
+        # Figure out which parts are valid, given what we've already chosen.
+        # Parts which will be needed for later constraints get kept separately.
+        relevant_parts = []
+        num_other = 0
+        for part_name, excluders, dependencies in parts:
+            if part_name is not None:
+                if excluders and not excluders.isdisjoint(state):
+                    continue
+                if dependencies and dependencies.isdisjoint(state):
+                    continue
+            if part_name is not None and part_name in relevant:
+                relevant_parts.append(part_name)
+            else:
+                num_other += 1
+        carried = state & relevant
+
+        if cat.select_multiple:
+            mults = range(cat.num_min, cat.num_max+1)
+        else:
+            mults = [1]
+        max_mult = max(mults, default=0)
+
+        # Build up the possible combinations of our relevant parts, keyed by
+        # the parts chosen and how many of them were chosen.
+        combos = {(carried, 0): 1}
+        for part_name in relevant_parts:
+            new_combos = dict(combos)
+            for (combo_state, num), count in combos.items():
+                if num < max_mult:
+                    key = (combo_state | {part_name}, num+1)
+                    new_combos[key] = new_combos.get(key, 0) + count
+            combos = new_combos
+
+        # Then fill in the rest of each combination with the other parts
+        found = False
+        for (combo_state, num), count in combos.items():
+            total = 0
+            for mult in mults:
+                if mult >= num:
+                    total += math.comb(num_other, mult-num)
+            if total > 0:
+                found = True
+                yield (combo_state, count*total)
+
+        # If there were no possibilities, we carry on without choosing anything
+        if not found:
+            yield (carried, 1)
 
 # Balances to loop through
 gun_balances = []
@@ -737,13 +819,13 @@ anointment_exclusions = {
         }
 
 # Loop through
+checks_failed = []
 for (sheet_label, filename, balances, man_col_name, type_col_name, do_anoints, anoint_expansions) in [
         ('Guns', 'gun_counts.csv', gun_balances, 'Manufacturer/Name', 'Gun Type', False, []),
         ('Melee', 'melee_counts.csv', melee_balances, 'Type/Name', 'Melee Type', False, []),
         ('Wards', 'ward_counts.csv', ward_balances, 'Manufacturer/Name', None, False, []),
         ('Spells', 'spell_counts.csv', spell_balances, 'Type/Name', None, False, []),
-        # Armor in WL is worse than COMs were in BL3.  The purple armor balance takes (at least) longer than 4hr for me
-        #('Armor', 'armor_counts.csv', armor_balances, 'Type/Name', None, False, []),
+        ('Armor', 'armor_counts.csv', armor_balances, 'Type/Name', None, False, []),
         ('Rings', 'ring_counts.csv', ring_balances, 'Type/Name', None, False, []),
         ('Amulets', 'amulet_counts.csv', amulet_balances, 'Type/Name', None, False, []),
         ]:
@@ -812,7 +894,7 @@ for (sheet_label, filename, balances, man_col_name, type_col_name, do_anoints, a
         for manufacturer, gun_type, rarity, obj_name in balances:
 
             print('Processing {} {} {} ({})'.format(manufacturer, gun_type, rarity, obj_name))
-            bal = BalanceTree(obj_name, data)
+            bal = BalanceCounter(obj_name, data)
             total_count += bal.gun_count()
             if do_anoints:
                 total_count_anoint += bal.gun_count(anointment_additions, anointment_exclusions)
@@ -820,6 +902,19 @@ for (sheet_label, filename, balances, man_col_name, type_col_name, do_anoints, a
             else:
                 print('  -> {:,}'.format(bal.gun_count()))
 
+            # Cross-check against the brute-force tree, if we've been told to
+            if args.check:
+                if bal.count <= args.check_max:
+                    tree = BalanceTree(obj_name, data, bal=bal.bal)
+                    if tree.count == bal.count:
+                        print('  -> Cross-check OK')
+                    else:
+                        checks_failed.append(obj_name)
+                        print('  -> ERROR: Cross-check mismatch!  Brute-force tree count: {:,}'.format(tree.count))
+                    tree = None
+                else:
+                    print('  -> Skipping cross-check, count is above {:,}'.format(args.check_max))
+
             datarow = [manufacturer]
             if type_col_name:
                 datarow.append(gun_type)
@@ -852,3 +947,13 @@ for (sheet_label, filename, balances, man_col_name, type_col_name, do_anoints, a
             print('Total: {}'.format(total_count))
         print('...done!')
 
+if args.check:
+    print('')
+    if checks_failed:
+        print('Cross-check failures:')
+        for obj_name in checks_failed:
+            print(' - {}'.format(obj_name))
+        sys.exit(1)
+    else:
+        print('All cross-checks passed')
+
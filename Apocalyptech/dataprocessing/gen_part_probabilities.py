@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import csv
+import sys
+import time
+import argparse
+from wldata.wldata import WLData
+from wldata.balanceprobs import BalanceProbabilities
+
+# Computes the exact chance for each part to show up on gear spawned from
+# every balance we know about (using the `*_balances_long.csv` files from
+# gen_item_balances.py as the list of balances).  See the BalanceProbabilities
+# docstring for the assumptions being made about how parts get chosen.
+
+parser = argparse.ArgumentParser(
+        description='Generates exact part-selection probabilities for all balances',
+        )
+parser.add_argument('-o', '--output',
+        default='part_probabilities.csv',
+        help='CSV file to write per-part probabilities to',
+        )
+parser.add_argument('-p', '--pair',
+        nargs=2,
+        action='append',
+        metavar=('PART1', 'PART2'),
+        help="""Also compute the joint probability for this pair of parts (full
+            object paths), for every balance which can spawn both.  Can be
+            specified more than once.""",
+        )
+parser.add_argument('--pair-output',
+        default='part_pair_probabilities.csv',
+        help='CSV file to write part-pair probabilities to',
+        )
+parser.add_argument('-b', '--balance',
+        action='append',
+        help='Only process the specified balance (can be specified more than once)',
+        )
+args = parser.parse_args()
+
+if args.pair:
+    pairs = [tuple(p) for p in args.pair]
+else:
+    pairs = []
+tracked = set()
+for pair in pairs:
+    tracked |= set(pair)
+
+data = WLData()
+
+# Load a list of balances
+if args.balance:
+    balance_names = args.balance
+else:
+    balance_names = []
+    seen = set()
+    for filename in sorted(os.listdir('.')):
+        if filename.endswith('_balances_long.csv'):
+            with open(filename) as df:
+                reader = csv.DictReader(df)
+                for row in reader:
+                    if row['Balance'] not in seen:
+                        seen.add(row['Balance'])
+                        balance_names.append(row['Balance'])
+    if not balance_names:
+        print('No *_balances_long.csv files found -- run gen_item_balances.py first')
+        sys.exit(1)
+
+start_time = time.time()
+pair_rows = []
+with open(args.output, 'w') as odf:
+    writer = csv.writer(odf)
+    writer.writerow([
+        'Balance',
+        'Category',
+        'Part',
+        'Category Probability',
+        'Overall Probability',
+        ])
+    for bal_name in balance_names:
+        probs = BalanceProbabilities(data, bal_name, track=tracked)
+        if probs.approximate:
+            print('NOTE: {} has a category too large to compute exactly; its numbers were sampled'.format(bal_name))
+        for cat_idx, cat_probs in enumerate(probs.category_probs):
+            for part_name, prob in sorted(cat_probs.items()):
+                writer.writerow([
+                    bal_name,
+                    cat_idx,
+                    part_name,
+                    round(prob, 8),
+                    round(probs.part_probs[part_name], 8),
+                    ])
+        for part1, part2 in pairs:
+            if part1 in probs.part_probs and part2 in probs.part_probs:
+                pair_rows.append([
+                    bal_name,
+                    part1,
+                    part2,
+                    round(probs.part_probs[part1], 8),
+                    round(probs.part_probs[part2], 8),
+                    round(probs.joint(part1, part2), 8),
+                    ])
+print('Wrote {} balances to {}'.format(len(balance_names), args.output))
+
+if pairs:
+    with open(args.pair_output, 'w') as odf:
+        writer = csv.writer(odf)
+        writer.writerow([
+            'Balance',
+            'Part 1',
+            'Part 2',
+            'Part 1 Probability',
+            'Part 2 Probability',
+            'Joint Probability',
+            ])
+        for row in pair_rows:
+            writer.writerow(row)
+    print('Wrote {} part-pair rows to {}'.format(len(pair_rows), args.pair_output))
+
+print('Finished in {:.1f}s'.format(time.time() - start_time))
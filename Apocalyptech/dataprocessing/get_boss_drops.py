@@ -29,6 +29,7 @@ try:
 except ModuleNotFoundError:
     have_colorama = False
 from wldata.wldata import WLData
+from wldata.bpchar import BPChar
 from wlhotfixmod.wlhotfixmod import ItemPool, LVL_TO_ENG_LOWER, LVL_CASE_NORM
 
 # This is a script to try and auto-discover all unique drops for boss-like characters
@@ -80,170 +81,6 @@ if args.color and have_colorama:
 else:
     report_color = ''
 
-class BPChar:
-    """
-    Class to pull in all the info from a BPChar which we care about in this script.  Makes use
-    of a dict to cache BPChars, since we're somewhat likely to see repeats.
-
-    In addition to handling all the data that's directly in the BPChar itself, this also
-    recursively loops down to `OwnerClass` BPChars, which seem to be how most of these chars
-    get their "standard" drop pools.  Some convenience methods can be used to roll up all this
-    info into their "finalized" values.  It's entirely possible some of my logic here might
-    be wrong!
-
-    Arguably, much of this should be pulled into wldata or wlhotfixmod, like I've done for
-    itempools and balances, etc.
-    """
-
-    def __init__(self, data, path, bpchar_cache):
-        self.data = data
-        self.path = path
-        self.bpchar_cache = bpchar_cache
-        self.obj = data.get_data(path)
-        self.owner = None
-        self.uiname_target = None
-        self.pools = []
-        self.pool_lists = []
-        self.pt_uinames = []
-        self.pt_pools = []
-        self.pt_pool_lists = []
-        # TODO: figure out if UIName can be gotten via any other methods
-        self.seen_aibalance = False
-        for export in self.obj:
-            if export['export_type'] == 'BlueprintGeneratedClass' and export['_jwp_object_name'].startswith('BPChar'):
-                if 'InheritableComponentHandler' in export and '_jwp_export_dst_type' in export['InheritableComponentHandler']:
-                    handler = self.obj[export['InheritableComponentHandler']['export']-1]
-                    if 'Records' in handler and type(handler['Records']) == list:
-                        for record in handler['Records']:
-                            if 'ComponentTemplate' in record \
-                                    and '_jwp_export_dst_type' in record['ComponentTemplate'] \
-                                    and record['ComponentTemplate']['_jwp_export_dst_type'] == 'AIBalanceStateComponent':
-                                self._process_aibalance(self.obj[record['ComponentTemplate']['export']-1])
-                            if 'ComponentKey' in record and type(record['ComponentKey']) == dict:
-                                ck = record['ComponentKey']
-                                if 'SCSVariableName' in ck and ck['SCSVariableName'] == 'AIBalanceState':
-                                    if 'OwnerClass' in ck and type(ck['OwnerClass']) == list:
-                                        owner_name = ck['OwnerClass'][1]
-                                        if owner_name not in self.bpchar_cache:
-                                            self.bpchar_cache[owner_name] = BPChar(self.data, owner_name, self.bpchar_cache)
-                                        self.owner = self.bpchar_cache[owner_name]
-
-                if not self.seen_aibalance:
-                    if 'SimpleConstructionScript' in export and '_jwp_export_dst_type' in export['SimpleConstructionScript']:
-                        scs = self.obj[export['SimpleConstructionScript']['export']-1]
-                        if 'RootNodes' in scs and type(scs['RootNodes']) == list:
-                            for node_ref in scs['RootNodes']:
-                                if '_jwp_export_dst_type' in node_ref:
-                                    node = self.obj[node_ref['export']-1]
-                                    if 'ComponentTemplate' in node \
-                                            and '_jwp_export_dst_type' in node['ComponentTemplate'] \
-                                            and node['ComponentTemplate']['_jwp_export_dst_type'] == 'AIBalanceStateComponent':
-                                        self._process_aibalance(self.obj[node['ComponentTemplate']['export']-1])
-                                        break
-
-            elif export['export_type'].startswith('BPChar') and export['_jwp_object_name'].startswith('Default__'):
-                if 'TargetableComponent' in export and type(export['TargetableComponent']) == dict and '_jwp_export_dst_type' in export['TargetableComponent']:
-                    tc = self.obj[export['TargetableComponent']['export']-1]
-                    if 'TargetUIName' in tc and type(tc['TargetUIName']) == list:
-                        self.uiname_target = tc['TargetUIName'][1]
-
-        # Custom fix for DLC4's Raging Wyborg.  I think this just happens via object inheritance,
-        # of which there wouldn't be any indication in the data file.
-        if self.path == '/Game/PatchDLC/Indigo4/Enemies/BPChar_DragonMech_Indigo':
-            owner_name='/Game/Enemies/Vorcanar/_Shared/_Design/Character/BPChar_DragonMech'
-            if owner_name not in self.bpchar_cache:
-                self.bpchar_cache[owner_name] = BPChar(self.data, owner_name, self.bpchar_cache)
-            self.owner = self.bpchar_cache[owner_name]
-
-    def _process_aibalance(self, aibsc):
-        if self.seen_aibalance:
-            return
-        self.seen_aibalance = True
-        if 'DropOnDeathItemPools' in aibsc and type(aibsc['DropOnDeathItemPools']) == dict:
-            dodip = aibsc['DropOnDeathItemPools']
-            if 'ItemPools' in dodip and type(dodip['ItemPools']) == list:
-                for itempool in dodip['ItemPools']:
-                    if 'ItemPool' in itempool and 'export' not in itempool['ItemPool']:
-                        self.pools.append(itempool['ItemPool'][1])
-            if 'ItemPoolLists' in dodip and type(dodip['ItemPoolLists']) == list:
-                for itempoollist in dodip['ItemPoolLists']:
-                    if 'export' not in itempoollist:
-                        self.pool_lists.append(itempoollist[1])
-        if 'PlayThroughs' in aibsc and type(aibsc['PlayThroughs']) == list:
-            for pt in aibsc['PlayThroughs']:
-                # There's also a bOverrideDisplayName/DisplayName in here, but it seems as though
-                # that's always blank, so not bothering to check it.
-                if 'bOverrideUIDisplayName' in pt and pt['bOverrideUIDisplayName']:
-                    if type(pt['DisplayUIName']) == dict:
-                        self.pt_uinames.append('(none?)')
-                    else:
-                        self.pt_uinames.append(pt['DisplayUIName'][1])
-                else:
-                    self.pt_uinames.append(None)
-                if 'bOverrideDropOnDeathItemPools' in pt and pt['bOverrideDropOnDeathItemPools']:
-                    self.pt_pools.append([])
-                    self.pt_pool_lists.append([])
-                    pt_dodip = pt['DropOnDeathItemPools']
-                    if 'ItemPools' in pt_dodip and type(pt_dodip['ItemPools']) == list:
-                        for itempool in pt_dodip['ItemPools']:
-                            if 'ItemPool' in itempool and 'export' not in itempool['ItemPool']:
-                                self.pt_pools[-1].append(itempool['ItemPool'][1])
-                    if 'ItemPoolLists' in pt_dodip and type(pt_dodip['ItemPoolLists']) == list:
-                        for itempoollist in pt_dodip['ItemPoolLists']:
-                            if 'export' not in itempoollist:
-                                self.pt_pool_lists[-1].append(itempoollist[1])
-                else:
-                    self.pt_pools.append(None)
-                    self.pt_pool_lists.append(None)
-
-    def get_uiname(self, pt=0):
-        uiname = None
-        if self.owner is not None:
-            uiname = self.owner.get_uiname(pt)
-        if self.uiname_target is not None:
-            uiname = self.uiname_target
-        if len(self.pt_uinames) >= pt+1:
-            if self.pt_uinames[pt] is not None:
-                uiname = self.pt_uinames[pt]
-        return uiname
-
-    def get_pools(self, pt=0):
-        pools = []
-        if self.owner is not None:
-            pools = self.owner.get_pools(pt)
-        pools.extend(self.pools)
-        if len(self.pt_pools) >= pt+1:
-            if self.pt_pools[pt] is not None:
-                # TODO: is this really a *full* overwrite?  I think so...
-                # Is it a full rewrite if we're given an *empty* list here?  That I'm not sure of.
-                # (though I think the BL3 Hightower bug was due to an empty list here?)
-                pools = self.pt_pools[pt]
-        return pools
-
-    def get_pool_lists(self, pt=0):
-        pool_lists = []
-        if self.owner is not None:
-            pool_lists = self.owner.get_pool_lists(pt)
-        pool_lists.extend(self.pool_lists)
-        if len(self.pt_pool_lists) >= pt+1:
-            if self.pt_pool_lists[pt] is not None:
-                # TODO: is this really a *full* overwrite?  I think so...
-                # Is it a full rewrite if we're given an *empty* list here?  That I'm not sure of.
-                # (though I think the BL3 Hightower bug was due to an empty list here?)
-                pool_lists = self.pt_pool_lists[pt]
-        return pool_lists
-
-    def report(self, pt=0):
-        pools = self.get_pools(pt)
-        pool_lists = self.get_pool_lists(pt)
-        if pools or pool_lists:
-            print(self.path)
-            for pool in pools:
-                print(f' > {pool}')
-            for pool_list in pool_lists:
-                print(f' + {pool_list}')
-            print('')
-
 class ItemPoolWrapper(ItemPool):
     """
     A wrapper around wlhotfixmod.ItemPool to support some functionality useful for this
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import argparse
+from wlhotfixmod.modmerge import ModMerger
+
+# Merges a bunch of mods (in load order) into a single mod file, dropping any
+# hotfixes which get completely overwritten by later ones.  Optionally writes
+# out a tab-separated "provenance" file mapping each line in the merged mod
+# back to the mod (and line) it came from.
+
+parser = argparse.ArgumentParser(
+        description='Merges mod files into a single mod, with later mods taking precedence',
+        )
+parser.add_argument('mods',
+        nargs='+',
+        help='Mod files to merge, in load order',
+        )
+parser.add_argument('-o', '--output',
+        required=True,
+        help='Filename of the merged mod',
+        )
+parser.add_argument('-t', '--title',
+        default='Merged Mods',
+        help='Title of the merged mod',
+        )
+parser.add_argument('-a', '--author',
+        default='Various',
+        help='Author of the merged mod',
+        )
+parser.add_argument('-c', '--comments',
+        action='store_true',
+        help='Keep comments from the source mods',
+        )
+parser.add_argument('-p', '--provenance',
+        help='Filename to write a provenance map to (tab-separated: merged line, source mod, source line)',
+        )
+args = parser.parse_args()
+
+merger = ModMerger(comments=args.comments)
+total = 0
+for filename in args.mods:
+    total += merger.add_file(filename)
+
+description = ['Merged from the following mods, in order:', '']
+for filename in args.mods:
+    description.append(' - {}'.format(filename))
+provenance, removed = merger.write(args.output,
+        args.title,
+        args.author,
+        description,
+        lic='Various (see the original mods)',
+        )
+print('Merged {} hotfixes from {} mods, dropped {} ({} duplicate, {} superseded)'.format(
+    total,
+    len(args.mods),
+    len(removed),
+    sum(1 for r in removed if r.reason == 'duplicate'),
+    sum(1 for r in removed if r.reason == 'superseded'),
+    ), file=sys.stderr)
+
+if args.provenance:
+    with open(args.provenance, 'w') as df:
+        for prov in provenance:
+            print('{}\t{}\t{}'.format(prov.lineno, prov.source_filename, prov.source_lineno), file=df)
+    print('Wrote provenance map to {}'.format(args.provenance))
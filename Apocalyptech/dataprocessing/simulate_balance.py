@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import argparse
+from wldata.wldata import WLData
+from wldata.balanceprobs import BalanceProbabilities
+from wldata.balancesim import BalanceSimulator
+
+# Rolls a bunch of items from a balance using BalanceSimulator (requires
+# NumPy), and reports how often each part and each full configuration showed
+# up.  With `--compare`, the exact probabilities from BalanceProbabilities are
+# reported alongside, to sanity-check either one.  `--benchmark` just
+# measures rolling throughput (in a single process) instead.
+
+parser = argparse.ArgumentParser(
+        description='Monte Carlo loot-roll simulation for balances',
+        )
+parser.add_argument('-n', '--count',
+        type=int,
+        default=1000000,
+        help='Number of items to roll per balance',
+        )
+parser.add_argument('-s', '--seed',
+        type=int,
+        help='Random seed to use',
+        )
+parser.add_argument('--batch-size',
+        type=int,
+        default=250000,
+        help='Number of items to roll at once',
+        )
+parser.add_argument('-t', '--top',
+        type=int,
+        default=10,
+        help='Number of most-common configurations to report',
+        )
+parser.add_argument('-c', '--compare',
+        action='store_true',
+        help='Compare part frequencies against the exact probabilities',
+        )
+parser.add_argument('-b', '--benchmark',
+        action='store_true',
+        help='Only measure throughput: report the best of several timed runs, both with and without tallying results',
+        )
+parser.add_argument('--repeat',
+        type=int,
+        default=3,
+        help='Number of timed runs to do when benchmarking',
+        )
+parser.add_argument('balance',
+        nargs='+',
+        help='Balance(s) to simulate',
+        )
+args = parser.parse_args()
+
+data = WLData()
+
+for bal_name in args.balance:
+
+    print(bal_name)
+    print('')
+
+    sim = BalanceSimulator(data, bal_name, seed=args.seed)
+
+    if args.benchmark:
+        # Warm up first, so one-time costs don't count against the first run
+        sim.roll(min(args.count, args.batch_size), batch_size=args.batch_size)
+        for label, func in [
+                ('roll (with tallies)', lambda: sim.roll(args.count, batch_size=args.batch_size)),
+                ('roll_batch (raw)', lambda: [sim.roll_batch(min(args.batch_size, args.count-i))
+                    for i in range(0, args.count, args.batch_size)]),
+                ]:
+            best = None
+            for _ in range(args.repeat):
+                start_time = time.time()
+                func()
+                elapsed = time.time() - start_time
+                if best is None or elapsed < best:
+                    best = elapsed
+            print('  {}: {} items in {:.3f}s, {:.0f} items/sec'.format(
+                label,
+                args.count,
+                best,
+                args.count/best if best > 0 else 0,
+                ))
+        print('')
+        continue
+
+    start_time = time.time()
+    results = sim.roll(args.count, batch_size=args.batch_size)
+    elapsed = time.time() - start_time
+    print('Rolled {} items in {:.2f}s ({:.0f} items/sec), {} distinct configurations'.format(
+        args.count,
+        elapsed,
+        args.count/elapsed if elapsed > 0 else 0,
+        results.num_configs,
+        ))
+    print('')
+
+    if args.compare:
+        exact = BalanceProbabilities(data, sim.bal).part_probs
+    freqs = results.part_frequencies()
+    for part_name in sim.part_names:
+        freq = freqs.get(part_name, 0)
+        if args.compare:
+            prob = exact.get(part_name, 0)
+            print('  {:7.3%}  (exact: {:7.3%}, diff {:+.3%})  {}'.format(
+                freq, prob, freq-prob, part_name))
+        else:
+            print('  {:7.3%}  {}'.format(freq, part_name))
+    print('')
+
+    print('Top configurations:')
+    print('')
+    for config, freq in results.top_configs(args.top):
+        print('  {:7.3%}'.format(freq))
+        for cat_parts in config:
+            for part_name in cat_parts:
+                print('            {}'.format(part_name))
+    print('')
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import time
+import argparse
+from wldata.wldata import WLData
+from wldata.hotfixsim import HotfixSimulator
+
+# Applies the hotfixes in one or more mods to our serialized data (in
+# memory), and reports any whose object, attribute path, or `prev_val`
+# doesn't match the data.  Mods are applied in the order given, so later
+# mods see the changes made by earlier ones.
+
+parser = argparse.ArgumentParser(
+        description='Simulates applying mods to the serialized data, reporting mismatched hotfixes',
+        )
+parser.add_argument('mods',
+        nargs='+',
+        help='Mod files to apply, in load order',
+        )
+args = parser.parse_args()
+
+data = WLData()
+sim = HotfixSimulator(data)
+start_time = time.time()
+for filename in args.mods:
+    num_issues = len(sim.issues)
+    sim.apply_file(filename)
+    for issue in sim.issues[num_issues:]:
+        print('{}:{}: {}: {}'.format(filename, issue.lineno, issue.kind, issue.detail))
+        print('    {}'.format(issue.record.render()))
+
+print('Verified {} hotfixes against {} objects in {:.1f}s: {} issues, {} unverified, {} skipped'.format(
+    sim.applied,
+    len(sim.objects),
+    time.time()-start_time,
+    len(sim.issues),
+    sim.unverified,
+    sim.skipped,
+    ), file=sys.stderr)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <https://apocalyptech.com/contact.php>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import sys
+import signal
+import argparse
+from wldata.wldata import WLData
+from wldata.dataserver import DataServer
+
+# Runs a WLData daemon in the foreground.  While it's running, any WLData
+# objects created for the same data root (by generator scripts and the like)
+# will get their object data, searches, refs queries, and part constraints
+# from here, so they all share one warm cache.  Stop it with Ctrl-C (or
+# SIGTERM).  Data updates get picked up as clients connect, though it should
+# be restarted after updating WLData itself.
+
+parser = argparse.ArgumentParser(
+        description='Serves WLData object data and indexes to other processes over a Unix socket',
+        )
+parser.add_argument('-d', '--data-dir',
+        type=str,
+        help='Data root to serve (defaults to the data_dir from the wldata config)',
+        )
+parser.add_argument('-p', '--preload',
+        action='store_true',
+        help='Load the part-constraint index at startup, rather than on first use',
+        )
+parser.add_argument('-e', '--rescan-expansions',
+        action='store_true',
+        help='Re-scan the whole data tree for EXPD_ expansion objects at startup',
+        )
+args = parser.parse_args()
+
+data = WLData(data_dir=args.data_dir, daemon=False)
+if args.rescan_expansions:
+    data.rebuild_expansion_index()
+if args.preload:
+    data.load_part_constraint_index()
+server = DataServer(data, data.daemon_socket)
+
+# Treat SIGTERM like Ctrl-C, so that the socket gets removed and WLData's
+# on-disk caches get saved
+signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+print('Serving {} on {}'.format(data.data_dir, data.daemon_socket), file=sys.stderr)
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+print('Handled {} requests'.format(server.requests), file=sys.stderr)
@@ -21,12 +21,12 @@
 
 import os
 import sys
-import csv
 import enum
 import gzip
 import json
 sys.path.append('../../../python_mod_helpers')
 from wldata.wldata import WLData
+from wldata.balancedb import BalanceDB
 from wlhotfixmod.wlhotfixmod import Mod, BVC, BVCF, DataTableValue
 
 # So: Enchantments!
@@ -88,13 +88,14 @@ class Char(enum.Enum):
 
 # Check to make sure we've got the various data we want
 balance_name_mapping_file = '../../dataprocessing/balance_name_mapping.json.gz'
-balance_files = {
-        GearType.GUNS: '../../dataprocessing/gun_balances_long.csv',
-        GearType.MELEE: '../../dataprocessing/melee_balances_long.csv',
-        GearType.WARDS: '../../dataprocessing/ward_balances_long.csv',
-        GearType.SPELLS: '../../dataprocessing/spell_balances_long.csv',
+balance_db_file = '../../dataprocessing/item_balances.sqlite3'
+balance_sheets = {
+        GearType.GUNS: 'gun',
+        GearType.MELEE: 'melee',
+        GearType.WARDS: 'ward',
+        GearType.SPELLS: 'spell',
         }
-if any([not os.path.exists(p) for p in list(balance_files.values()) + [balance_name_mapping_file]]):
+if any([not os.path.exists(p) for p in [balance_db_file, balance_name_mapping_file]]):
     print("This generation script relies on having run Apocalyptech's gen_item_balances.py")
     print("and gen_balance_name_mapping.py scripts (in the dataprocessing directory), which")
     print("output a bunch of processed data in that directory.  You'll have to give those")
@@ -211,6 +212,7 @@ for gear_type, expansions in type_expansions.items():
 # Get balance name mapping
 with gzip.open(balance_name_mapping_file) as df:
     name_map = json.load(df)
+bdb = BalanceDB(balance_db_file)
 
 # Finally, start the mod!
 mod = Mod('enchantment_spawning_tweaks.wlhotfix',
@@ -242,77 +244,75 @@ mod = Mod('enchantment_spawning_tweaks.wlhotfix',
         cats='gear-enchantments, loot-system',
         )
 
-# Loop through Balance CSVs -- these are already in a sensible order, so we're
+# Loop through Balances -- these are already in a sensible order, so we're
 # not gonna bother doing any fancy sorting of our own.
 balances = set()
-for gear_type, filename in balance_files.items():
-    with open(filename) as df:
-        reader = csv.DictReader(df)
-        mod.header(gear_type.value)
-        for row in reader:
-            balance_name = row['Balance']
-            if balance_only and balance_name not in balance_only:
-                continue
-            if balance_name not in balance_exclusions and balance_name not in balances:
-                balances.add(balance_name)
-                mod.comment(name_map[balance_name.lower()])
-                # This *does* seem to legit require a Level hotfix to work properly.  Using
-                # a PATCH seems to work for some gear but not others (the attrs just don't
-                # get updated), and also using PATCH seems to cause random crash issues?
-                # Super weird, but whatever -- just use a MatchAll LEVEL.  Much heaver than
-                # I'd like, but c'est la vie!
+for gear_type, sheet in balance_sheets.items():
+    mod.header(gear_type.value)
+    for balance_info in bdb.get_balances(sheet):
+        balance_name = balance_info.name
+        if balance_only and balance_name not in balance_only:
+            continue
+        if balance_name not in balance_exclusions and balance_name not in balances:
+            balances.add(balance_name)
+            mod.comment(name_map[balance_name.lower()])
+            # This *does* seem to legit require a Level hotfix to work properly.  Using
+            # a PATCH seems to work for some gear but not others (the attrs just don't
+            # get updated), and also using PATCH seems to cause random crash issues?
+            # Super weird, but whatever -- just use a MatchAll LEVEL.  Much heaver than
+            # I'd like, but c'est la vie!
 
-                mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
-                        balance_name,
-                        'RuntimeGenericPartList.PartList',
-                        enchantments[gear_type])
+            mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
+                    balance_name,
+                    'RuntimeGenericPartList.PartList',
+                    enchantments[gear_type])
 
-                # Figure out if we need to tweak PartSet.  This generates a fair amount of
-                # false positives, but I suppose that's better than doing it for *every*
-                # Balance.
-                #
-                # I'd put this in while debugging Balance_DAL_PS_FirstGun, which seems to
-                # ignore our custom enchantment rates.  This ended up not helping anyway,
-                # so eh...  Leaving it in here in case I feel like trying to figure that
-                # out again.
-                if False:
-                    bal_obj = data.get_data(balance_name)[0]
-                    partset_name = bal_obj['PartSetData'][1]
-                    ps_obj = data.get_data(partset_name)[0]
-                    do_partset = False
-                    if 'GenericParts' in ps_obj:
-                        if 'bUseWeight' in ps_obj['GenericParts']:
-                            if not ps_obj['GenericParts']['bUseWeight']:
-                                do_partset = True
-                        else:
+            # Figure out if we need to tweak PartSet.  This generates a fair amount of
+            # false positives, but I suppose that's better than doing it for *every*
+            # Balance.
+            #
+            # I'd put this in while debugging Balance_DAL_PS_FirstGun, which seems to
+            # ignore our custom enchantment rates.  This ended up not helping anyway,
+            # so eh...  Leaving it in here in case I feel like trying to figure that
+            # out again.
+            if False:
+                bal_obj = data.get_data(balance_name)[0]
+                partset_name = bal_obj['PartSetData'][1]
+                ps_obj = data.get_data(partset_name)[0]
+                do_partset = False
+                if 'GenericParts' in ps_obj:
+                    if 'bUseWeight' in ps_obj['GenericParts']:
+                        if not ps_obj['GenericParts']['bUseWeight']:
                             do_partset = True
-                        if 'bEnabled' in ps_obj['GenericParts']:
-                            if not ps_obj['GenericParts']['bEnabled']:
-                                do_partset = True
-                        else:
+                    else:
+                        do_partset = True
+                    if 'bEnabled' in ps_obj['GenericParts']:
+                        if not ps_obj['GenericParts']['bEnabled']:
                             do_partset = True
                     else:
                         do_partset = True
-                    if do_partset:
-                        mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
-                                partset_name,
-                                'GenericParts.bEnabled',
-                                'True')
-                        mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
-                                partset_name,
-                                'GenericParts.bUseWeight',
-                                'True')
-                        mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
-                                partset_name,
-                                'GenericParts.Weight',
-                                BVCF(bvc=1))
-                        # Maybe try tweaking this, too?
-                        mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
-                                balance_name,
-                                'RuntimeGenericPartList.bEnabled',
-                                'True')
+                else:
+                    do_partset = True
+                if do_partset:
+                    mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
+                            partset_name,
+                            'GenericParts.bEnabled',
+                            'True')
+                    mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
+                            partset_name,
+                            'GenericParts.bUseWeight',
+                            'True')
+                    mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
+                            partset_name,
+                            'GenericParts.Weight',
+                            BVCF(bvc=1))
+                    # Maybe try tweaking this, too?
+                    mod.reg_hotfix(Mod.LEVEL, 'MatchAll',
+                            balance_name,
+                            'RuntimeGenericPartList.bEnabled',
+                            'True')
 
-                mod.newline()
+            mod.newline()
 
 mod.header('Blightcaller character weight tweak')
 
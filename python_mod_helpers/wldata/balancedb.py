@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import sqlite3
+import collections
+
+SheetInfo = collections.namedtuple('SheetInfo', [
+    'name',
+    'label',
+    'man_col_name',
+    'type_col_name',
+    ])
+
+BalanceInfo = collections.namedtuple('BalanceInfo', [
+    'name',
+    'sheet',
+    'manufacturer',
+    'gear_type',
+    'rarity',
+    ])
+
+PartInfo = collections.namedtuple('PartInfo', [
+    'category',
+    'parts_min',
+    'parts_max',
+    'weight',
+    'name',
+    'dependencies',
+    'excluders',
+    ])
+
+class BalanceDB(object):
+    """
+    An SQLite database of item balances, as generated by the
+    `dataprocessing/gen_item_balances.py` script.  This holds the same data as
+    that script's `*_balances_long.csv` files, but with balances, categories,
+    parts, and their dependencies/excluders in separate indexed tables, so that
+    other scripts can just query for what they need.
+
+    Balances are grouped into "sheets," named after the CSV files they
+    correspond to (`gun`, `melee`, `ward`, etc).  Within a sheet, balances,
+    categories, and parts are returned in the same order as they're found in
+    the CSVs.
+
+    """
+
+    # Bump this whenever the schema changes
+    db_version = 1
+
+    schema = [
+            """create table sheet (
+                id integer primary key,
+                name text not null unique,
+                label text not null,
+                man_col_name text not null,
+                type_col_name text
+                )""",
+            """create table balance (
+                id integer primary key,
+                sheet_id integer not null references sheet(id),
+                name text not null,
+                manufacturer text not null,
+                gear_type text,
+                rarity text not null
+                )""",
+            'create index balance_name on balance(name)',
+            'create index balance_sheet on balance(sheet_id)',
+            """create table category (
+                id integer primary key,
+                balance_id integer not null references balance(id),
+                label text not null,
+                parts_min integer not null,
+                parts_max integer not null
+                )""",
+            'create index category_balance on category(balance_id)',
+            """create table part (
+                id integer primary key,
+                category_id integer not null references category(id),
+                name text not null,
+                weight real
+                )""",
+            'create index part_category on part(category_id)',
+            'create index part_name on part(name)',
+            """create table part_dependency (
+                part_id integer not null references part(id),
+                name text not null
+                )""",
+            'create index part_dependency_part on part_dependency(part_id)',
+            """create table part_excluder (
+                part_id integer not null references part(id),
+                name text not null
+                )""",
+            'create index part_excluder_part on part_excluder(part_id)',
+            ]
+
+    def __init__(self, filename, create=False):
+        """
+        Opens the balance database at `filename`.  If `create` is `True`, a
+        new empty database will be created instead (replacing any existing
+        file), to be populated with `add_sheet()` and `add_part()`.  Call
+        `close()` when done, to commit the data.
+        """
+        self.filename = filename
+        if create:
+            if os.path.exists(filename):
+                os.unlink(filename)
+        elif not os.path.exists(filename):
+            raise RuntimeError('Balance database not found: {}'.format(filename))
+        self.db = sqlite3.connect(filename)
+        self.curs = self.db.cursor()
+        if create:
+            for statement in self.schema:
+                self.curs.execute(statement)
+            self.curs.execute('pragma user_version={:d}'.format(self.db_version))
+        else:
+            self.curs.execute('pragma user_version')
+            version = self.curs.fetchone()[0]
+            if version != self.db_version:
+                raise RuntimeError('Balance database {} is version {}, expected {} -- regenerate it with gen_item_balances.py'.format(
+                    filename,
+                    version,
+                    self.db_version,
+                    ))
+
+        # Used while populating
+        self._cur_balance = None
+        self._cur_category = None
+
+    def close(self):
+        """
+        Commits any outstanding data and closes the database.
+        """
+        self.db.commit()
+        self.db.close()
+
+    def add_sheet(self, name, label, man_col_name, type_col_name=None):
+        """
+        Adds a new sheet named `name` (`gun`, `melee`, etc), with a
+        human-readable `label`.  `man_col_name` and `type_col_name` are the
+        header labels used in the CSVs for the manufacturer and gear-type
+        columns.  Returns the new sheet ID.
+        """
+        self.curs.execute('insert into sheet (name, label, man_col_name, type_col_name) values (?, ?, ?, ?)',
+                (name, label, man_col_name, type_col_name))
+        return self.curs.lastrowid
+
+    def add_part(self, sheet_id, manufacturer, gear_type, rarity, balance_name,
+            category, parts_min, parts_max, weight, part_name, dependencies, excluders):
+        """
+        Adds a single part row for a balance, as found in the "long" balance
+        CSVs.  Rows for a given balance must be added consecutively, as must
+        the rows for each category, which is the order `gen_item_balances.py`
+        generates them in.  `weight` should be `None` if the weight isn't used.
+        """
+        balance_key = (sheet_id, balance_name)
+        if self._cur_balance is None or self._cur_balance[0] != balance_key:
+            self.curs.execute("""insert into balance
+                    (sheet_id, name, manufacturer, gear_type, rarity)
+                    values (?, ?, ?, ?, ?)""",
+                    (sheet_id, balance_name, manufacturer, gear_type, rarity))
+            self._cur_balance = (balance_key, self.curs.lastrowid)
+            self._cur_category = None
+        balance_id = self._cur_balance[1]
+
+        if self._cur_category is None or self._cur_category[0] != category:
+            self.curs.execute("""insert into category
+                    (balance_id, label, parts_min, parts_max)
+                    values (?, ?, ?, ?)""",
+                    (balance_id, category, parts_min, parts_max))
+            self._cur_category = (category, self.curs.lastrowid)
+        category_id = self._cur_category[1]
+
+        self.curs.execute('insert into part (category_id, name, weight) values (?, ?, ?)',
+                (category_id, part_name, weight))
+        part_id = self.curs.lastrowid
+        self.curs.executemany('insert into part_dependency (part_id, name) values (?, ?)',
+                [(part_id, d) for d in dependencies])
+        self.curs.executemany('insert into part_excluder (part_id, name) values (?, ?)',
+                [(part_id, e) for e in excluders])
+
+    def get_sheets(self):
+        """
+        Returns a list of `SheetInfo` tuples for all the sheets in the database,
+        in the order they were generated.
+        """
+        self.curs.execute('select name, label, man_col_name, type_col_name from sheet order by id')
+        return [SheetInfo(*row) for row in self.curs.fetchall()]
+
+    def get_balances(self, sheet=None):
+        """
+        Returns a list of `BalanceInfo` tuples for all the balances in the
+        database, or just the ones in the sheet named `sheet`, in the order
+        they were generated.
+        """
+        query = """select b.name, s.name, b.manufacturer, b.gear_type, b.rarity
+                from balance b, sheet s
+                where b.sheet_id=s.id"""
+        params = []
+        if sheet is not None:
+            query += ' and s.name=?'
+            params.append(sheet)
+        query += ' order by b.id'
+        self.curs.execute(query, params)
+        return [BalanceInfo(*row) for row in self.curs.fetchall()]
+
+    def get_balance(self, balance_name):
+        """
+        Returns the `BalanceInfo` tuple for the balance `balance_name`, or
+        `None` if it's not in the database.
+        """
+        self.curs.execute("""select b.name, s.name, b.manufacturer, b.gear_type, b.rarity
+                from balance b, sheet s
+                where b.sheet_id=s.id and b.name=?
+                order by b.id
+                limit 1""", (balance_name,))
+        row = self.curs.fetchone()
+        if row is None:
+            return None
+        return BalanceInfo(*row)
+
+    def get_parts(self, balance_name):
+        """
+        Returns a list of `PartInfo` tuples for all the parts which can spawn on
+        `balance_name`, in the order they were generated.  `dependencies` and
+        `excluders` are sorted lists of part names, and `weight` will be `None`
+        if the category doesn't use weights.
+        """
+        self.curs.execute("""select p.id, c.label, c.parts_min, c.parts_max, p.weight, p.name
+                from balance b, category c, part p
+                where b.name=?
+                    and c.balance_id=b.id
+                    and p.category_id=c.id
+                order by p.id""", (balance_name,))
+        rows = self.curs.fetchall()
+        constraints = {}
+        for table in ['part_dependency', 'part_excluder']:
+            self.curs.execute("""select pc.part_id, pc.name
+                    from balance b, category c, part p, {} pc
+                    where b.name=?
+                        and c.balance_id=b.id
+                        and p.category_id=c.id
+                        and pc.part_id=p.id""".format(table), (balance_name,))
+            for part_id, name in self.curs.fetchall():
+                constraints.setdefault((table, part_id), []).append(name)
+        parts = []
+        for part_id, category, parts_min, parts_max, weight, part_name in rows:
+            parts.append(PartInfo(category, parts_min, parts_max, weight, part_name,
+                sorted(constraints.get(('part_dependency', part_id), [])),
+                sorted(constraints.get(('part_excluder', part_id), [])),
+                ))
+        return parts
@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+import random
+from fractions import Fraction
+
+from wlhotfixmod.wlhotfixmod import Balance
+
+class BalanceProbabilities(object):
+    """
+    Computes the exact probability of each part showing up on an item spawned
+    from a Balance, taking into account part weights, multiple-part-selection
+    ranges, `bUseWeightWithMultiplePartSelection`, and part excluders and
+    dependencies (including the ones added by DependencyExpansion objects).
+
+    We walk through the part categories in order, keeping a probability
+    distribution over "states," where a state is just the set of chosen parts
+    which are referenced by the excluders/dependencies of parts in later
+    categories (plus any parts we've been asked to track, for joint
+    probabilities).  Everything else about the partial item can't influence
+    later categories, so the distribution stays small.
+
+    The selection model we're assuming, per category:
+
+      * Parts whose excluders match an already-chosen part (from an earlier
+        category), or whose dependencies don't match any already-chosen part,
+        are unavailable.
+      * Single-select categories choose one part, weighted by BVC-processed
+        weight.  If all weights are zero, nothing is chosen.
+      * Multi-select categories choose a count uniformly from the
+        `MultiplePartSelectionRange` (capped by the number of available
+        parts), then choose that many distinct entries.  If
+        `bUseWeightWithMultiplePartSelection` is set, entries are drawn
+        one-by-one by weight without replacement; otherwise every combination
+        is equally likely.
+
+    Anointments (the Balance's `generics`) aren't considered.
+
+    `track` can be used to pass in a collection of part names which should
+    always be tracked in our states, so that `joint()` can be used on them.
+    If `exact` is `True`, we'll compute with `fractions.Fraction` rather than
+    floats.  Results are available in these attributes:
+
+      * `category_probs`: a list (one entry per category) of dicts mapping
+        part names to the chance that the part was chosen in that category
+      * `part_probs`: a dict mapping part names to the chance that the part
+        appears on the item at all
+      * `approximate`: `True` if any category was too large to compute
+        exactly, and had to be sampled instead (see `max_weighted_states`)
+    """
+
+    # Weighted multi-select categories whose state count goes past this get
+    # sampled (`sample_rolls` times) rather than computed exactly
+    max_weighted_states = 50000
+    sample_rolls = 20000
+
+    def __init__(self, data, bal, track=None, exact=False):
+        """
+        `data` is a WLData object, and `bal` is either a Balance object or the
+        name of a balance to load.
+        """
+        self.data = data
+        if type(bal) == str:
+            self.bal = Balance.from_data(data, bal)
+        else:
+            self.bal = bal
+        if track is None:
+            self.track = set()
+        else:
+            self.track = set(track)
+        self.exact = exact
+        self.approximate = False
+        if exact:
+            self.num = Fraction
+        else:
+            self.num = float
+        self.category_probs = []
+        self.part_probs = {}
+        self.tracked = set()
+        self.final_states = {}
+        self._compute()
+
+    def _compute(self):
+
+        # First gather up part info for each category
+        categories = []
+        seen_count = {}
+        for cat in self.bal.categories:
+            parts = []
+            for part in cat.partlist:
+                if cat.select_multiple and not cat.use_weight_with_mult:
+                    weight = self.num(1)
+                else:
+                    weight = self.num(self.data.process_bvc(part.weight))
+                if part.part_name == 'None':
+                    parts.append((part.part_name, weight, set(), set()))
+                else:
+                    excluders, dependencies = self.data.get_part_constraints(part.part_name)
+                    parts.append((part.part_name, weight, excluders, dependencies))
+            categories.append((cat, parts))
+            for part_name in set(p[0] for p in parts):
+                seen_count[part_name] = seen_count.get(part_name, 0) + 1
+
+        # Parts which live in more than one category have to be tracked
+        # in order to get their overall probability right.
+        tracked = set(self.track)
+        tracked |= set(p for p, c in seen_count.items() if c > 1)
+        self.tracked = tracked
+
+        # Figure out which parts need to be kept in our state after each category
+        relevant_after = [set(tracked)]
+        for cat, parts in reversed(categories):
+            referenced = set(relevant_after[0])
+            for part_name, weight, excluders, dependencies in parts:
+                referenced |= excluders
+                referenced |= dependencies
+            relevant_after.insert(0, referenced)
+
+        # Now walk through
+        states = {frozenset(): self.num(1)}
+        for cat_idx, (cat, parts) in enumerate(categories):
+            relevant = relevant_after[cat_idx+1]
+            new_states = {}
+            cat_probs = {}
+            for state, state_prob in states.items():
+                outcomes, marginals = self._category_outcomes(cat, parts, state, relevant)
+                for new_state, prob in outcomes.items():
+                    new_states[new_state] = new_states.get(new_state, 0) + state_prob*prob
+                for part_name, prob in marginals.items():
+                    cat_probs[part_name] = cat_probs.get(part_name, 0) + state_prob*prob
+            states = new_states
+            self.category_probs.append(cat_probs)
+        self.final_states = states
+
+        # Overall part probabilities.  Parts which are only in one category can
+        # just be taken from there; the others are pulled from the final states.
+        for cat_probs in self.category_probs:
+            for part_name, prob in cat_probs.items():
+                if part_name not in tracked:
+                    self.part_probs[part_name] = prob
+        for part_name in tracked:
+            if part_name in seen_count:
+                self.part_probs[part_name] = self.joint(part_name)
+
+    def _category_outcomes(self, cat, parts, state, relevant):
+        """
+        Given a category `cat` with its `parts`, and the incoming `state`,
+        returns a tuple with two elements: a dict mapping our new states to
+        their probabilities, and a dict mapping part names to the chance
+        that they're chosen in this category.  `relevant` is the set of part
+        names which need to be tracked in the new states.
+        """
+
+        # Figure out which parts are available
+        available = []
+        for part_name, weight, excluders, dependencies in parts:
+            if excluders and not excluders.isdisjoint(state):
+                continue
+            if dependencies and dependencies.isdisjoint(state):
+                continue
+            available.append((part_name, weight))
+        carried = state & relevant
+
+        if cat.select_multiple:
+            outcomes = {}
+            marginals = {}
+            mults = range(cat.num_min, cat.num_max+1)
+            if len(mults) == 0 or len(available) == 0:
+                return ({carried: self.num(1)}, {})
+            mult_prob = self.num(1)/len(mults)
+            for mult in mults:
+                mult = min(mult, len(available))
+                if cat.use_weight_with_mult:
+                    these_outcomes, these_marginals = self._weighted_outcomes(available, mult, carried, relevant)
+                else:
+                    these_outcomes, these_marginals = self._uniform_outcomes(available, mult, carried, relevant)
+                for new_state, prob in these_outcomes.items():
+                    outcomes[new_state] = outcomes.get(new_state, 0) + mult_prob*prob
+                for part_name, prob in these_marginals.items():
+                    marginals[part_name] = marginals.get(part_name, 0) + mult_prob*prob
+            return (outcomes, marginals)
+
+        else:
+            total = sum(weight for part_name, weight in available)
+            if total <= 0:
+                return ({carried: self.num(1)}, {})
+            outcomes = {}
+            marginals = {}
+            for part_name, weight in available:
+                if weight <= 0:
+                    continue
+                prob = weight/total
+                if part_name in relevant:
+                    new_state = carried | {part_name}
+                else:
+                    new_state = carried
+                outcomes[new_state] = outcomes.get(new_state, 0) + prob
+                marginals[part_name] = marginals.get(part_name, 0) + prob
+            return (outcomes, marginals)
+
+    def _uniform_outcomes(self, available, mult, carried, relevant):
+        """
+        Outcomes when choosing `mult` entries from `available`, with every
+        combination equally likely.  The relevant entries are combined by
+        hand; the rest are just counted.
+        """
+        num_total = len(available)
+        relevant_parts = [p for p, w in available if p in relevant]
+        num_other = num_total - len(relevant_parts)
+        combos = {(carried, 0): 1}
+        for part_name in relevant_parts:
+            new_combos = dict(combos)
+            for (combo_state, num), count in combos.items():
+                if num < mult:
+                    key = (combo_state | {part_name}, num+1)
+                    new_combos[key] = new_combos.get(key, 0) + count
+            combos = new_combos
+        total = math.comb(num_total, mult)
+        outcomes = {}
+        for (combo_state, num), count in combos.items():
+            ways = count*math.comb(num_other, mult-num)
+            if ways > 0:
+                outcomes[combo_state] = outcomes.get(combo_state, 0) + self.num(ways)/total
+        # A part is left out only if all of its entries are left out
+        entry_counts = {}
+        for part_name, weight in available:
+            entry_counts[part_name] = entry_counts.get(part_name, 0) + 1
+        marginals = {}
+        for part_name, entries in entry_counts.items():
+            marginals[part_name] = 1 - self.num(math.comb(num_total-entries, mult))/total
+        return (outcomes, marginals)
+
+    def _weighted_outcomes(self, available, mult, carried, relevant):
+        """
+        Outcomes when drawing `mult` entries from `available` one at a time,
+        by weight, without replacement.
+
+        Entries which are interchangeable (irrelevant entries with the same
+        weight, or relevant entries for the same part with the same weight)
+        are grouped together, and our states just count how many entries
+        have been drawn from each group.  Given those counts, every
+        combination of entries within a group is equally likely, so the
+        chance of each part showing up can be worked out from the counts
+        afterwards.  If there are still more than `max_weighted_states`
+        states, we fall back to `_sampled_outcomes()`.
+        """
+
+        # Group up our entries.  Each group is `[weight, num_entries, part]`,
+        # where `part` is only set for relevant groups.
+        group_idx = {}
+        groups = []
+        part_groups = {}
+        for part_name, weight in available:
+            if weight <= 0:
+                continue
+            if part_name in relevant:
+                key = (part_name, weight)
+            else:
+                key = (None, weight)
+            if key not in group_idx:
+                group_idx[key] = len(groups)
+                groups.append([weight, 0, key[0]])
+            groups[group_idx[key]][1] += 1
+            entries = part_groups.setdefault(part_name, {})
+            entries[group_idx[key]] = entries.get(group_idx[key], 0) + 1
+
+        draws = {(0,)*len(groups): self.num(1)}
+        for _ in range(mult):
+            new_draws = {}
+            for counts, prob in draws.items():
+                remaining = sum(weight*(num-drawn) for (weight, num, part_name), drawn in zip(groups, counts))
+                if remaining <= 0:
+                    new_draws[counts] = new_draws.get(counts, 0) + prob
+                    continue
+                for idx, (weight, num, part_name) in enumerate(groups):
+                    if counts[idx] == num:
+                        continue
+                    key = counts[:idx] + (counts[idx]+1,) + counts[idx+1:]
+                    new_draws[key] = new_draws.get(key, 0) + prob*weight*(num-counts[idx])/remaining
+            draws = new_draws
+            if len(draws) > self.max_weighted_states:
+                return self._sampled_outcomes(available, mult, carried, relevant)
+
+        outcomes = {}
+        marginals = {}
+        for counts, prob in draws.items():
+            chosen_names = set(groups[idx][2] for idx, drawn in enumerate(counts)
+                    if drawn > 0 and groups[idx][2] is not None)
+            new_state = carried | chosen_names
+            outcomes[new_state] = outcomes.get(new_state, 0) + prob
+            # A part is left out if none of its entries were among the ones
+            # drawn from each of its groups
+            for part_name, entries in part_groups.items():
+                missing = self.num(1)
+                for idx, num_entries in entries.items():
+                    num = groups[idx][1]
+                    missing *= self.num(math.comb(num-num_entries, counts[idx]))/math.comb(num, counts[idx])
+                if missing != 1:
+                    marginals[part_name] = marginals.get(part_name, 0) + prob*(1-missing)
+        return (outcomes, marginals)
+
+    def _sampled_outcomes(self, available, mult, carried, relevant):
+        """
+        Estimates the outcomes of drawing `mult` entries from `available` by
+        weight, without replacement, by rolling it `sample_rolls` times (with
+        a fixed seed, so results are repeatable).  Only used for categories
+        too big to handle exactly; `approximate` will be set to `True` so
+        callers can tell.
+        """
+        self.approximate = True
+        rng = random.Random(0)
+        entries = [(part_name, float(weight)) for part_name, weight in available if weight > 0]
+        outcome_counts = {}
+        part_counts = {}
+        for _ in range(self.sample_rolls):
+            pool = list(entries)
+            total = sum(weight for part_name, weight in pool)
+            chosen_names = set()
+            for _ in range(mult):
+                if not pool or total <= 0:
+                    break
+                target = rng.random()*total
+                for idx, (part_name, weight) in enumerate(pool):
+                    target -= weight
+                    if target < 0:
+                        break
+                part_name, weight = pool.pop(idx)
+                total -= weight
+                chosen_names.add(part_name)
+            new_state = carried | (chosen_names & relevant)
+            outcome_counts[new_state] = outcome_counts.get(new_state, 0) + 1
+            for part_name in chosen_names:
+                part_counts[part_name] = part_counts.get(part_name, 0) + 1
+        outcomes = {state: self.num(count)/self.sample_rolls for state, count in outcome_counts.items()}
+        marginals = {part_name: self.num(count)/self.sample_rolls for part_name, count in part_counts.items()}
+        return (outcomes, marginals)
+
+    def joint(self, *part_names):
+        """
+        Returns the probability that all of the specified `part_names` show up
+        on the item.  The parts must have been passed in via `track` (or live
+        in more than one category, which means they're tracked automatically),
+        unless only a single part is being asked about.
+        """
+        if len(part_names) == 1 and part_names[0] not in self.tracked:
+            return self.part_probs.get(part_names[0], self.num(0))
+        for part_name in part_names:
+            if part_name not in self.tracked:
+                raise ValueError('Part was not tracked, cannot compute joint probability: {}'.format(part_name))
+        wanted = set(part_names)
+        return sum((prob for state, prob in self.final_states.items() if wanted <= state), self.num(0))
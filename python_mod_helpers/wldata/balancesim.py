@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+
+from wlhotfixmod.wlhotfixmod import Balance
+
+class _SimCategory(object):
+    """
+    A single part category compiled into array form for `BalanceSimulator`.
+    """
+
+    # How many rounds of rejection sampling to do before falling back to an
+    # exact draw
+    rejection_rounds = 4
+
+    def __init__(self, cat, parts, part_idx, bit_idx, num_words):
+        """
+        `parts` is a list of `(part_name, weight, excluders, dependencies)`
+        tuples.  `part_idx` maps part names to their index in the simulator's
+        part list, and `bit_idx` maps constraint-relevant part names to their
+        bit in the state bitmask.
+        """
+        num_entries = len(parts)
+        self.select_multiple = cat.select_multiple
+        self.use_weight = cat.use_weight_with_mult or not cat.select_multiple
+        self.num_min = cat.num_min
+        self.num_max = cat.num_max
+        self.num_entries = num_entries
+
+        self.entry_part = np.array([part_idx[p[0]] for p in parts], dtype=np.int32)
+        if self.use_weight:
+            self.weights = np.array([max(p[1], 0) for p in parts], dtype=np.float64)
+        else:
+            self.weights = np.ones(num_entries, dtype=np.float64)
+
+        # Constraint bitmasks
+        self.exc_masks = np.zeros((num_entries, num_words), dtype=np.uint64)
+        self.dep_masks = np.zeros((num_entries, num_words), dtype=np.uint64)
+        for entry_idx, (part_name, weight, excluders, dependencies) in enumerate(parts):
+            for excluder in excluders:
+                bit = bit_idx[excluder]
+                self.exc_masks[entry_idx, bit//64] |= np.uint64(1 << (bit % 64))
+            for dependency in dependencies:
+                bit = bit_idx[dependency]
+                self.dep_masks[entry_idx, bit//64] |= np.uint64(1 << (bit % 64))
+        self.has_exc = self.exc_masks.any(axis=1)
+        self.has_dep = self.dep_masks.any(axis=1)
+        self.constrained = bool(self.has_exc.any() or self.has_dep.any())
+
+        # What each entry sets in the state bitmask, once chosen
+        self.entry_word = np.zeros(num_entries, dtype=np.int32)
+        self.entry_bit = np.zeros(num_entries, dtype=np.uint64)
+        for entry_idx, (part_name, weight, excluders, dependencies) in enumerate(parts):
+            if part_name in bit_idx:
+                bit = bit_idx[part_name]
+                self.entry_word[entry_idx] = bit//64
+                self.entry_bit[entry_idx] = np.uint64(1 << (bit % 64))
+
+        self.sets_bits = bool(self.entry_bit.any())
+
+        # Alias table (Vose's method) to draw candidates from in constant
+        # time: entry `i` is picked with chance `alias_prob[i]` when its
+        # column comes up, and `alias[i]` is picked otherwise
+        self.total_weight = self.weights.sum()
+        self.alias_prob = np.ones(num_entries, dtype=np.float64)
+        self.alias = np.arange(num_entries, dtype=np.int64)
+        if self.total_weight > 0:
+            scaled = self.weights * num_entries / self.total_weight
+            small = [i for i in range(num_entries) if scaled[i] < 1]
+            large = [i for i in range(num_entries) if scaled[i] >= 1]
+            while small and large:
+                small_idx = small.pop()
+                large_idx = large.pop()
+                self.alias_prob[small_idx] = scaled[small_idx]
+                self.alias[small_idx] = large_idx
+                scaled[large_idx] += scaled[small_idx] - 1
+                if scaled[large_idx] < 1:
+                    small.append(large_idx)
+                else:
+                    large.append(large_idx)
+
+        # How many "slots" this category takes up in a configuration
+        if self.select_multiple:
+            self.num_slots = max(self.num_max, 0)
+        else:
+            self.num_slots = 1
+
+    def _acceptable(self, state, cand, picked):
+        """
+        Given `state` bitmasks and an array of `cand` candidate entries (one per
+        row), returns a boolean array of which candidates are actually allowed,
+        given excluders, dependencies, and the entries already `picked` from
+        this category (a rows x slots array).
+        """
+        ok = np.ones(cand.shape[0], dtype=bool)
+        if self.constrained:
+            ok &= ~(state & self.exc_masks[cand]).any(axis=1)
+            ok &= ~self.has_dep[cand] | (state & self.dep_masks[cand]).any(axis=1)
+        for slot in range(picked.shape[1]):
+            ok &= picked[:, slot] != cand
+        return ok
+
+    def _exact_draw(self, rng, state, picked):
+        """
+        Draws a single entry per row directly from the available weights.  Rows
+        with nothing available get `-1`.
+        """
+        avail = np.ones((state.shape[0], self.num_entries), dtype=bool)
+        if self.has_exc.any():
+            cols = np.flatnonzero(self.has_exc)
+            hit = (state[:, None, :] & self.exc_masks[None, cols, :]).any(axis=2)
+            avail[:, cols] &= ~hit
+        if self.has_dep.any():
+            cols = np.flatnonzero(self.has_dep)
+            hit = (state[:, None, :] & self.dep_masks[None, cols, :]).any(axis=2)
+            avail[:, cols] &= hit
+        rows = np.arange(state.shape[0])
+        for slot in range(picked.shape[1]):
+            has_pick = picked[:, slot] >= 0
+            avail[rows[has_pick], picked[has_pick, slot]] = False
+        cum = np.cumsum(avail * self.weights[None, :], axis=1)
+        total = cum[:, -1]
+        u = rng.random(state.shape[0]) * total
+        idx = (cum <= u[:, None]).sum(axis=1)
+        idx = np.minimum(idx, self.num_entries-1)
+        idx[total <= 0] = -1
+        return idx
+
+    def _candidates(self, rng, count):
+        """
+        Draws `count` candidate entries by weight from our alias table,
+        without regard to constraints.  The integer part of each random value
+        picks the column, and the fractional part decides between the
+        column's entry and its alias.
+        """
+        u = rng.random(count) * self.num_entries
+        cand = np.minimum(u.astype(np.int64), self.num_entries-1)
+        return np.where(u - cand < self.alias_prob[cand], cand, self.alias[cand])
+
+    def _draw(self, rng, state, picked, rows):
+        """
+        Draws one entry for each of the given `rows`, returning an array of
+        entry indexes for the whole batch (`-1` for rows which weren't drawn
+        for, or which had nothing available).
+
+        Candidates are drawn from the category's full alias table and
+        rejected if they're not allowed; that yields the same distribution
+        as renormalizing over the allowed entries, but without having to build
+        a weight table per item.  Rows which keep getting rejected fall back
+        to an exact draw.
+        """
+        idx = np.full(state.shape[0], -1, dtype=np.int64)
+        if self.total_weight <= 0:
+            return idx
+        pending = rows
+        if not self.constrained and picked.shape[1] == 0:
+            # Nothing could be rejected, so there's no need to check
+            idx[pending] = self._candidates(rng, pending.size)
+            return idx
+        for attempt in range(self.rejection_rounds):
+            if pending.size == 0:
+                return idx
+            cand = self._candidates(rng, pending.size)
+            ok = self._acceptable(state[pending], cand, picked[pending])
+            idx[pending[ok]] = cand[ok]
+            pending = pending[~ok]
+        if pending.size > 0:
+            idx[pending] = self._exact_draw(rng, state[pending], picked[pending])
+        return idx
+
+    def sample(self, rng, state):
+        """
+        Chooses parts for every item in the batch, updating `state` in-place.
+        Returns a (batch x slots) array of chosen part indexes (or -1).
+        """
+        batch = state.shape[0]
+        chosen = np.full((batch, self.num_slots), -1, dtype=np.int64)
+        if self.num_entries == 0 or self.num_slots == 0:
+            return chosen.astype(np.int32)
+
+        rows = np.arange(batch)
+        if self.select_multiple:
+            if self.num_max < self.num_min:
+                return chosen.astype(np.int32)
+            counts = rng.integers(self.num_min, self.num_max+1, size=batch)
+        else:
+            counts = np.ones(batch, dtype=np.int64)
+
+        for slot in range(self.num_slots):
+            active = rows[counts > slot]
+            if active.size == 0:
+                break
+            idx = self._draw(rng, state, chosen[:, :slot], active)
+            chosen[:, slot] = idx
+
+        # Update our state bitmasks.  This happens after all the draws, since
+        # constraints are only checked against parts from earlier categories.
+        for slot in range(self.num_slots if self.sets_bits else 0):
+            idx = chosen[:, slot]
+            picked = idx >= 0
+            safe_idx = np.where(picked, idx, 0)
+            bits = np.where(picked, self.entry_bit[safe_idx], np.uint64(0))
+            if state.shape[1] == 1:
+                state[:, 0] |= bits
+            else:
+                words = self.entry_word[safe_idx]
+                for word in range(state.shape[1]):
+                    state[:, word] |= np.where(words == word, bits, np.uint64(0))
+
+        # Convert to part indexes
+        return np.where(chosen >= 0, self.entry_part[np.maximum(chosen, 0)], -1).astype(np.int32)
+
+class SimulationResults(object):
+    """
+    Results from `BalanceSimulator.roll()`.  `part_counts` maps part names to
+    the number of items they showed up on.  Full configurations are stored as
+    arrays of part indexes, and are only converted into part names on request
+    (there can easily be as many distinct configurations as there were rolls).
+    A configuration is a tuple with one entry per category, each of which is a
+    sorted tuple of the part names chosen in that category.
+    """
+
+    def __init__(self, total, part_counts, part_names, slot_counts, configs, counts):
+        self.total = total
+        self.part_counts = part_counts
+        self.part_names = part_names
+        self.slot_counts = slot_counts
+        self.configs = configs
+        self.counts = counts
+
+    @property
+    def num_configs(self):
+        """
+        The number of distinct configurations which were rolled
+        """
+        return len(self.counts)
+
+    def _config_names(self, config):
+        """
+        Converts a single configuration array into part names
+        """
+        named = []
+        offset = 0
+        for num_slots in self.slot_counts:
+            named.append(tuple(self.part_names[i] for i in config[offset:offset+num_slots] if i >= 0))
+            offset += num_slots
+        return tuple(named)
+
+    @property
+    def config_counts(self):
+        """
+        A dict mapping every rolled configuration to the number of times it
+        was rolled.
+        """
+        return {self._config_names(c): int(n) for c, n in zip(self.configs, self.counts)}
+
+    def part_frequencies(self):
+        """
+        Returns a dict mapping part names to the fraction of items they
+        showed up on.
+        """
+        return {p: c/self.total for p, c in self.part_counts.items()}
+
+    def top_configs(self, count=10):
+        """
+        Returns the `count` most-frequently-rolled configurations, as a list of
+        `(config, frequency)` tuples.
+        """
+        order = np.argsort(-self.counts, kind='stable')[:count]
+        return [(self._config_names(self.configs[i]), int(self.counts[i])/self.total) for i in order]
+
+class BalanceSimulator(object):
+    """
+    Monte Carlo part-selection simulator for Balances, using NumPy.  The Balance
+    gets compiled into arrays (weight tables per category, plus excluder and
+    dependency bitmasks over the parts which are actually referenced by
+    constraints), and items are then rolled in vectorized batches.
+
+    This follows the same selection model as `BalanceProbabilities` (see its
+    docstring), so the two can be used to sanity-check each other.  As with
+    that class, anointments are ignored.  Since this takes a Balance object,
+    it can be pointed at a Balance which has been altered by a mod-generation
+    script before its hotfixes get written out.
+    """
+
+    def __init__(self, data, bal, seed=None):
+        """
+        `data` is a WLData object, and `bal` is either a Balance object or the
+        name of a balance to load.  `seed` is passed to NumPy's
+        `default_rng()`.
+        """
+        self.data = data
+        if type(bal) == str:
+            self.bal = Balance.from_data(data, bal)
+        else:
+            self.bal = bal
+        self.rng = np.random.default_rng(seed)
+        self._compile()
+
+    def _compile(self):
+
+        cat_parts = []
+        self.part_names = []
+        part_idx = {}
+        bit_idx = {}
+        referenced = set()
+        for cat in self.bal.categories:
+            parts = []
+            for part in cat.partlist:
+                part_name = part.part_name
+                if cat.select_multiple and not cat.use_weight_with_mult:
+                    weight = 1
+                else:
+                    weight = self.data.process_bvc(part.weight)
+                excluders, dependencies = self.data.get_part_constraints(part_name)
+                parts.append((part_name, weight, excluders, dependencies))
+                referenced |= excluders
+                referenced |= dependencies
+                if part_name not in part_idx:
+                    part_idx[part_name] = len(self.part_names)
+                    self.part_names.append(part_name)
+            cat_parts.append((cat, parts))
+
+        for part_name in sorted(referenced):
+            bit_idx[part_name] = len(bit_idx)
+        self.num_words = max(1, (len(bit_idx)+63)//64)
+
+        self.categories = [_SimCategory(cat, parts, part_idx, bit_idx, self.num_words)
+                for cat, parts in cat_parts]
+
+    def roll_batch(self, batch):
+        """
+        Rolls `batch` items, returning a (batch x slots) array of part indexes
+        (into `self.part_names`), with `-1` for empty slots.  Slots within a
+        multi-select category are sorted.
+        """
+        state = np.zeros((batch, self.num_words), dtype=np.uint64)
+        blocks = []
+        for cat in self.categories:
+            chosen = cat.sample(self.rng, state)
+            if chosen.shape[1] > 1:
+                chosen = np.sort(chosen, axis=1)
+            blocks.append(chosen)
+        if blocks:
+            return np.concatenate(blocks, axis=1)
+        else:
+            return np.zeros((batch, 0), dtype=np.int32)
+
+    @staticmethod
+    def _row_view(slots):
+        """
+        Returns a 1-D view of `slots` with each row as a single opaque value
+        """
+        if slots.shape[1] == 0:
+            slots = np.full((slots.shape[0], 1), -1, dtype=np.int32)
+        slots = np.ascontiguousarray(slots, dtype=np.int32)
+        return slots.view(np.dtype((np.void, slots.shape[1]*4))).reshape(-1)
+
+    def roll(self, count, batch_size=250000):
+        """
+        Rolls `count` items in batches of `batch_size`, returning a
+        SimulationResults object.
+        """
+        num_parts = len(self.part_names)
+        num_slots = sum(cat.num_slots for cat in self.categories)
+        part_counts = np.zeros(num_parts, dtype=np.int64)
+
+        # If they'll fit, configurations get packed into a single int64
+        # apiece, which is a good deal quicker to tally than the opaque byte
+        # strings used otherwise.  Each slot is one digit: 0 if it's empty,
+        # or 1 plus the part's position among its category's parts.  (Empty
+        # slots are -1, which picks up the last column of `digits`, which is
+        # always zero.)
+        digits = np.zeros((num_slots, num_parts+1), dtype=np.int64)
+        digit_parts = []
+        radices = []
+        for cat in self.categories:
+            cat_parts = np.unique(cat.entry_part)
+            for _ in range(cat.num_slots):
+                digits[len(radices), cat_parts] = np.arange(1, len(cat_parts)+1)
+                digit_parts.append(np.concatenate([[-1], cat_parts]).astype(np.int32))
+                radices.append(len(cat_parts)+1)
+        capacity = 1
+        for radix in radices:
+            capacity *= radix
+        packed = num_slots > 0 and capacity < 2**63
+        if packed:
+            multipliers = np.cumprod([1] + radices[:-1]).astype(np.int64)
+
+        # A part can only show up twice on an item if it's in more than one
+        # category, or has more than one entry in a multi-select category.
+        # If that can't happen, parts can just be counted directly.
+        part_slots = np.zeros(num_parts, dtype=np.int64)
+        for cat in self.categories:
+            if cat.num_slots > 1:
+                part_slots += np.bincount(cat.entry_part, minlength=num_parts)
+            elif cat.num_slots == 1:
+                part_slots += np.bincount(cat.entry_part, minlength=num_parts) > 0
+        can_repeat = bool((part_slots > 1).any())
+
+        batch_configs = []
+        batch_counts = []
+        remaining = count
+        while remaining > 0:
+            batch = min(batch_size, remaining)
+            remaining -= batch
+            slots = self.roll_batch(batch)
+
+            # Part frequencies (counting each part at most once per item)
+            if num_parts > 0 and slots.shape[1] > 0 and not can_repeat:
+                part_counts += np.bincount(slots[slots >= 0], minlength=num_parts)
+            elif num_parts > 0 and slots.shape[1] > 0:
+                present = np.zeros((batch, num_parts+1), dtype=bool)
+                present[np.arange(batch)[:, None], np.where(slots >= 0, slots, num_parts)] = True
+                part_counts += present[:, :num_parts].sum(axis=0)
+
+            # Full-configuration frequencies.  Unpacked rows are viewed as
+            # opaque byte strings, which is still quicker than `unique(axis=0)`.
+            if packed:
+                keys = np.zeros(batch, dtype=np.int64)
+                for slot in range(num_slots):
+                    keys += digits[slot][slots[:, slot]] * multipliers[slot]
+            else:
+                keys = self._row_view(slots)
+            configs, config_counts = np.unique(keys, return_counts=True)
+            batch_configs.append(configs)
+            batch_counts.append(config_counts)
+
+        # Merge configurations across batches
+        if len(batch_configs) == 1:
+            configs, counts = batch_configs[0], batch_counts[0]
+        else:
+            configs, inverse = np.unique(np.concatenate(batch_configs), return_inverse=True)
+            counts = np.bincount(inverse.reshape(-1), weights=np.concatenate(batch_counts)).astype(np.int64)
+        if packed:
+            keys = configs
+            configs = np.empty((keys.shape[0], num_slots), dtype=np.int32)
+            for slot, radix in enumerate(radices):
+                keys, digit = np.divmod(keys, radix)
+                configs[:, slot] = digit_parts[slot][digit]
+        else:
+            configs = np.frombuffer(configs.tobytes(), dtype=np.int32).reshape(-1, max(num_slots, 1))[:, :num_slots]
+
+        return SimulationResults(count,
+                {self.part_names[i]: int(c) for i, c in enumerate(part_counts) if c > 0},
+                self.part_names,
+                [cat.num_slots for cat in self.categories],
+                configs,
+                counts)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from wlhotfixmod.wlhotfixmod import BVC, ItemPoolListEntry
+
+class BPChar:
+    """
+    Class to pull in the drop-related info from a BPChar.  Makes use of a dict to cache
+    BPChars, since we're somewhat likely to see repeats.
+
+    In addition to handling all the data that's directly in the BPChar itself, this also
+    recursively loops down to `OwnerClass` BPChars, which seem to be how most of these chars
+    get their "standard" drop pools.  Some convenience methods can be used to roll up all this
+    info into their "finalized" values.  It's entirely possible some of my logic here might
+    be wrong!
+
+    Pools are available both as plain object names (via `get_pools`) and as
+    `ItemPoolListEntry` objects which include their `PoolProbability` and
+    `NumberOfTimesToSelectFromThisPool` values (via `get_pool_entries`).
+    """
+
+    def __init__(self, data, path, bpchar_cache):
+        self.data = data
+        self.path = path
+        self.bpchar_cache = bpchar_cache
+        self.obj = data.get_data(path)
+        self.owner = None
+        self.uiname_target = None
+        self.pools = []
+        self.pool_entries = []
+        self.pool_lists = []
+        self.pt_uinames = []
+        self.pt_pools = []
+        self.pt_pool_entries = []
+        self.pt_pool_lists = []
+        # TODO: figure out if UIName can be gotten via any other methods
+        self.seen_aibalance = False
+        for export in self.obj:
+            if export['export_type'] == 'BlueprintGeneratedClass' and export['_jwp_object_name'].startswith('BPChar'):
+                if 'InheritableComponentHandler' in export and '_jwp_export_dst_type' in export['InheritableComponentHandler']:
+                    handler = self.obj[export['InheritableComponentHandler']['export']-1]
+                    if 'Records' in handler and type(handler['Records']) == list:
+                        for record in handler['Records']:
+                            if 'ComponentTemplate' in record \
+                                    and '_jwp_export_dst_type' in record['ComponentTemplate'] \
+                                    and record['ComponentTemplate']['_jwp_export_dst_type'] == 'AIBalanceStateComponent':
+                                self._process_aibalance(self.obj[record['ComponentTemplate']['export']-1])
+                            if 'ComponentKey' in record and type(record['ComponentKey']) == dict:
+                                ck = record['ComponentKey']
+                                if 'SCSVariableName' in ck and ck['SCSVariableName'] == 'AIBalanceState':
+                                    if 'OwnerClass' in ck and type(ck['OwnerClass']) == list:
+                                        owner_name = ck['OwnerClass'][1]
+                                        if owner_name not in self.bpchar_cache:
+                                            self.bpchar_cache[owner_name] = BPChar(self.data, owner_name, self.bpchar_cache)
+                                        self.owner = self.bpchar_cache[owner_name]
+
+                if not self.seen_aibalance:
+                    if 'SimpleConstructionScript' in export and '_jwp_export_dst_type' in export['SimpleConstructionScript']:
+                        scs = self.obj[export['SimpleConstructionScript']['export']-1]
+                        if 'RootNodes' in scs and type(scs['RootNodes']) == list:
+                            for node_ref in scs['RootNodes']:
+                                if '_jwp_export_dst_type' in node_ref:
+                                    node = self.obj[node_ref['export']-1]
+                                    if 'ComponentTemplate' in node \
+                                            and '_jwp_export_dst_type' in node['ComponentTemplate'] \
+                                            and node['ComponentTemplate']['_jwp_export_dst_type'] == 'AIBalanceStateComponent':
+                                        self._process_aibalance(self.obj[node['ComponentTemplate']['export']-1])
+                                        break
+
+            elif export['export_type'].startswith('BPChar') and export['_jwp_object_name'].startswith('Default__'):
+                if 'TargetableComponent' in export and type(export['TargetableComponent']) == dict and '_jwp_export_dst_type' in export['TargetableComponent']:
+                    tc = self.obj[export['TargetableComponent']['export']-1]
+                    if 'TargetUIName' in tc and type(tc['TargetUIName']) == list:
+                        self.uiname_target = tc['TargetUIName'][1]
+
+        # Custom fix for DLC4's Raging Wyborg.  I think this just happens via object inheritance,
+        # of which there wouldn't be any indication in the data file.
+        if self.path == '/Game/PatchDLC/Indigo4/Enemies/BPChar_DragonMech_Indigo':
+            owner_name='/Game/Enemies/Vorcanar/_Shared/_Design/Character/BPChar_DragonMech'
+            if owner_name not in self.bpchar_cache:
+                self.bpchar_cache[owner_name] = BPChar(self.data, owner_name, self.bpchar_cache)
+            self.owner = self.bpchar_cache[owner_name]
+
+    def _process_aibalance(self, aibsc):
+        if self.seen_aibalance:
+            return
+        self.seen_aibalance = True
+        if 'DropOnDeathItemPools' in aibsc and type(aibsc['DropOnDeathItemPools']) == dict:
+            dodip = aibsc['DropOnDeathItemPools']
+            if 'ItemPools' in dodip and type(dodip['ItemPools']) == list:
+                for itempool in dodip['ItemPools']:
+                    if 'ItemPool' in itempool and 'export' not in itempool['ItemPool']:
+                        self.pools.append(itempool['ItemPool'][1])
+                        self.pool_entries.append(self._pool_entry(itempool))
+            if 'ItemPoolLists' in dodip and type(dodip['ItemPoolLists']) == list:
+                for itempoollist in dodip['ItemPoolLists']:
+                    if 'export' not in itempoollist:
+                        self.pool_lists.append(itempoollist[1])
+        if 'PlayThroughs' in aibsc and type(aibsc['PlayThroughs']) == list:
+            for pt in aibsc['PlayThroughs']:
+                # There's also a bOverrideDisplayName/DisplayName in here, but it seems as though
+                # that's always blank, so not bothering to check it.
+                if 'bOverrideUIDisplayName' in pt and pt['bOverrideUIDisplayName']:
+                    if type(pt['DisplayUIName']) == dict:
+                        self.pt_uinames.append('(none?)')
+                    else:
+                        self.pt_uinames.append(pt['DisplayUIName'][1])
+                else:
+                    self.pt_uinames.append(None)
+                if 'bOverrideDropOnDeathItemPools' in pt and pt['bOverrideDropOnDeathItemPools']:
+                    self.pt_pools.append([])
+                    self.pt_pool_entries.append([])
+                    self.pt_pool_lists.append([])
+                    pt_dodip = pt['DropOnDeathItemPools']
+                    if 'ItemPools' in pt_dodip and type(pt_dodip['ItemPools']) == list:
+                        for itempool in pt_dodip['ItemPools']:
+                            if 'ItemPool' in itempool and 'export' not in itempool['ItemPool']:
+                                self.pt_pools[-1].append(itempool['ItemPool'][1])
+                                self.pt_pool_entries[-1].append(self._pool_entry(itempool))
+                    if 'ItemPoolLists' in pt_dodip and type(pt_dodip['ItemPoolLists']) == list:
+                        for itempoollist in pt_dodip['ItemPoolLists']:
+                            if 'export' not in itempoollist:
+                                self.pt_pool_lists[-1].append(itempoollist[1])
+                else:
+                    self.pt_pools.append(None)
+                    self.pt_pool_entries.append(None)
+                    self.pt_pool_lists.append(None)
+
+    @staticmethod
+    def _pool_entry(itempool):
+        """
+        Converts a serialized `DropOnDeathItemPools.ItemPools` entry into an
+        `ItemPoolListEntry`
+        """
+        if 'PoolProbability' in itempool:
+            probability = BVC.from_data_struct(itempool['PoolProbability'])
+        else:
+            probability = BVC()
+        if 'NumberOfTimesToSelectFromThisPool' in itempool:
+            num = BVC.from_data_struct(itempool['NumberOfTimesToSelectFromThisPool'])
+        else:
+            num = BVC()
+        return ItemPoolListEntry(itempool['ItemPool'][1], probability, num)
+
+    def get_uiname(self, pt=0):
+        uiname = None
+        if self.owner is not None:
+            uiname = self.owner.get_uiname(pt)
+        if self.uiname_target is not None:
+            uiname = self.uiname_target
+        if len(self.pt_uinames) >= pt+1:
+            if self.pt_uinames[pt] is not None:
+                uiname = self.pt_uinames[pt]
+        return uiname
+
+    def get_pools(self, pt=0):
+        pools = []
+        if self.owner is not None:
+            pools = self.owner.get_pools(pt)
+        pools.extend(self.pools)
+        if len(self.pt_pools) >= pt+1:
+            if self.pt_pools[pt] is not None:
+                # TODO: is this really a *full* overwrite?  I think so...
+                # Is it a full rewrite if we're given an *empty* list here?  That I'm not sure of.
+                # (though I think the BL3 Hightower bug was due to an empty list here?)
+                pools = list(self.pt_pools[pt])
+        return pools
+
+    def get_pool_entries(self, pt=0):
+        """
+        As with `get_pools`, but returns `ItemPoolListEntry` objects
+        """
+        entries = []
+        if self.owner is not None:
+            entries = self.owner.get_pool_entries(pt)
+        entries.extend(self.pool_entries)
+        if len(self.pt_pool_entries) >= pt+1:
+            if self.pt_pool_entries[pt] is not None:
+                entries = list(self.pt_pool_entries[pt])
+        return entries
+
+    def get_pool_lists(self, pt=0):
+        pool_lists = []
+        if self.owner is not None:
+            pool_lists = self.owner.get_pool_lists(pt)
+        pool_lists.extend(self.pool_lists)
+        if len(self.pt_pool_lists) >= pt+1:
+            if self.pt_pool_lists[pt] is not None:
+                # TODO: is this really a *full* overwrite?  I think so...
+                # Is it a full rewrite if we're given an *empty* list here?  That I'm not sure of.
+                # (though I think the BL3 Hightower bug was due to an empty list here?)
+                pool_lists = list(self.pt_pool_lists[pt])
+        return pool_lists
+
+    def report(self, pt=0):
+        pools = self.get_pools(pt)
+        pool_lists = self.get_pool_lists(pt)
+        if pools or pool_lists:
+            print(self.path)
+            for pool in pools:
+                print(f' > {pool}')
+            for pool_list in pool_lists:
+                print(f' + {pool_list}')
+            print('')
@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import filecmp
+import multiprocessing
+
+from wlhotfixmod.wlhotfixmod import Balance, ItemPool, BVC
+
+def _files_differ(pairs):
+    """
+    Worker function for `DataDiff`: given a list of `(obj_name, old_path,
+    new_path)` tuples, returns a list of the object names whose files have
+    different contents.
+    """
+    return [obj_name for obj_name, old_path, new_path in pairs
+            if not filecmp.cmp(old_path, new_path, shallow=False)]
+
+class DataDiff(object):
+    """
+    Compares two WLData roots (generally two different patches of the game
+    data), to find out which objects have changed and how.
+
+    This happens in two stages.  First, `find_changed_objects()` walks both
+    data trees and compares the on-disk files for each object -- first by size
+    (and, unless `checksum` is set, modification time), and then by contents
+    only for the files which might've changed, using `jobs` processes.  The
+    `added`, `removed`, and `changed` attributes get populated with lists of
+    object names.
+
+    Then, `diff_object()` can be used on any of the changed objects to get a
+    structured description of what changed.  Balances, PartSets, ItemPools,
+    and DataTables get domain-aware output (such as part weight changes);
+    anything else gets a generic diff of the serialized data.  Only the
+    changed objects ever get loaded/serialized, so the cost of this stage is
+    proportional to the size of the change set.
+    """
+
+    # The "raw" files which make up an object.  If neither side has any of
+    # these, we'll compare JSON serializations instead.
+    raw_extensions = {'.uasset', '.uexp', '.umap', '.ubulk'}
+    all_extensions = raw_extensions | {'.json'}
+
+    # Maximum number of differences reported by the generic diff for a
+    # single object
+    max_generic_diffs = 25
+
+    def __init__(self, old_data, new_data, base='/', checksum=False, jobs=None):
+        """
+        `old_data` and `new_data` are WLData objects pointing at the two data
+        roots to compare.  `base` can be used to restrict the comparison to a
+        subdirectory of the data (such as `/Game/Gear`).  If `checksum` is
+        `True`, files with the same size will always have their contents
+        compared, even if their modification times match.
+        """
+        self.old_data = old_data
+        self.new_data = new_data
+        self.base = '/' + base.strip('/')
+        if self.base == '/':
+            self.base = ''
+        self.checksum = checksum
+        self.jobs = jobs
+        self.added = []
+        self.removed = []
+        self.changed = []
+
+    def _scan_root(self, data_dir):
+        """
+        Walks the data tree at `data_dir` (restricted to our `base`), and
+        returns a dict mapping object names to dicts of their files, keyed by
+        extension, with values of `(path, size, mtime)`.
+        """
+        objects = {}
+        for dirpath, dirnames, filenames in os.walk('{}{}'.format(data_dir, self.base)):
+            obj_dir = dirpath[len(data_dir):].replace(os.sep, '/')
+            for filename in filenames:
+                base_name, ext = os.path.splitext(filename)
+                if ext.lower() not in self.all_extensions:
+                    continue
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                objects.setdefault('{}/{}'.format(obj_dir, base_name), {})[ext.lower()] = (
+                        path, stat.st_size, stat.st_mtime)
+        return objects
+
+    def _object_files(self, files):
+        """
+        Given a dict of files for an object (as returned by `_scan_root`),
+        returns just the ones we'll use to compare: the raw files, if there
+        are any, or the JSON serialization otherwise.
+        """
+        raw = {ext: f for ext, f in files.items() if ext in self.raw_extensions}
+        if raw:
+            return raw
+        return files
+
+    def find_changed_objects(self):
+        """
+        Finds all objects which have been added, removed, or changed between
+        our two data roots, and populates `added`, `removed`, and `changed`
+        (each a sorted list of object names).  Returns the `changed` list.
+        """
+        old_objects = self._scan_root(self.old_data.data_dir)
+        new_objects = self._scan_root(self.new_data.data_dir)
+        self.added = sorted(new_objects.keys() - old_objects.keys())
+        self.removed = sorted(old_objects.keys() - new_objects.keys())
+
+        # First pass: anything where the set of files or their sizes don't
+        # match has definitely changed.  Otherwise, queue up the file pairs
+        # which need their contents compared.
+        changed = set()
+        to_compare = []
+        for obj_name in old_objects.keys() & new_objects.keys():
+            old_files = self._object_files(old_objects[obj_name])
+            new_files = self._object_files(new_objects[obj_name])
+            if old_files.keys() != new_files.keys():
+                changed.add(obj_name)
+                continue
+            for ext, (old_path, old_size, old_mtime) in old_files.items():
+                new_path, new_size, new_mtime = new_files[ext]
+                if old_size != new_size:
+                    changed.add(obj_name)
+                    break
+                if self.checksum or old_mtime != new_mtime:
+                    to_compare.append((obj_name, old_path, new_path))
+
+        # Second pass: compare file contents, in parallel
+        to_compare = [c for c in to_compare if c[0] not in changed]
+        for differing in self._map_parallel(_files_differ, to_compare):
+            changed.update(differing)
+
+        self.changed = sorted(changed)
+        return self.changed
+
+    def _map_parallel(self, func, items, chunk_size=200):
+        """
+        Runs `func` over chunks of `items` in a pool of `jobs` worker
+        processes, yielding the results for each chunk (in no particular
+        order).  Falls back to running in-process if we only have one job, or
+        if we can't fork.
+        """
+        chunks = [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+        jobs = self.jobs
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        jobs = min(jobs, len(chunks))
+        if jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            for chunk in chunks:
+                yield func(chunk)
+        else:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                for result in pool.imap_unordered(func, chunks):
+                    yield result
+
+    @staticmethod
+    def object_kind(obj_data):
+        """
+        Given serialized object data, returns a string describing what kind of
+        object it is, for the purposes of our structured diffs: one of
+        `balance`, `partset`, `itempool`, `datatable`, or `other`.
+        """
+        if not obj_data:
+            return 'other'
+        export = obj_data[0]
+        if export['export_type'] == 'DataTable':
+            return 'datatable'
+        elif export['export_type'] == 'ItemPoolData' or 'BalancedItems' in export:
+            return 'itempool'
+        elif 'ActorPartLists' in export:
+            return 'partset'
+        elif 'PartSetData' in export and len(obj_data) == 1:
+            return 'balance'
+        else:
+            return 'other'
+
+    def diff_object(self, obj_name):
+        """
+        Returns a tuple of `(kind, changes)` describing the differences for
+        `obj_name` between our two data roots, where `kind` is as returned by
+        `object_kind()`, and `changes` is a list of strings.
+        """
+        old_obj = self.old_data.get_data(obj_name)
+        new_obj = self.new_data.get_data(obj_name)
+        kind = self.object_kind(new_obj)
+        if kind != self.object_kind(old_obj):
+            return ('other', ['Object type changed'] + self._diff_generic(old_obj, new_obj))
+        try:
+            if kind == 'balance':
+                changes = self._diff_balance(obj_name)
+            elif kind == 'partset':
+                changes = self._diff_partset(old_obj[0], new_obj[0])
+            elif kind == 'itempool':
+                changes = self._diff_itempool(obj_name)
+            elif kind == 'datatable':
+                changes = self._diff_datatable(old_obj[0], new_obj[0])
+            else:
+                changes = self._diff_generic(old_obj, new_obj)
+        except Exception as e:
+            changes = ['Could not process as {} ({}), falling back to generic diff'.format(kind, e)]
+            changes.extend(self._diff_generic(old_obj, new_obj))
+        if not changes:
+            changes = ['No differences in serialized data']
+        return (kind, changes)
+
+    @staticmethod
+    def _value(data, bvc):
+        """
+        Processes `bvc` into a number using the WLData object `data`, or
+        falls back to the BVC's hotfix representation if that can't be done.
+        """
+        try:
+            return round(data.process_bvc(bvc), 6)
+        except Exception:
+            return str(bvc)
+
+    @staticmethod
+    def _short(obj_name):
+        return obj_name.rsplit('/', 1)[-1]
+
+    def _diff_parts(self, prefix, old_parts, new_parts, noun='part'):
+        """
+        Given two lists of `(part_name, weight)` tuples, where the weights have
+        already been processed, returns a list of changes, each prefixed with
+        `prefix`.  `noun` is what we call the entries in the output.
+        """
+        changes = []
+        old_weights = {}
+        new_weights = {}
+        for part_name, weight in old_parts:
+            old_weights.setdefault(part_name, []).append(weight)
+        for part_name, weight in new_parts:
+            new_weights.setdefault(part_name, []).append(weight)
+        for part_name in sorted(old_weights.keys() | new_weights.keys()):
+            if part_name not in new_weights:
+                changes.append('{}removed {} {} (weight {})'.format(prefix, noun,
+                    self._short(part_name),
+                    ', '.join(str(w) for w in old_weights[part_name])))
+            elif part_name not in old_weights:
+                changes.append('{}added {} {} (weight {})'.format(prefix, noun,
+                    self._short(part_name),
+                    ', '.join(str(w) for w in new_weights[part_name])))
+            elif old_weights[part_name] != new_weights[part_name]:
+                changes.append('{}{} {} weight {}→{}'.format(prefix, noun,
+                    self._short(part_name),
+                    ', '.join(str(w) for w in old_weights[part_name]),
+                    ', '.join(str(w) for w in new_weights[part_name])))
+        return changes
+
+    def _diff_attrs(self, prefix, old_attrs, new_attrs):
+        """
+        Given two dicts of simple attributes, returns a list of changes,
+        each prefixed with `prefix`.
+        """
+        changes = []
+        for attr in old_attrs.keys() | new_attrs.keys():
+            old_val = old_attrs.get(attr)
+            new_val = new_attrs.get(attr)
+            if old_val != new_val:
+                changes.append('{}{} {}→{}'.format(prefix, attr, old_val, new_val))
+        return sorted(changes)
+
+    @staticmethod
+    def _category_attrs(cat):
+        return {
+                'min': cat.num_min,
+                'max': cat.num_max,
+                'select_multiple': cat.select_multiple,
+                'use_weight_with_mult': cat.use_weight_with_mult,
+                'enabled': cat.enabled,
+                }
+
+    def _diff_balance(self, obj_name):
+        """
+        Diffs a Balance, taking into account its whole PartSet chain and any
+        expansions, via `Balance.from_data()`.
+        """
+        old_bal = Balance.from_data(self.old_data, obj_name)
+        new_bal = Balance.from_data(self.new_data, obj_name)
+        changes = []
+        if old_bal.partset_name != new_bal.partset_name:
+            changes.append('partset {}→{}'.format(old_bal.partset_name, new_bal.partset_name))
+        if len(old_bal.categories) != len(new_bal.categories):
+            changes.append('category count {}→{}'.format(len(old_bal.categories), len(new_bal.categories)))
+        for idx in range(max(len(old_bal.categories), len(new_bal.categories))):
+            prefix = 'category {}: '.format(idx)
+            if idx >= len(old_bal.categories):
+                old_attrs, old_parts = {}, []
+            else:
+                cat = old_bal.categories[idx]
+                old_attrs = self._category_attrs(cat)
+                old_parts = [(p.part_name, self._value(self.old_data, p.weight)) for p in cat.partlist]
+            if idx >= len(new_bal.categories):
+                new_attrs, new_parts = {}, []
+            else:
+                cat = new_bal.categories[idx]
+                new_attrs = self._category_attrs(cat)
+                new_parts = [(p.part_name, self._value(self.new_data, p.weight)) for p in cat.partlist]
+            changes.extend(self._diff_attrs(prefix, old_attrs, new_attrs))
+            changes.extend(self._diff_parts(prefix, old_parts, new_parts))
+        changes.extend(self._diff_parts('anointments: ',
+            [(p, self._value(self.old_data, w)) for source, parts in old_bal.generics for p, w in parts],
+            [(p, self._value(self.new_data, w)) for source, parts in new_bal.generics for p, w in parts],
+            ))
+        return changes
+
+    def _partlist(self, data, category):
+        """
+        Returns a list of `(part_name, weight)` tuples from a serialized PartSet
+        category, processing weights with the WLData object `data`.
+        """
+        parts = []
+        if category and 'Parts' in category:
+            for part in category['Parts']:
+                if type(part['PartData']) == list:
+                    part_name = part['PartData'][1]
+                else:
+                    part_name = 'None'
+                parts.append((part_name, self._value(data, BVC.from_data_struct(part['Weight']))))
+        return parts
+
+    @staticmethod
+    def _apl_attrs(apl):
+        attrs = {'enabled': apl.get('bEnabled')}
+        if 'MultiplePartSelectionRange' in apl:
+            attrs['min'] = apl['MultiplePartSelectionRange'].get('Min')
+            attrs['max'] = apl['MultiplePartSelectionRange'].get('Max')
+        attrs['select_multiple'] = apl.get('bCanSelectMultipleParts')
+        attrs['use_weight_with_mult'] = apl.get('bUseWeightWithMultiplePartSelection')
+        return attrs
+
+    def _diff_partset(self, old_export, new_export):
+        """
+        Diffs the ActorPartLists (and GenericParts) of a PartSet.  Note that
+        this just looks at the PartSet itself -- changes to Balances which
+        use it (or to PartSets in the chain) will show up on the Balances.
+        """
+        changes = []
+        old_mode = old_export.get('ActorPartReplacementMode')
+        new_mode = new_export.get('ActorPartReplacementMode')
+        if old_mode != new_mode:
+            changes.append('replacement mode {}→{}'.format(old_mode, new_mode))
+        old_apls = old_export['ActorPartLists']
+        new_apls = new_export['ActorPartLists']
+        if len(old_apls) != len(new_apls):
+            changes.append('category count {}→{}'.format(len(old_apls), len(new_apls)))
+        for idx in range(max(len(old_apls), len(new_apls))):
+            prefix = 'category {}: '.format(idx)
+            old_apl = old_apls[idx] if idx < len(old_apls) else {}
+            new_apl = new_apls[idx] if idx < len(new_apls) else {}
+            changes.extend(self._diff_attrs(prefix, self._apl_attrs(old_apl), self._apl_attrs(new_apl)))
+            changes.extend(self._diff_parts(prefix,
+                self._partlist(self.old_data, old_apl),
+                self._partlist(self.new_data, new_apl)))
+        changes.extend(self._diff_parts('anointments: ',
+            self._partlist(self.old_data, old_export.get('GenericParts')),
+            self._partlist(self.new_data, new_export.get('GenericParts'))))
+        return changes
+
+    def _diff_itempool(self, obj_name):
+        """
+        Diffs the BalancedItems of an ItemPool, via `ItemPool.from_data()`.
+        """
+        entries = []
+        for data in [self.old_data, self.new_data]:
+            pool = ItemPool.from_data(data, obj_name)
+            entries.append([(item.pool_name or item.balance_name, self._value(data, item.weight))
+                for item in pool.balanceditems])
+        return self._diff_parts('', entries[0], entries[1], noun='entry')
+
+    def _diff_datatable(self, old_export, new_export):
+        """
+        Diffs the rows of a DataTable.
+        """
+        changes = []
+        old_rows = {k: v for k, v in old_export.items() if k not in ('export_type', '_apoc_data_ver')}
+        new_rows = {k: v for k, v in new_export.items() if k not in ('export_type', '_apoc_data_ver')}
+        for row_name in sorted(old_rows.keys() | new_rows.keys()):
+            if row_name not in new_rows:
+                changes.append('removed row {}'.format(row_name))
+            elif row_name not in old_rows:
+                changes.append('added row {}'.format(row_name))
+            elif old_rows[row_name] != new_rows[row_name]:
+                changes.extend(self._diff_values(row_name, old_rows[row_name], new_rows[row_name]))
+        return changes
+
+    def _diff_values(self, path, old, new):
+        """
+        Recursively diffs two serialized values, returning a list of changes
+        labelled by their path.
+        """
+        if type(old) == dict and type(new) == dict:
+            changes = []
+            for key in sorted(old.keys() | new.keys(), key=str):
+                if key == '_apoc_data_ver':
+                    continue
+                sub_path = '{}.{}'.format(path, key) if path else str(key)
+                if key not in new:
+                    changes.append('removed {}'.format(sub_path))
+                elif key not in old:
+                    changes.append('added {} = {}'.format(sub_path, new[key]))
+                elif old[key] != new[key]:
+                    changes.extend(self._diff_values(sub_path, old[key], new[key]))
+            return changes
+        elif type(old) == list and type(new) == list and len(old) == len(new):
+            changes = []
+            for idx, (old_item, new_item) in enumerate(zip(old, new)):
+                if old_item != new_item:
+                    changes.extend(self._diff_values('{}[{}]'.format(path, idx), old_item, new_item))
+            return changes
+        else:
+            return ['{}: {}→{}'.format(path, old, new)]
+
+    def _diff_generic(self, old_obj, new_obj):
+        """
+        Generic diff of two serialized objects, capped at `max_generic_diffs`
+        differences.
+        """
+        changes = self._diff_values('', old_obj or [], new_obj or [])
+        if len(changes) > self.max_generic_diffs:
+            extra = len(changes) - self.max_generic_diffs
+            changes = changes[:self.max_generic_diffs]
+            changes.append('... and {} more'.format(extra))
+        return changes
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import socket
+import time
+import struct
+import marshal
+import selectors
+import threading
+
+# Support for sharing one warm WLData across many processes.  A `DataServer`
+# holds a WLData object and answers queries from `DataClient`s over a Unix
+# domain socket.  WLData connects to a running server automatically (see
+# `connect()`), so concurrent generator scripts all share the server's
+# parsed objects and indexes, rather than each loading them from disk.
+#
+# The protocol is about as simple as it gets.  Every message is a frame
+# consisting of a 4-byte big-endian payload length, a single code byte, and
+# the payload itself, which is `marshal`-encoded.  Requests use one of the
+# `OP_*` opcodes as their code, with a tuple of arguments as the payload.
+# Replies use `STATUS_OK` (the payload is the result) or `STATUS_ERROR`
+# (the payload is the error message).  `marshal` handles all the types we
+# need to send (serialized object data is just dicts/lists/strs/numbers,
+# plus we need sets and frozensets for some results), and is faster than
+# both `json` and `pickle`.  It's not safe to use on untrusted data, which
+# is why the socket is only accessible by its owner.
+
+HEADER = struct.Struct('!IB')
+
+(OP_HELLO,
+        OP_GET_DATA,
+        OP_FIND,
+        OP_GLOB,
+        OP_REFS_TO,
+        OP_REFS_TO_MANY,
+        OP_REFS_FROM,
+        OP_REFS_BY_SHORT_NAME,
+        OP_OBJECTS_EXIST,
+        OP_PART_CONSTRAINTS,
+        OP_EXPANSION_FILES,
+        ) = range(11)
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+def _frame(code, payload):
+    """
+    Returns a complete frame with the given `code` and (already-encoded)
+    `payload`.
+    """
+    return HEADER.pack(len(payload), code) + payload
+
+def _recv_exact(sock, size):
+    """
+    Reads exactly `size` bytes from `sock`.  Raises `EOFError` if the
+    connection gets closed first.
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        received = sock.recv_into(view[pos:])
+        if received == 0:
+            raise EOFError('Connection closed')
+        pos += received
+    return buf
+
+def _recv_frame(sock):
+    """
+    Reads a single frame from `sock`, and returns a tuple of its code and
+    its (still-encoded) payload.
+    """
+    length, code = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return (code, _recv_exact(sock, length))
+
+class DataClient(object):
+    """
+    Client side of a `DataServer` connection, listening on `socket_path`.
+    The connection is made lazily, and re-made if we find ourselves in a
+    forked child process (such as one of WLData's `_map_parallel` workers),
+    so that processes never share a socket.  Calls are serialized with a
+    lock, so the client can be used from multiple threads.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._sock = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """
+        Connects to our server, if we don't already have a connection from
+        this process.
+        """
+        if self._sock is None or self._pid != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._pid = os.getpid()
+
+    def call(self, op, *args):
+        """
+        Runs the operation `op` on the server with the given `args`, and
+        returns the result.  Errors raised on the server side are re-raised
+        here as `RuntimeError`.
+        """
+        with self._lock:
+            self._connect()
+            self._sock.sendall(_frame(op, marshal.dumps(args)))
+            status, payload = _recv_frame(self._sock)
+        if status != STATUS_OK:
+            raise RuntimeError('WLData daemon error: {}'.format(marshal.loads(payload)))
+        return marshal.loads(payload)
+
+    def close(self):
+        """
+        Closes our connection, if we have one.
+        """
+        if self._sock is not None and self._pid == os.getpid():
+            self._sock.close()
+        self._sock = None
+
+def connect(socket_path, signature):
+    """
+    Returns a `DataClient` connected to the server listening on
+    `socket_path`, or `None` if there isn't one running, or if its WLData's
+    signature (see `WLData._daemon_signature()`) doesn't match `signature`,
+    meaning it's serving a different data root or using different versions
+    of WLData's indexes.  Servers which fail to bring their indexes up to
+    date during the handshake are refused as well.
+    """
+    if not os.path.exists(socket_path):
+        return None
+    client = DataClient(socket_path)
+    try:
+        server_info = client.call(OP_HELLO)
+    except (OSError, EOFError, RuntimeError):
+        client.close()
+        return None
+    if server_info != signature:
+        client.close()
+        return None
+    return client
+
+class DataServer(object):
+    """
+    Serves queries against the WLData object `data` to `DataClient`s
+    connecting to `socket_path`.  Requests are handled one at a time in a
+    single thread (the refs database connection can't be shared between
+    threads anyway), but any number of clients can be connected at once.
+
+    Replies to `get_data()` are cached already-encoded, so repeated requests
+    for an object are just a dict lookup; the object's serialization on
+    disk gets re-checked on each request, so updated data will be picked up.
+    Part constraints are re-read if their parts' serializations change, as
+    they would be in a fresh WLData.  Searches are always run fresh.  The
+    expansion registry and extra-anointment index get re-checked during
+    client handshakes (see `WLData.refresh_indexes()`), though at most once
+    every `refresh_interval` seconds, since a busy build may be starting
+    up many clients at once.
+
+    `timeout` is the number of seconds we'll wait on a client which has
+    stopped partway through sending a request (or receiving a reply) before
+    giving up on it.
+    """
+
+    def __init__(self, data, socket_path, timeout=30, refresh_interval=5):
+        self.data = data
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.refresh_interval = refresh_interval
+        self.requests = 0
+        self._last_refresh = None
+        self._replies = {}
+        self.ops = {
+                OP_HELLO: self._hello,
+                OP_GET_DATA: self._get_data,
+                OP_FIND: lambda base, prefix, exact: list(self.data.find(base, prefix, exact)),
+                OP_GLOB: lambda glob_pattern: list(self.data.glob(glob_pattern)),
+                OP_REFS_TO: self.data.get_refs_to,
+                OP_REFS_TO_MANY: self.data.get_refs_to_many,
+                OP_REFS_FROM: self.data.get_refs_from,
+                OP_REFS_BY_SHORT_NAME: self.data.get_refs_objects_by_short_name,
+                OP_OBJECTS_EXIST: self.data.objects_exist,
+                OP_PART_CONSTRAINTS: self._part_constraints,
+                OP_EXPANSION_FILES: self._expansion_files,
+                }
+
+    def _hello(self):
+        """
+        Handshake: brings our WLData's indexes up to date (if we haven't
+        checked them recently), and returns its signature for the client to
+        check.
+        """
+        now = time.monotonic()
+        if self._last_refresh is None or now - self._last_refresh >= self.refresh_interval:
+            self.data.refresh_indexes()
+            self._last_refresh = now
+        return self.data._daemon_signature()
+
+    def _json_mtime(self, obj_name):
+        """
+        Returns the mtime of the serialization for `obj_name`, or `None` if
+        there isn't one.
+        """
+        try:
+            return os.stat('{}{}.json'.format(self.data.data_dir, obj_name)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _get_data(self, obj_name):
+        """
+        Returns the complete reply frame for `obj_name`'s data.  Once a
+        reply's been encoded we drop the parsed version from WLData's own
+        cache, since the encoded version is a good deal smaller.
+        """
+        mtime = self._json_mtime(obj_name)
+        if obj_name in self._replies:
+            if self._replies[obj_name][0] == mtime:
+                return self._replies[obj_name][1]
+            self.data.cache.pop(obj_name, None)
+        reply = _frame(STATUS_OK, marshal.dumps(self.data.get_data(obj_name)))
+        self.data.cache.pop(obj_name, None)
+        # get_data() may well have just serialized it
+        self._replies[obj_name] = (self._json_mtime(obj_name), reply)
+        return reply
+
+    def _part_constraints(self, part_names):
+        results = {}
+        for part_name in part_names:
+            if part_name in self.data._merged_constraints \
+                    and part_name in self.data._part_constraints_checked \
+                    and self.data._part_constraints[part_name][2] != self.data._part_json_mtime(part_name):
+                del self.data._merged_constraints[part_name]
+                self.data._part_constraints_checked.discard(part_name)
+            results[part_name] = self.data.get_part_constraints(part_name)
+        return results
+
+    def _expansion_files(self):
+        """
+        Returns the names of the `EXPD_` objects our part constraints are
+        using, so clients can note them in their build traces.
+        """
+        if self.data._expansion_sources is None:
+            self.data._load_expansions()
+        return sorted(self.data._expansion_sources['files'].keys())
+
+    def _handle(self, conn):
+        """
+        Reads a single request from `conn` and sends the reply.  Returns
+        `False` if the connection has been closed (or has broken).
+        """
+        try:
+            op, payload = _recv_frame(conn)
+        except (OSError, EOFError, struct.error):
+            return False
+        self.requests += 1
+        try:
+            if op == OP_GET_DATA:
+                reply = self._get_data(*marshal.loads(payload))
+            else:
+                reply = _frame(STATUS_OK, marshal.dumps(self.ops[op](*marshal.loads(payload))))
+        except (Exception, SystemExit) as e:
+            if isinstance(e, KeyError) and op not in self.ops:
+                message = 'Unknown operation: {}'.format(op)
+            else:
+                message = '{}: {}'.format(type(e).__name__, e)
+            reply = _frame(STATUS_ERROR, marshal.dumps(message))
+        try:
+            conn.sendall(reply)
+        except OSError:
+            return False
+        return True
+
+    def _listen(self):
+        """
+        Creates our listening socket.  A leftover socket file from a server
+        which is no longer running gets removed, but we'll raise an exception
+        if there's a live server already using it.
+        """
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError('A server is already listening on {}'.format(self.socket_path))
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        listener.listen(64)
+        return listener
+
+    def serve_forever(self):
+        """
+        Serves requests until we're interrupted.  The socket file is removed
+        on the way out.
+        """
+        listener = self._listen()
+        sel = selectors.DefaultSelector()
+        sel.register(listener, selectors.EVENT_READ)
+        try:
+            while True:
+                for key, events in sel.select():
+                    if key.fileobj is listener:
+                        conn, addr = listener.accept()
+                        conn.settimeout(self.timeout)
+                        sel.register(conn, selectors.EVENT_READ)
+                    elif not self._handle(key.fileobj):
+                        sel.unregister(key.fileobj)
+                        key.fileobj.close()
+        finally:
+            for key in list(sel.get_map().values()):
+                key.fileobj.close()
+            sel.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import sqlite3
+import collections
+
+DropInfo = collections.namedtuple('DropInfo', [
+    'character',
+    'spawn_option',
+    'playthrough',
+    'uiname',
+    'pool',
+    'balance',
+    'probability',
+    ])
+
+class DropDB(object):
+    """
+    An SQLite database of enemy drops, as generated by the
+    `dataprocessing/gen_drop_db.py` script.  Each "source" is a BPChar (as
+    spawned by a particular SpawnOption, if any) in a given playthrough, with
+    the ItemPools/ItemPoolLists it drops on death.  Those pools are stored in
+    flattened form, mapping directly to the Balances they can produce.
+
+    Probabilities are the expected number of drops of a Balance per death
+    (see `wldata.poolprobs`), which is the chance of it dropping whenever
+    only one can drop.  A probability is `None` if the pool's
+    `PoolProbability` couldn't be computed.  The `drops` view joins all the
+    tables together, for ad-hoc queries.
+    """
+
+    # Bump this whenever the schema changes
+    db_version = 1
+
+    schema = [
+            """create table source (
+                id integer primary key,
+                character text not null,
+                spawn_option text,
+                playthrough integer not null,
+                uiname text
+                )""",
+            'create index source_character on source(character)',
+            'create index source_spawn_option on source(spawn_option)',
+            """create table source_pool (
+                source_id integer not null references source(id),
+                pool text not null,
+                probability real
+                )""",
+            'create index source_pool_source on source_pool(source_id)',
+            'create index source_pool_pool on source_pool(pool)',
+            """create table pool_balance (
+                pool text not null,
+                balance text not null,
+                probability real not null
+                )""",
+            'create index pool_balance_pool on pool_balance(pool)',
+            'create index pool_balance_balance on pool_balance(balance)',
+            """create view drops as
+                select s.character, s.spawn_option, s.playthrough, s.uiname,
+                    sp.pool, pb.balance, sp.probability*pb.probability as probability
+                from source s, source_pool sp, pool_balance pb
+                where sp.source_id=s.id and pb.pool=sp.pool""",
+            ]
+
+    def __init__(self, filename, create=False):
+        """
+        Opens the drop database at `filename`.  If `create` is `True`, a new
+        empty database will be created instead (replacing any existing file),
+        to be populated with `add_source()` and `add_pool()`.  Call `close()`
+        when done, to commit the data.
+        """
+        self.filename = filename
+        if create:
+            if os.path.exists(filename):
+                os.unlink(filename)
+        elif not os.path.exists(filename):
+            raise RuntimeError('Drop database not found: {}'.format(filename))
+        self.db = sqlite3.connect(filename)
+        self.curs = self.db.cursor()
+        if create:
+            for statement in self.schema:
+                self.curs.execute(statement)
+            self.curs.execute('pragma user_version={:d}'.format(self.db_version))
+        else:
+            self.curs.execute('pragma user_version')
+            version = self.curs.fetchone()[0]
+            if version != self.db_version:
+                raise RuntimeError('Drop database {} is version {}, expected {} -- regenerate it with gen_drop_db.py'.format(
+                    filename,
+                    version,
+                    self.db_version,
+                    ))
+
+    def close(self):
+        """
+        Commits any outstanding data and closes the database.
+        """
+        self.db.commit()
+        self.db.close()
+
+    def add_source(self, character, spawn_option, playthrough, uiname, pools):
+        """
+        Adds a drop source: the BPChar `character`, as spawned by the
+        SpawnOption `spawn_option` (or `None`), in playthrough `playthrough`
+        (`0` for Normal, `1` for Chaos), with the display name `uiname`.
+        `pools` is a list of `(pool_name, probability)` tuples, where
+        `probability` is the combined `PoolProbability` and
+        `NumberOfTimesToSelectFromThisPool` (or `None`, if unknown).
+        Returns the new source ID.
+        """
+        self.curs.execute("""insert into source
+                (character, spawn_option, playthrough, uiname)
+                values (?, ?, ?, ?)""",
+                (character, spawn_option, playthrough, uiname))
+        source_id = self.curs.lastrowid
+        self.curs.executemany('insert into source_pool (source_id, pool, probability) values (?, ?, ?)',
+                [(source_id, pool, prob) for pool, prob in pools])
+        return source_id
+
+    def add_pool(self, pool_name, flattened):
+        """
+        Adds the flattened contents of `pool_name`, as a dict mapping Balance
+        names to probabilities (as returned by `PoolProbabilities.get()`).
+        """
+        self.curs.executemany('insert into pool_balance (pool, balance, probability) values (?, ?, ?)',
+                [(pool_name, bal_name, float(prob)) for bal_name, prob in sorted(flattened.items())])
+
+    def _get_drops(self, where, params):
+        """
+        Returns a list of `DropInfo` tuples from our `drops` view, restricted
+        by the SQL `where` clause.
+        """
+        self.curs.execute("""select character, spawn_option, playthrough, uiname,
+                    pool, balance, probability
+                from drops
+                where {}
+                order by character, spawn_option, playthrough, pool, balance""".format(where),
+                params)
+        return [DropInfo(*row) for row in self.curs.fetchall()]
+
+    def get_drops(self, character, playthrough=None):
+        """
+        Returns a list of `DropInfo` tuples for everything the BPChar
+        `character` can drop, optionally restricted to a single playthrough.
+        """
+        if playthrough is None:
+            return self._get_drops('character=?', (character,))
+        else:
+            return self._get_drops('character=? and playthrough=?', (character, playthrough))
+
+    def get_sources(self, balance_name, playthrough=None):
+        """
+        Returns a list of `DropInfo` tuples for every source which can drop
+        `balance_name`, optionally restricted to a single playthrough.
+        """
+        if playthrough is None:
+            return self._get_drops('balance=?', (balance_name,))
+        else:
+            return self._get_drops('balance=? and playthrough=?', (balance_name, playthrough))
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import re
+import copy
+import collections
+
+from wlhotfixmod.wlhotfixmod import RegHotfix, TableHotfix
+from wlhotfixmod.modparser import parse_file
+
+# A problem found while applying a hotfix.  `kind` is one of the
+# `HotfixSimulator.ISSUE_*` constants, and `record` is the hotfix record
+# (`RegHotfix` or `TableHotfix`) which had the problem.
+SimIssue = collections.namedtuple('SimIssue', [
+    'lineno',
+    'record',
+    'kind',
+    'detail',
+    ])
+
+class HotfixValue(str):
+    """
+    A value which has been set by a hotfix, in the hotfix's own syntax.  These
+    get stored in our in-memory objects in place of the original serialized
+    data.
+    """
+    __slots__ = ()
+
+class _PathError(Exception):
+    """
+    Raised internally when an attribute path can't be followed.  `kind` is
+    one of the `HotfixSimulator.ISSUE_*` constants, or `None` if the path
+    just couldn't be verified.
+    """
+    def __init__(self, kind, detail):
+        super().__init__(detail)
+        self.kind = kind
+        self.detail = detail
+
+# Splits an attribute path component like `Foo[2]` into its name and index
+_path_component_re = re.compile(r'^(?P<name>[^\[]*)(?:\[(?P<idx>\d+)\])?$')
+
+class HotfixSimulator(object):
+    """
+    Applies regular and table hotfixes (as read by `wlhotfixmod.modparser`) to
+    in-memory copies of the serialized objects from `WLData`, without
+    launching the game, and reports on hotfixes which don't match the data:
+
+      * `ISSUE_OBJECT`: the object (or export, or DataTable row) doesn't exist
+      * `ISSUE_PATH`: the attribute path doesn't lead anywhere
+      * `ISSUE_PREV_VAL`: the hotfix has a `prev_val` which doesn't match the
+        current value, so the game would skip it
+
+    Attribute paths are followed through structs, arrays (either `Foo[2]` or
+    the `Foo.Foo[2]` syntax), and object references within the same object
+    (`Foo.Object..Bar`).  Values set by hotfixes are stored as `HotfixValue`
+    strings, so later hotfixes see earlier ones.  Anything we can't verify
+    (references to other objects, paths into values set by hotfixes, `prev_val`
+    checks on structs, etc) is counted in `unverified` rather than reported.
+    Each hotfix is counted once: in `applied` if it was verified completely,
+    `unverified` if it wasn't, or `skipped` (see below).
+    The last attribute in a path doesn't have to exist already, since the
+    serializations leave out attributes at their default values.
+
+    Hotfixes are grouped by object before being applied, so each object is
+    loaded once no matter how many hotfixes touch it.  Hotfix ordering is
+    preserved within each object.  Bytecode, mesh, and streaming hotfixes
+    aren't simulated, and are counted in `skipped`.
+    """
+
+    (ISSUE_OBJECT, ISSUE_PATH, ISSUE_PREV_VAL) = ('object', 'path', 'prev_val')
+
+    def __init__(self, data):
+        self.data = data
+        self.objects = {}
+        self.issues = []
+        self.applied = 0
+        self.skipped = 0
+        self.unverified = 0
+
+    def apply_file(self, filename):
+        """
+        Applies all the hotfixes in the mod `filename`
+        """
+        self.apply_records(parse_file(filename, linenos=True))
+
+    def apply_records(self, records):
+        """
+        Applies the hotfixes in `records`, an iterable of `(lineno, record)`
+        tuples (as yielded by `modparser.parse_file()` with `linenos=True`).
+        Non-hotfix records are ignored.  Issues are added to `issues`, in
+        line-number order.
+        """
+        by_package = {}
+        for lineno, record in records:
+            record_type = type(record)
+            if record_type == RegHotfix or record_type == TableHotfix:
+                package = record.obj_name.split('.', 1)[0].split(':', 1)[0]
+                by_package.setdefault(package, []).append((lineno, record))
+            elif hasattr(record, 'hf_type'):
+                self.skipped += 1
+
+        issues = []
+        for package, hotfixes in by_package.items():
+            exports = self.get_object(package)
+            for lineno, record in hotfixes:
+                if exports is None:
+                    issues.append(SimIssue(lineno, record, self.ISSUE_OBJECT,
+                        'Object not found: {}'.format(package)))
+                    continue
+                try:
+                    if self._apply(exports, record):
+                        self.applied += 1
+                    else:
+                        self.unverified += 1
+                except _PathError as e:
+                    if e.kind is None:
+                        self.unverified += 1
+                    else:
+                        issues.append(SimIssue(lineno, record, e.kind, e.detail))
+        issues.sort(key=lambda i: i.lineno)
+        self.issues.extend(issues)
+
+    def get_object(self, package):
+        """
+        Returns our in-memory (possibly hotfixed) copy of the serialized
+        object `package`, or `None` if it doesn't exist.
+        """
+        if package not in self.objects:
+            # If WLData didn't already have this cached, we can just take
+            # ownership of what it loads rather than copying it.
+            was_cached = package in self.data.cache
+            exports = self.data.get_data(package)
+            if exports is not None:
+                if was_cached:
+                    exports = copy.deepcopy(exports)
+                else:
+                    del self.data.cache[package]
+            self.objects[package] = exports
+        return self.objects[package]
+
+    @staticmethod
+    def _find_key(container, name):
+        """
+        Finds the key in dict `container` which matches `name`
+        case-insensitively, or `None`.
+        """
+        if name in container:
+            return name
+        name_lower = name.lower()
+        for key in container.keys():
+            if key.lower() == name_lower:
+                return key
+        return None
+
+    def _find_export(self, exports, record):
+        """
+        Finds the export in `exports` targeted by `record`
+        """
+        if '.' in record.obj_name:
+            export_name = re.split(r'[.:]', record.obj_name)[-1]
+        else:
+            export_name = record.obj_name.rsplit('/', 1)[-1]
+        export_name = export_name.lower()
+        is_table = type(record) == TableHotfix
+        for export in exports:
+            if is_table and export['export_type'] != 'DataTable':
+                continue
+            if export.get('_jwp_object_name', '').lower() == export_name:
+                return export
+        if is_table:
+            for export in exports:
+                if export['export_type'] == 'DataTable':
+                    return export
+        raise _PathError(self.ISSUE_OBJECT, 'Export not found: {}'.format(export_name))
+
+    @staticmethod
+    def _parse_path(attr_name):
+        """
+        Parses the attribute path `attr_name` into a list of steps: tuples
+        of `('attr', name)`, `('index', idx)`, or `('deref', None)`.
+        """
+        steps = []
+        parts = attr_name.split('.')
+        idx = 0
+        while idx < len(parts):
+            part = parts[idx]
+            if part == 'Object' and idx+1 < len(parts) and parts[idx+1] == '':
+                steps.append(('deref', None))
+                idx += 2
+                continue
+            match = _path_component_re.match(part)
+            if not match or match.group('name') == '':
+                raise _PathError(HotfixSimulator.ISSUE_PATH, 'Unparseable attribute path: {}'.format(attr_name))
+            steps.append(('attr', match.group('name')))
+            if match.group('idx') is not None:
+                steps.append(('index', int(match.group('idx'))))
+            idx += 1
+        return steps
+
+    def _follow(self, exports, cur, steps):
+        """
+        Follows `steps` from `cur`, returning the container and key (or
+        index) of the final step, so that it can be read or set.
+        """
+        last_name = None
+        container = None
+        key = None
+        for step_idx, (step_type, step_val) in enumerate(steps):
+            if container is not None:
+                if key is None:
+                    cur = container
+                elif type(container) == list:
+                    cur = container[key]
+                else:
+                    cur = container.get(key)
+                container = None
+            if type(cur) == HotfixValue:
+                raise _PathError(None, 'Path continues into a value set by a hotfix')
+            if step_type == 'attr':
+                if type(cur) == list and last_name is not None and last_name.lower() == step_val.lower():
+                    # `Foo.Foo[2]` syntax: we're already at the array
+                    container, key = cur, None
+                    continue
+                if type(cur) != dict:
+                    raise _PathError(self.ISSUE_PATH, 'Not a struct: {}'.format(step_val))
+                found = self._find_key(cur, step_val)
+                if found is None:
+                    if step_idx == len(steps)-1:
+                        # Probably just at its default value
+                        found = step_val
+                    else:
+                        raise _PathError(self.ISSUE_PATH, 'Attribute not found: {}'.format(step_val))
+                last_name = step_val
+                container, key = cur, found
+            elif step_type == 'index':
+                if type(cur) != list:
+                    raise _PathError(self.ISSUE_PATH, 'Not an array: {}'.format(last_name))
+                if step_val >= len(cur):
+                    raise _PathError(self.ISSUE_PATH, 'Index {} out of range for {} (length {})'.format(
+                        step_val, last_name, len(cur)))
+                container, key = cur, step_val
+            else:
+                if type(cur) == dict and 'export' in cur:
+                    if cur['export'] <= 0 or cur['export'] > len(exports):
+                        raise _PathError(self.ISSUE_PATH, 'Empty object reference in {}'.format(last_name))
+                    container, key = exports[cur['export']-1], None
+                elif type(cur) == list and len(cur) == 2:
+                    raise _PathError(None, 'Reference to external object')
+                else:
+                    raise _PathError(self.ISSUE_PATH, 'Not an object reference: {}'.format(last_name))
+        if key is None:
+            raise _PathError(self.ISSUE_PATH, 'Path does not end with an attribute')
+        return (container, key)
+
+    @staticmethod
+    def _normalize(text):
+        """
+        Normalizes a value's text for comparison purposes
+        """
+        text = str(text).strip().strip('"\'').lower()
+        if '::' in text:
+            text = text.rsplit('::', 1)[-1]
+        return text
+
+    def _value_matches(self, cur, text):
+        """
+        Checks to see if the serialized value `cur` matches the hotfix-syntax
+        value `text`.  Returns `True` or `False`, or `None` if we can't tell.
+        """
+        if type(cur) == bool:
+            return self._normalize(text) == str(cur).lower()
+        if type(cur) in (int, float) or type(cur) == HotfixValue:
+            try:
+                return abs(float(cur) - float(text)) < 1e-6
+            except ValueError:
+                if type(cur) != HotfixValue:
+                    return False
+        if type(cur) == str or type(cur) == HotfixValue:
+            return self._normalize(cur) == self._normalize(text)
+        if type(cur) == dict and 'export' in cur and cur['export'] == 0:
+            return self._normalize(text) == 'none'
+        return None
+
+    def _apply(self, exports, record):
+        """
+        Applies a single hotfix `record` to `exports`.  Returns `True` if the
+        hotfix was verified completely, or `False` if its `prev_val` couldn't
+        be checked (the hotfix is still applied).
+        """
+        cur = self._find_export(exports, record)
+        if type(record) == TableHotfix:
+            row = self._find_key(cur, record.row_name)
+            if row is None or type(cur[row]) != dict:
+                raise _PathError(self.ISSUE_OBJECT, 'Row not found: {}'.format(record.row_name))
+            cur = cur[row]
+        container, key = self._follow(exports, cur, self._parse_path(record.attr_name))
+        verified = True
+        if record.prev_val != '':
+            if type(container) == list:
+                current = container[key]
+            else:
+                current = container.get(key)
+            if current is None:
+                matches = None
+            else:
+                matches = self._value_matches(current, record.prev_val)
+            if matches is None:
+                verified = False
+            elif not matches:
+                raise _PathError(self.ISSUE_PREV_VAL, 'Expected {}, found {}'.format(
+                    record.prev_val, current))
+        container[key] = HotfixValue(record.new_val)
+        return verified
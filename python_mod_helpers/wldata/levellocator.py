@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+class LevelLocator(object):
+    """
+    Figures out which levels (`_P` map names, such as `Intro_P`) an object
+    can be loaded in, by walking "upwards" through the refs database from
+    the object until we hit `_P` maps.  Sublevels are walked through as well,
+    up to the `_P` maps which stream them in (which aren't necessarily in
+    the same directory).  Used by `Mod.narrow_matchall()` to
+    turn `MatchAll` level hotfixes into hotfixes for specific levels.
+
+    Calling the locator with an object name returns a set of level names, or
+    `None` if we can't be sure.  We'll return `None` if we run into an object
+    outside of a map which nothing else references (which means it's probably
+    loaded by code, or from some global list), or if the search gets bigger
+    than `max_nodes` objects or deeper than `max_depth` references, since at
+    that point the object's almost certainly available everywhere anyway.
+
+    Requires a connection to the refs database.
+    """
+
+    def __init__(self, data, max_depth=6, max_nodes=2000):
+        self.data = data
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.cache = {}
+        self.dir_levels = {}
+
+    @staticmethod
+    def _package_name(obj_name):
+        """
+        Converts an object name as used in a hotfix (such as
+        `/Game/Foo/Bar.Default__Bar_C` or `/Game/Maps/Foo/Foo_P.Foo_P:PersistentLevel.Thing`)
+        into the package name used by the refs database.
+        """
+        return obj_name.split('.', 1)[0].split(':', 1)[0]
+
+    @staticmethod
+    def _is_map(obj_name):
+        """
+        Returns `True` if the given package name is part of a map
+        """
+        return '/maps/' in obj_name.lower()
+
+    @staticmethod
+    def _is_persistent(obj_name):
+        """
+        Returns `True` if the given package name is a `_P` map
+        """
+        return obj_name.rsplit('/', 1)[-1].lower().endswith('_p')
+
+    def _guess_map_levels(self, obj_name):
+        """
+        Given a sublevel `obj_name` which nothing references, make our best
+        guess as to which `_P` levels it belongs to: the `_P` map(s) in its
+        directory (or the closest parent directory which has any, without
+        going above the `Maps` directory).  Returns `None` if no `_P` map can
+        be found.
+        """
+        dir_name = obj_name.rsplit('/', 1)[0]
+        while dir_name.rsplit('/', 1)[-1].lower() != 'maps' and dir_name.count('/') > 1:
+            if dir_name not in self.dir_levels:
+                levels = set()
+                for found in self.data.find(dir_name, ''):
+                    found_dir, found_short = found.rsplit('/', 1)
+                    if found_dir == dir_name and found_short.lower().endswith('_p'):
+                        levels.add(found_short)
+                self.dir_levels[dir_name] = levels
+            if self.dir_levels[dir_name]:
+                return set(self.dir_levels[dir_name])
+            dir_name = dir_name.rsplit('/', 1)[0]
+        return None
+
+    def __call__(self, obj_name):
+        """
+        Returns the set of level names that `obj_name` can be loaded in, or
+        `None` if we don't know.
+        """
+        package = self._package_name(obj_name)
+        if package not in self.cache:
+            self.cache[package] = self._locate(package)
+        levels = self.cache[package]
+        if levels is None:
+            return None
+        return set(levels)
+
+    def _locate(self, package):
+        """
+        Does the actual work for `__call__()`
+        """
+        levels = set()
+        seen = {package}
+        frontier = [package]
+        for depth in range(self.max_depth+1):
+            to_expand = []
+            for obj_name in frontier:
+                if self._is_map(obj_name) and self._is_persistent(obj_name):
+                    levels.add(obj_name.rsplit('/', 1)[-1])
+                else:
+                    to_expand.append(obj_name)
+            if not to_expand:
+                return levels
+            if depth == self.max_depth:
+                return None
+            frontier = []
+            for obj_name, refs in self.data.get_refs_to_many(to_expand).items():
+                if not refs:
+                    if self._is_map(obj_name):
+                        # A sublevel which no `_P` map streams in (that we
+                        # can see), so fall back to guessing by directory
+                        map_levels = self._guess_map_levels(obj_name)
+                        if map_levels is None:
+                            return None
+                        levels |= map_levels
+                        continue
+                    # Nothing refers to this, so it's coming from somewhere
+                    # we can't see.
+                    return None
+                for ref in refs:
+                    if ref not in seen:
+                        seen.add(ref)
+                        frontier.append(ref)
+            if len(seen) > self.max_nodes:
+                return None
+        return None
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+from fractions import Fraction
+
+from wlhotfixmod.wlhotfixmod import BVC
+
+class PoolProbabilities(object):
+    """
+    Flattens nested ItemPools and ItemPoolLists into dicts mapping Balance
+    names to the expected number of times that Balance is produced when the
+    object is rolled once.  When nothing along the way selects more than once,
+    that's just the chance of getting the Balance.
+
+    The model we're assuming:
+
+      * An ItemPool chooses one of its `BalancedItems` by BVC-processed
+        `Weight`, `Quantity` times (defaulting to once).  An entry with its
+        own `Quantity` gives that many of its Balance (or rolls its sub-pool
+        that many times) when chosen.
+      * An ItemPoolList rolls each of its `ItemPools` with a chance of
+        `PoolProbability`, `NumberOfTimesToSelectFromThisPool` times.
+
+    Results are memoized, so sub-pools shared between many pools (which is
+    most of them) are only processed once per object.  Encountering a pool
+    which (eventually) contains itself will raise a `RuntimeError`.  If
+    `exact` is `True`, we'll compute with `fractions.Fraction` rather than
+    floats.  ItemPool expansion objects aren't taken into account.
+
+    The returned dicts are shared with our cache, so don't alter them.
+    """
+
+    # Export types which we know how to flatten
+    pool_types = {'ItemPoolData', 'ItemPoolListData'}
+
+    def __init__(self, data, exact=False):
+        self.data = data
+        self.exact = exact
+        if exact:
+            self.num = Fraction
+        else:
+            self.num = float
+        self.cache = {}
+        self.errors = {}
+        self._in_progress = []
+
+    def _bvc_struct(self, struct, default=1):
+        """
+        Processes the serialized BVC `struct` into a number, returning
+        `default` if there isn't one.
+        """
+        if not struct:
+            return self.num(default)
+        return self.num(self.data.process_bvc(BVC.from_data_struct(struct)))
+
+    def get(self, obj_name):
+        """
+        Returns the flattened Balance dict for the ItemPool or ItemPoolList
+        `obj_name`.
+        """
+        if obj_name in self.cache:
+            return self.cache[obj_name]
+        if obj_name in self._in_progress:
+            cycle = self._in_progress[self._in_progress.index(obj_name):] + [obj_name]
+            raise RuntimeError('Pool cycle detected: {}'.format(' -> '.join(cycle)))
+        obj_data = self.data.get_data(obj_name)
+        if not obj_data:
+            raise RuntimeError('Pool not found: {}'.format(obj_name))
+        self._in_progress.append(obj_name)
+        try:
+            export_type = obj_data[0]['export_type']
+            if export_type == 'ItemPoolListData':
+                result = self._flatten_pool_list(obj_data[0])
+            elif export_type == 'ItemPoolData':
+                result = self._flatten_pool(obj_data[0])
+            else:
+                raise RuntimeError('Unknown pool type {} for {}'.format(export_type, obj_name))
+        finally:
+            self._in_progress.pop()
+        self.cache[obj_name] = result
+        return result
+
+    def _add(self, result, sub, factor):
+        """
+        Adds the flattened dict `sub` into `result`, multiplied by `factor`
+        """
+        for bal_name, count in sub.items():
+            result[bal_name] = result.get(bal_name, 0) + factor*count
+
+    def _flatten_pool(self, pool_data):
+        """
+        Flattens the serialized ItemPool export `pool_data`
+        """
+        entries = []
+        for item in pool_data.get('BalancedItems', []):
+            weight = self._bvc_struct(item.get('Weight'))
+            if weight <= 0:
+                continue
+            qty = self._bvc_struct(item.get('Quantity'))
+            if 'export' in item['ItemPoolData']:
+                if 'ResolvedInventoryBalanceData' in item:
+                    sub = {item['ResolvedInventoryBalanceData'][1]: self.num(1)}
+                else:
+                    sub = {item['InventoryBalanceData'][1]: self.num(1)}
+            else:
+                sub = self.get(item['ItemPoolData'][1])
+            entries.append((weight, qty, sub))
+        result = {}
+        total = sum(weight for weight, qty, sub in entries)
+        if total <= 0:
+            return result
+        pool_qty = self._bvc_struct(pool_data.get('Quantity'))
+        for weight, qty, sub in entries:
+            self._add(result, sub, pool_qty*qty*weight/total)
+        return result
+
+    def _flatten_pool_list(self, list_data):
+        """
+        Flattens the serialized ItemPoolList export `list_data`
+        """
+        result = {}
+        for entry in list_data.get('ItemPools', []):
+            if 'ItemPool' not in entry or 'export' in entry['ItemPool']:
+                continue
+            prob = self._bvc_struct(entry.get('PoolProbability'))
+            num = self._bvc_struct(entry.get('NumberOfTimesToSelectFromThisPool'))
+            self._add(result, self.get(entry['ItemPool'][1]), prob*num)
+        return result
+
+    def chance(self, obj_name, balance_name):
+        """
+        Returns the expected number of `balance_name` drops from one roll of
+        the ItemPool or ItemPoolList `obj_name`.
+        """
+        return self.get(obj_name).get(balance_name, self.num(0))
+
+    def get_all(self, base='/'):
+        """
+        Generator which flattens every ItemPool and ItemPoolList found
+        underneath `base`, yielding tuples of `(obj_name, flattened)`.  Pools
+        which can't be processed (such as those containing cycles) are
+        skipped, with the error stored in our `errors` dict.
+        """
+        for obj_name in sorted(self.data.find(base, 'ItemPool')):
+            obj_data = self.data.get_data(obj_name)
+            if not obj_data or obj_data[0]['export_type'] not in self.pool_types:
+                continue
+            try:
+                yield (obj_name, self.get(obj_name))
+            except RuntimeError as e:
+                self.errors[obj_name] = str(e)
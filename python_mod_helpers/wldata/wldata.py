@@ -32,13 +32,117 @@ import re
 import sys
 import json
 import glob
+import atexit
+import hashlib
+import weakref
+import collections.abc
 import appdirs
 import sqlite3
 import subprocess
 import configparser
+import multiprocessing
 
+from wldata import dataserver
+from wlhotfixmod import buildtrace
 from wlhotfixmod.wlhotfixmod import BVC, DependencyExpansion, PartSetExpansion
 
+# Every live WLData object, so that their on-disk caches can be written out
+# when we exit, without keeping the objects themselves alive until then.
+_instances = weakref.WeakSet()
+
+@atexit.register
+def _save_all_caches():
+    """
+    Writes out the changed on-disk caches of every WLData object which is
+    still around.  (Forked worker processes don't run atexit handlers, so
+    they won't clobber these.)
+    """
+    for data in list(_instances):
+        data.save_caches()
+
+def _init_worker(data):
+    """
+    Initializer for worker processes used while building our on-disk indexes.
+    Workers are forked, so `data` is the parent's WLData object (minus anything
+    which gets loaded after the fork).
+    """
+    global _worker_data
+    _worker_data = data
+
+def _read_part_constraints_worker(part_names):
+    """
+    Worker function to read part constraints for a chunk of `part_names`.
+    Returns a list of `(part_name, constraints)` tuples, omitting anything
+    which turned out to not be a part.
+    """
+    results = []
+    for part_name in part_names:
+        was_cached = part_name in _worker_data.cache
+        constraints = _worker_data._read_part_constraints(part_name)
+        if constraints is not None:
+            results.append((part_name, constraints))
+        # We're going through a *lot* of objects here; don't keep them around
+        if not was_cached:
+            del _worker_data.cache[part_name]
+    return results
+
+def _compile_rules(rules):
+    """
+    Compiles a list of `(label, match_type, patterns)` rules into a single
+    anchored regex, returning a tuple of the regex and a list of labels.
+    `match_type` can be `startswith`, `endswith`, or `contains`.  Rules are
+    tried in order, so the first rule which matches wins, same as if we'd
+    checked them one at a time.  After a successful match, the label can be
+    found with `labels[int(match.lastgroup[1:])]`.
+    """
+    alternatives = []
+    labels = []
+    for idx, (label, match_type, patterns) in enumerate(rules):
+        escaped = '|'.join([re.escape(p) for p in patterns])
+        if match_type == 'startswith':
+            regex = '(?:{})'.format(escaped)
+        elif match_type == 'endswith':
+            regex = r'.*(?:{})\Z'.format(escaped)
+        elif match_type == 'contains':
+            regex = '.*(?:{})'.format(escaped)
+        else:
+            raise RuntimeError('Unknown rule match type: {}'.format(match_type))
+        alternatives.append('(?P<r{}>{})'.format(idx, regex))
+        labels.append(label)
+    return (re.compile('(?:{})'.format('|'.join(alternatives)), re.DOTALL), labels)
+
+class _ExpansionRegistry(collections.abc.Mapping):
+    """
+    Read-only mapping of expansion objects (PartSetExpansion or
+    DependencyExpansion), which holds the raw expansion exports for each key
+    and only constructs the actual expansion object the first time that key
+    is requested.
+    """
+
+    def __init__(self, raw, builder):
+        """
+        `raw` is a dict mapping keys to lists of `[obj_name, export]` pairs,
+        and `builder` is a function which takes a key and that list, and
+        returns the expansion object.
+        """
+        self._raw = raw
+        self._builder = builder
+        self._built = {}
+
+    def __getitem__(self, key):
+        if key not in self._built:
+            self._built[key] = self._builder(key, self._raw[key])
+        return self._built[key]
+
+    def __contains__(self, key):
+        return key in self._raw
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
 class WLData(object):
     """
     Class to assist in programmatically inspecting Wonderlands data as much as
@@ -67,6 +171,12 @@ class WLData(object):
 
     This is only required if you want to use the `get_refs_to()` or `get_refs_from()`
     methods of this class.
+
+    Some data which is expensive to compute (such as the part-constraint index)
+    gets persisted to the user's cache directory, in a `wldata` subdirectory.
+    Those files are tied to `data_version` and `data_dir`, and will be
+    regenerated if either changes.  Call `save_caches()` to write them out
+    explicitly; this also happens automatically at exit.
     """
 
     # Data serialization version requirements
@@ -145,12 +255,141 @@ class WLData(object):
     # Expansion Objects
     _expansion_parts = None
     _expansion_dependencies = None
+    _expansion_sources = None
+    _expansion_files_traced = False
+
+    # Part-category rules used by `guess_part_category_name()`.  Each rule is a
+    # tuple of `(label, match_type, patterns)`, and the first matching rule wins
+    # (see `_compile_rules()`).  These three sets get checked at different
+    # points:
+    #
+    #   1) `part_category_hardcode_rules` are matched against the part name
+    #      (case-sensitively) before we even look at the part data.
+    #   2) `part_category_title_rules` are matched against the in-game UI label,
+    #      for parts with a PartInspectionTitleOverride.  If none match, the UI
+    #      label is used as-is.
+    #   3) `part_category_name_rules` are matched against the lowercased part
+    #      name, for parts without a title override.
+    part_category_hardcode_rules = [
+            # Hardcodes for some barrel types -- they report as Barrel Mods, but they're
+            # actually fully-fledged barrels.  (The Cryo barrel here is actually set
+            # properly, but we'll just do 'em all anyway.)
+            ('BARREL', 'endswith', [
+                '/Part_SM_TED_Barrel_Magic_Lightning',
+                '/Part_SM_TED_Barrel_Magic_Cryo',
+                '/Part_SM_TED_Barrel_Magic_Dark',
+                '/Part_SM_TED_Barrel_Magic_Fire',
+                '/Part_SM_TED_Barrel_Magic_Poison',
+                ]),
+            ]
+    part_category_title_rules = [
+            ('TRACKING METHOD', 'startswith', ['TRACKING ']),
+            ('WARD TYPE', 'endswith', [' WARD']),
+            ('RELOAD TYPE', 'endswith', [' MODULE']),
+            ('UNDERBARREL TYPE', 'startswith', ['UNDERBARREL ']),
+            ]
+    part_category_name_rules = [
+            ('MATERIAL', 'contains', ['material', '_mat_']),
+            ('MATERIAL', 'endswith', ['_mat']),
+            ('CAPS', 'contains', ['slidecap']),
+            ('UNDERBARREL TYPE', 'contains', ['underbarrel']),
+            ('MAGAZINE', 'contains', ['magazine', '_mag_']),
+            ('SIGHT', 'contains', ['_sight_']),
+            ('BODY ACCESSORY', 'contains', ['_trigger_']),
+            ('RAIL', 'endswith', ['/part_ar_cov_scopemount']),
+            ('BODY', 'endswith', [
+                '/part_sg_jak_body',
+                '/part_ps_mal_body',
+                '/part_ps_vla_body',
+                ]),
+            # These have the potential to match on stuff it shouldn't, will have
+            # to be careful.  Material parts seem to already show MATERIAL properly,
+            # which is good 'cause they'd match these otherwise.
+            ('RARITY', 'endswith', [
+                '_01_common',
+                '_02_uncommon',
+                '_03_rare',
+                '_04_veryrare',
+                '_05_legendary',
+                ]),
+            ('PINCUSHION', 'contains', ['_pincushiontype_', '_pincuhiontype_']),
+            ('TOOTHERATOR', 'endswith', ['/part_sr_hyp_tootherator']),
+            # This one's super annoying; looks like they're all visual pieces.
+            # Found on Balance_AR_VLA_01_Common and probably other Vladof gear.
+            ('FRONT SIGHT', 'endswith', [
+                '_frontsight',
+                '_frontsight2',
+                '_fs',
+                ]),
+            ('ELEMENTAL', 'endswith', [
+                '_ele_nonelemental',
+                '_ele_none',
+                ]),
+            ('WHITE RIDER', 'endswith', ['/part_sm_dal_mode_whiterider']),
+            ('GREED WARDEN', 'endswith', ['/part_m_blunt_shieldbash']),
+            ('PETTY TANTRUM', 'endswith', ['/part_m_blunt_hammerquake']),
+            ('RAGE HANDLE', 'endswith', ['/part_axe_blade_ragehandle']),
+            ]
+
+    # Compiled versions of the above, populated on first use
+    _part_category_compiled = None
+
+    # InventoryGenericPartExpansionData objects which add extra anointments
+    # to gear, used by `get_extra_anoints()`.
+    generic_part_expansions = [
+            # Nothing yet!
+            ]
+
+    # On-disk cache format versions.  Bump these whenever the format (or the
+    # logic used to generate the data) changes.  (The part-category cache also
+    # gets invalidated automatically whenever the rules above change, and the
+    # extra-anointment cache whenever `generic_part_expansions` changes.)
+    part_constraints_version = 1
+    part_category_names_version = 2
+    expansions_version = 3
+    extra_anoints_version = 2
+
+    # Parts whose Excluders reference themselves (via `export` entries, which
+    # we ignore).  We'll warn about any *other* parts which do this, when
+    # reading part constraints.  Literally hundreds of Pauldron parts do it
+    # too, so those are matched by prefix.
+    known_self_excluders = {
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_01',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_02',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_03',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_04',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_05',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_06',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_07',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Part_M_Sword_HiltMod_08',
+            '/Game/Gear/Melee/Swords/_Shared/_Design/Parts/Hilt_Mod/Hilt_Mod_Mission/Part_M_Sword_HiltMod_07_Mission',
+            '/Game/Gear/Shields/_Design/PartSets/Part_Augment/Safespace/Part_Shield_Aug_Knockback',
+            }
+    known_self_excluder_prefixes = (
+            '/Game/Gear/Pauldrons/_Shared/_Design',
+            '/Game/PatchDLC/Indigo4/Gear/Pauldrons/_Shared/_Design/Parts/PlayerStat/Medium/Shaman',
+            )
+
+    # Short-name prefixes (lowercase) of the objects we read when building the
+    # part-constraint index.  Parts named otherwise just get read as they're
+    # requested.
+    part_name_prefixes = ('part_', 'bpinvpart_')
 
-    def __init__(self):
+    def __init__(self, data_dir=None, daemon=True):
         """
         Initialize a WLData object.  Will create a sample config file if one
         is not already found.  Will require that the "filesystem" section be
         properly filled in, or we'll raise an exception.
+
+        `data_dir` can be used to point at a data root other than the one in
+        the config file (to compare two patches, for instance).  Such roots
+        get their own set of on-disk caches.
+
+        If a WLData daemon (see `wldata.dataserver`) is running for our data
+        root, object data, searches, refs queries, and part constraints will
+        be requested from it, rather than being loaded here (falling back to
+        loading them here if the daemon goes away).  Pass `daemon` as `False`
+        to always load everything locally.
         """
 
         config_dir = appdirs.user_config_dir('wldata')
@@ -190,17 +429,46 @@ class WLData(object):
                 self.config.write(odf)
             print('Updated config file {} with new database section'.format(self.config_file))
 
-        # Convenience var
+        # Convenience vars
         self.data_dir = self.config['filesystem']['data_dir']
+        self.cache_dir = appdirs.user_cache_dir('wldata')
+        self.cache_suffix = ''
+        if data_dir is not None and data_dir != self.data_dir:
+            self.data_dir = data_dir
+            self.cache_suffix = '-{}'.format(hashlib.sha1(data_dir.encode('utf-8')).hexdigest()[:12])
+        self.daemon_socket = os.path.join(self.cache_dir, 'daemon{}.sock'.format(self.cache_suffix))
+        if daemon:
+            self.remote = dataserver.connect(self.daemon_socket, self._daemon_signature())
+        else:
+            self.remote = None
 
         # Now the rest of the vars we'll use
         self.cache = {}
         self.balance_to_extra_anoints = None
+        self._extra_anoint_sources = None
         self.db = None
         self.curs = None
 
-        # Some internal caches
-        self.part_category_name_cache = {}
+        # Some internal caches.  `part_category_name_cache` gets populated
+        # from disk on first use.  Its values are `[label, sources]`, where
+        # `sources` lists `[obj_name, mtime]` for the objects the label came
+        # from; `_part_category_names_checked` holds the entries whose sources
+        # we've verified this run.
+        self.part_category_name_cache = None
+        self._part_category_names_dirty = False
+        self._part_category_names_checked = set()
+
+        # Part-constraint index.  `_part_constraints` holds the raw on-disk
+        # data; `_merged_constraints` has the expansion-merged versions we
+        # actually hand out.
+        self._part_constraints = None
+        self._part_constraints_dirty = False
+        self._part_constraints_checked = set()
+        self._merged_constraints = {}
+
+        # Write out any changed on-disk caches when we exit (or when we're
+        # garbage-collected, whichever comes first)
+        _instances.add(self)
 
     def _enforce_config_section(self, section_name):
         """
@@ -223,9 +491,89 @@ class WLData(object):
             self._enforce_config_section('database')
             if not os.path.exists(self.config['database']['dbfile']):
                 raise RuntimeError('Database file not found: {}'.format(self.config['database']['dbfile']))
+            buildtrace.record('db', os.path.realpath(self.config['database']['dbfile']))
             self.db = sqlite3.connect(self.config['database']['dbfile'])
             self.curs = self.db.cursor()
 
+    def _db_configured(self):
+        """
+        Returns `True` if the refs database has been configured, and exists.
+        """
+        dbfile = self.config.get('database', 'dbfile', fallback='CHANGEME')
+        return dbfile != 'CHANGEME' and os.path.exists(dbfile)
+
+    def _db_mtime(self):
+        """
+        Returns the modification time of the refs database, or `None` if it
+        hasn't been configured.
+        """
+        if self._db_configured():
+            return os.path.getmtime(self.config['database']['dbfile'])
+        return None
+
+    def _daemon_signature(self):
+        """
+        Returns a tuple identifying what a daemon serving this WLData would
+        hand out: our data root and refs database, plus the versions of our
+        data and of the on-disk indexes behind the part constraints.  We'll
+        only use a daemon whose signature matches our own.
+        """
+        return (self.data_dir,
+                self.config.get('database', 'dbfile', fallback='CHANGEME'),
+                WLData.data_version,
+                WLData.part_constraints_version,
+                WLData.expansions_version,
+                )
+
+    def _call_remote(self, op, *args):
+        """
+        Runs the operation `op` on our daemon, returning a tuple of
+        `(True, result)`.  If we don't have a daemon, returns `(False, None)`.
+        If the daemon has gone away partway through our run, we stop using it
+        and also return `(False, None)`, so the caller can carry on locally.
+        """
+        if self.remote is None:
+            return (False, None)
+        try:
+            return (True, self.remote.call(op, *args))
+        except (OSError, EOFError):
+            print('WARNING: Lost connection to WLData daemon, loading data locally instead')
+            self.remote.close()
+            self.remote = None
+            return (False, None)
+
+    def _remote_refs(self, op, *args):
+        """
+        Runs the refs-database operation `op` on our daemon, as with
+        `_call_remote()`.  The database still gets noted in any build trace,
+        as if we'd used it ourselves.
+        """
+        if self.config.get('database', 'dbfile', fallback='CHANGEME') != 'CHANGEME':
+            buildtrace.record('db', os.path.realpath(self.config['database']['dbfile']))
+        return self._call_remote(op, *args)
+
+    def _trace_objects(self, obj_names):
+        """
+        Notes `obj_names` in any build trace, as if we'd loaded them with
+        `get_data()`.  Used for results served from our on-disk caches, which
+        are derived from those objects without loading them.
+        """
+        for obj_name in obj_names:
+            buildtrace.record('data', '{}{}'.format(self.data_dir, obj_name))
+
+    def _trace_remote_expansions(self):
+        """
+        Notes the `EXPD_` objects behind our daemon's expansion registry in
+        any build trace, since part constraints from the daemon include
+        their contents.  Only asks the daemon once, and only if we're
+        tracing.
+        """
+        if buildtrace.trace_file is not None and not self._expansion_files_traced:
+            ok, expansion_files = self._call_remote(dataserver.OP_EXPANSION_FILES)
+            if ok:
+                self._trace_objects(expansion_files)
+                self._expansion_files_traced = True
+
     def _serialize_path(self, base_path):
         """
         Attempts to serialize the given `base_path`.
@@ -248,6 +596,91 @@ class WLData(object):
             print('')
             sys.exit(1)
 
+    def _cache_file(self, cache_name):
+        """
+        Returns the full path to the on-disk cache named `cache_name`.
+        """
+        return os.path.join(self.cache_dir, '{}{}.json'.format(cache_name, self.cache_suffix))
+
+    def _read_cache(self, cache_name, version):
+        """
+        Reads the on-disk cache `cache_name` and returns its data, or `None` if
+        the cache doesn't exist or isn't valid for `version`, our current
+        `data_version`, and our current `data_dir`.
+        """
+        filename = self._cache_file(cache_name)
+        if not os.path.exists(filename):
+            return None
+        try:
+            with open(filename) as df:
+                cache = json.load(df)
+        except (OSError, ValueError):
+            return None
+        if cache.get('version') != version \
+                or cache.get('data_version') != WLData.data_version \
+                or cache.get('data_dir') != self.data_dir:
+            return None
+        return cache['data']
+
+    def _write_cache(self, cache_name, version, data):
+        """
+        Writes `data` out to the on-disk cache `cache_name`, tagged with
+        `version`.  The file is written to a temp file first and then moved
+        into place, so an interrupted write won't leave a corrupt cache.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        filename = self._cache_file(cache_name)
+        temp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temp_filename, 'w') as odf:
+            json.dump({
+                'version': version,
+                'data_version': WLData.data_version,
+                'data_dir': self.data_dir,
+                'data': data,
+                }, odf)
+        os.replace(temp_filename, filename)
+
+    def __del__(self):
+        # If __init__ failed partway through, we won't have anything to save
+        if getattr(self, '_part_constraints_dirty', None) is not None:
+            self.save_caches()
+
+    def save_caches(self):
+        """
+        Writes out any of our on-disk caches which have changed since they were
+        loaded.
+        """
+        if self._part_constraints_dirty:
+            self._write_cache('part_constraints', self.part_constraints_version, self._part_constraints)
+            self._part_constraints_dirty = False
+        if self._part_category_names_dirty:
+            self._write_cache('part_category_names', self._part_category_names_cache_version(), self.part_category_name_cache)
+            self._part_category_names_dirty = False
+
+    def _map_parallel(self, func, items, jobs=None, chunk_size=200):
+        """
+        Runs `func` over chunks of `items` (at most `chunk_size` each) in a
+        pool of `jobs` worker processes (defaulting to the CPU count), yielding
+        the results for each chunk.  Falls back to running in-process if we
+        only have one job, or if we can't fork.  `func` should be one of our
+        module-level worker functions, which operate on `_worker_data`.
+        """
+        chunks = [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        jobs = min(jobs, len(chunks))
+        if jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            _init_worker(self)
+            for chunk in chunks:
+                yield func(chunk)
+        else:
+            with multiprocessing.get_context('fork').Pool(jobs,
+                    initializer=_init_worker,
+                    initargs=(self,),
+                    ) as pool:
+                for result in pool.imap_unordered(func, chunks):
+                    yield result
+
     def get_raw_file_path(self, path_name):
         """
         Returns the full filename to the specified `path_name`.  This can be used
@@ -267,6 +700,12 @@ class WLData(object):
         if obj_name not in self.cache:
 
             base_path = '{}{}'.format(self.data_dir, obj_name)
+            buildtrace.record('data', base_path)
+            if self.remote is not None:
+                ok, obj_data = self._call_remote(dataserver.OP_GET_DATA, obj_name)
+                if ok:
+                    self.cache[obj_name] = obj_data
+                    return obj_data
             json_file = '{}.json'.format(base_path)
             uasset_file = '{}.uasset'.format(base_path)
             umap_file = '{}.umap'.format(base_path)
@@ -297,6 +736,12 @@ class WLData(object):
         yield the object names as they're found.  If `exact` is `True`, this will
         only match on exact object names, rather than a prefix.
         """
+        buildtrace.record('find', self.data_dir, base, prefix, exact)
+        if self.remote is not None:
+            ok, results = self._call_remote(dataserver.OP_FIND, base, prefix, exact)
+            if ok:
+                yield from results
+                return
         prefix_lower = prefix.lower()
         base_dir = '{}{}'.format(self.data_dir, base)
         results = []
@@ -332,6 +777,12 @@ class WLData(object):
         object names which were found.
         https://en.wikipedia.org/wiki/Glob_(programming)
         """
+        buildtrace.record('glob', self.data_dir, glob_pattern)
+        if self.remote is not None:
+            ok, results = self._call_remote(dataserver.OP_GLOB, glob_pattern)
+            if ok:
+                yield from results
+                return
         for filename in glob.glob('{}{}'.format(self.data_dir, glob_pattern)):
             if filename.endswith('.uasset') or filename.endswith('.umap'):
                 yield filename[len(self.data_dir):].rsplit('.', 1)[0]
@@ -377,6 +828,10 @@ class WLData(object):
         a list of those objects.  Requires a database connection to the refs
         database.
         """
+        if self.remote is not None:
+            ok, results = self._remote_refs(dataserver.OP_REFS_TO, obj_name)
+            if ok:
+                return results
         self._connect_db()
         self.curs.execute("""select o2.name
                 from ttwlobject o, ttwlrefs r, ttwlobject o2
@@ -387,6 +842,34 @@ class WLData(object):
                 """, (obj_name,))
         return [row[0] for row in self.curs.fetchall()]
 
+    def get_refs_to_many(self, obj_names, chunk_size=500):
+        """
+        Find all object names which reference any of the given `obj_names`,
+        using one query per `chunk_size` objects, rather than one per object.
+        Returns a dict whose keys are the names from `obj_names`, and whose
+        values are lists of the objects which reference them.  Requires a
+        database connection to the refs database.
+        """
+        if self.remote is not None:
+            ok, results = self._remote_refs(dataserver.OP_REFS_TO_MANY, list(obj_names), chunk_size)
+            if ok:
+                return results
+        self._connect_db()
+        obj_names = list(obj_names)
+        refs = {obj_name: [] for obj_name in obj_names}
+        for i in range(0, len(obj_names), chunk_size):
+            chunk = obj_names[i:i+chunk_size]
+            self.curs.execute("""select o.name, o2.name
+                    from ttwlobject o, ttwlrefs r, ttwlobject o2
+                    where
+                        o.name in ({})
+                        and o.id=r.to_obj
+                        and o2.id=r.from_obj
+                    """.format(','.join(['?']*len(chunk))), chunk)
+            for to_name, from_name in self.curs.fetchall():
+                refs[to_name].append(from_name)
+        return refs
+
     def get_refs_to_data(self, obj_name):
         """
         Find all object names which reference the given `obj_name`, and yield
@@ -402,6 +885,10 @@ class WLData(object):
         a list of those objects.  Requires a database connection to the refs
         database.
         """
+        if self.remote is not None:
+            ok, results = self._remote_refs(dataserver.OP_REFS_FROM, obj_name)
+            if ok:
+                return results
         self._connect_db()
         self.curs.execute("""select o2.name
                 from ttwlobject o, ttwlrefs r, ttwlobject o2
@@ -427,11 +914,46 @@ class WLData(object):
         name (ie: the last path component) is `short_name`.  Requires a
         database connection to the refs database.
         """
+        if self.remote is not None:
+            ok, results = self._remote_refs(dataserver.OP_REFS_BY_SHORT_NAME, short_name)
+            if ok:
+                return results
         self._connect_db()
         self.curs.execute('select name from ttwlobject where name like ?',
                 (f'%/{short_name}',))
         return [row[0] for row in self.curs.fetchall()]
 
+    def objects_exist(self, obj_names, chunk_size=500):
+        """
+        Given a collection of object names (without any subobject/export
+        suffix), returns the set of those which exist.  If the refs database
+        is configured, names are checked against it using one query per
+        `chunk_size` objects.  Anything not found there (or everything, if
+        there's no database) is checked against the data files on disk.
+        """
+        if self.remote is not None:
+            ok, results = self._remote_refs(dataserver.OP_OBJECTS_EXIST, list(obj_names), chunk_size)
+            if ok:
+                return results
+        obj_names = list(set(obj_names))
+        found = set()
+        if self._db_configured():
+            self._connect_db()
+            for i in range(0, len(obj_names), chunk_size):
+                chunk = obj_names[i:i+chunk_size]
+                self.curs.execute('select name from ttwlobject where name in ({})'.format(
+                    ','.join(['?']*len(chunk))), chunk)
+                found.update(row[0] for row in self.curs.fetchall())
+        for obj_name in obj_names:
+            if obj_name in found:
+                continue
+            base_path = '{}{}'.format(self.data_dir, obj_name)
+            for ext in ['uasset', 'umap', 'json']:
+                if os.path.exists('{}.{}'.format(base_path, ext)):
+                    found.add(obj_name)
+                    break
+        return found
+
     def datatable_lookup(self, table_name, row_name, col_name):
         """
         Given a `table_name`, `row_name`, and `col_name`, return the specified cell.
@@ -530,13 +1052,227 @@ class WLData(object):
 
         return self.process_bvc(BVC.from_data_struct(data, cur_dt=cur_dt), cur_dt=cur_dt)
 
-    def _cache_part_category_name(self, part_name, name):
+    def _part_json_mtime(self, part_name):
+        """
+        Returns the modification time of the serialized JSON for `part_name`,
+        or `None` if it hasn't been serialized.
+        """
+        try:
+            return os.path.getmtime('{}{}.json'.format(self.data_dir, part_name))
+        except OSError:
+            return None
+
+    def _read_part_constraints(self, part_name):
+        """
+        Reads the excluders and dependencies for `part_name` directly from its
+        data.  Returns a list of `[excluders, dependencies, mtime]`, where the
+        first two are sorted lists of part names and `mtime` is the timestamp
+        of the serialized JSON we read.  Returns `None` if `part_name` isn't
+        actually a part.  Expansion objects are *not* taken into account here.
+        """
+        part_data = self.get_data(part_name)
+        if not part_data:
+            return None
+        for export in part_data:
+            if export['export_type'].startswith('BPInvPart_'):
+                excluders = set()
+                dependencies = set()
+                if 'Excluders' in export:
+                    for excluder in export['Excluders']:
+                        if 'export' in excluder:
+                            # WTF is going on here?  So far, these objects seem to just reference *themselves* in here.
+                            # Been ignoring a bunch of these on the BL3 side too, so whatever, do that here as well.
+                            if part_name not in self.known_self_excluders \
+                                    and not part_name.startswith(self.known_self_excluder_prefixes):
+                                print('WARNING: {} Excluders references itself?'.format(part_name))
+                        else:
+                            excluders.add(excluder[1])
+                if 'Dependencies' in export:
+                    for dependency in export['Dependencies']:
+                        dependencies.add(dependency[1])
+                return [sorted(excluders), sorted(dependencies), self._part_json_mtime(part_name)]
+        return None
+
+    def build_part_constraint_index(self, jobs=None):
+        """
+        Builds our part-constraint index from scratch, by reading every object
+        in the data tree which looks like it could be a part (anything whose
+        name starts with one of `part_name_prefixes`), using `jobs` worker
+        processes.  Only objects which have already been serialized are read,
+        so this never has to run the serializer.  The index will be written to
+        disk and used on subsequent runs.  Parts which don't get picked up
+        here will get added to the index as they're requested.
+        """
+        candidates = sorted([obj_name for obj_name in self.find('/', '')
+            if obj_name.rsplit('/', 1)[-1].lower().startswith(self.part_name_prefixes)
+                and os.path.exists('{}{}.json'.format(self.data_dir, obj_name))])
+        self._part_constraints = {}
+        for results in self._map_parallel(_read_part_constraints_worker, candidates, jobs=jobs):
+            for part_name, constraints in results:
+                self._part_constraints[part_name] = constraints
+        self._part_constraints_checked = set(self._part_constraints.keys())
+        self._merged_constraints = {}
+        self._part_constraints_dirty = True
+        self.save_caches()
+
+    def load_part_constraint_index(self, jobs=None):
+        """
+        Loads our part-constraint index from disk, building it (with `jobs`
+        worker processes) if it doesn't exist yet or is out of date.  This
+        happens automatically when needed, but scripts which fork off their
+        own worker processes may want to call this first, so the workers all
+        share the loaded index.
+        """
+        if self._part_constraints is None:
+            self._part_constraints = self._read_cache('part_constraints', self.part_constraints_version)
+            if self._part_constraints is None:
+                self.build_part_constraint_index(jobs=jobs)
+
+    def get_part_constraints(self, part_name):
+        """
+        Returns a tuple of `(excluders, dependencies)` for the given `part_name`,
+        each of which is a frozenset of part names.  This includes any additions
+        from DependencyExpansion objects (see `expansion_dependencies`).  Results
+        come from our on-disk part-constraint index, which is built the first
+        time this is called (see `build_part_constraint_index()`).  Individual
+        parts whose serializations have changed since the index was built will
+        be re-read.  Raises an Exception if `part_name` isn't a part.
+        """
+        if part_name in self._merged_constraints:
+            return self._merged_constraints[part_name]
+
+        if not part_name or part_name == 'None':
+            self._merged_constraints[part_name] = (frozenset(), frozenset())
+            return self._merged_constraints[part_name]
+
+        if self.remote is not None:
+            self._trace_objects([part_name])
+            self._trace_remote_expansions()
+            ok, results = self._call_remote(dataserver.OP_PART_CONSTRAINTS, [part_name])
+            if ok:
+                self._merged_constraints.update(results)
+                return self._merged_constraints[part_name]
+
+        self.load_part_constraint_index()
+        if part_name not in self._part_constraints_checked:
+            if part_name not in self._part_constraints \
+                    or self._part_constraints[part_name][2] != self._part_json_mtime(part_name):
+                constraints = self._read_part_constraints(part_name)
+                if constraints is None:
+                    raise Exception('Could not find part export for {}'.format(part_name))
+                self._part_constraints[part_name] = constraints
+                self._part_constraints_dirty = True
+            self._part_constraints_checked.add(part_name)
+        self._trace_objects([part_name])
+
+        excluders, dependencies, mtime = self._part_constraints[part_name]
+        excluders = set(excluders)
+        dependencies = set(dependencies)
+        if part_name in self.expansion_dependencies:
+            excluders |= self.expansion_dependencies[part_name].excluders
+            dependencies |= self.expansion_dependencies[part_name].dependencies
+        self._merged_constraints[part_name] = (frozenset(excluders), frozenset(dependencies))
+        return self._merged_constraints[part_name]
+
+    def get_part_constraints_many(self, part_names):
         """
-        Caches a part category name (stupid little func for code simplification)
+        Returns a dict mapping each of the given `part_names` to its
+        `(excluders, dependencies)` tuple, as returned by
+        `get_part_constraints()`.  If we're using a daemon, the ones we don't
+        already have are requested all at once.
         """
-        self.part_category_name_cache[part_name] = name
+        if self.remote is not None:
+            part_names = list(part_names)
+            missing = [p for p in set(part_names) if p not in self._merged_constraints]
+            if missing:
+                self._trace_objects(missing)
+                self._trace_remote_expansions()
+                ok, results = self._call_remote(dataserver.OP_PART_CONSTRAINTS, missing)
+                if ok:
+                    self._merged_constraints.update(results)
+        return {part_name: self.get_part_constraints(part_name) for part_name in part_names}
+
+    @classmethod
+    def _compiled_part_category_rules(cls):
+        """
+        Returns a tuple of our three compiled part-category rule sets (see
+        `part_category_hardcode_rules` and friends), compiling them on first
+        use.
+        """
+        if cls._part_category_compiled is None:
+            cls._part_category_compiled = (
+                    _compile_rules(cls.part_category_hardcode_rules),
+                    _compile_rules(cls.part_category_title_rules),
+                    _compile_rules(cls.part_category_name_rules),
+                    )
+        return cls._part_category_compiled
+
+    @classmethod
+    def _part_category_names_cache_version(cls):
+        """
+        Returns the version string for our on-disk part-category cache, which
+        incorporates a hash of the rule tables so that changes to the rules
+        automatically invalidate it.
+        """
+        rules_hash = hashlib.sha1(repr((
+            cls.part_category_hardcode_rules,
+            cls.part_category_title_rules,
+            cls.part_category_name_rules,
+            )).encode('utf-8')).hexdigest()
+        return '{}-{}'.format(cls.part_category_names_version, rules_hash)
+
+    def _load_part_category_names(self):
+        """
+        Loads our part-category name cache from disk, if we haven't already.
+        """
+        if self.part_category_name_cache is None:
+            self.part_category_name_cache = self._read_cache('part_category_names',
+                    self._part_category_names_cache_version())
+            if self.part_category_name_cache is None:
+                self.part_category_name_cache = {}
+
+    def _cache_part_category_name(self, part_name, name, sources=()):
+        """
+        Caches a part category name (stupid little func for code simplification).
+        `sources` are the names of the objects it was derived from.
+        """
+        self.part_category_name_cache[part_name] = [name,
+                [[obj_name, self._part_json_mtime(obj_name)] for obj_name in sources]]
+        self._part_category_names_dirty = True
+        self._part_category_names_checked.add(part_name)
         return name
 
+    def _cached_part_category_name(self, part_name):
+        """
+        Returns a tuple of `(found, name)` for `part_name` from our part-category
+        name cache.  Entries whose source objects have been re-serialized since
+        they were cached are thrown out (and reported as not found).
+        """
+        if part_name not in self.part_category_name_cache:
+            return (False, None)
+        name, sources = self.part_category_name_cache[part_name]
+        if part_name not in self._part_category_names_checked:
+            for obj_name, mtime in sources:
+                if self._part_json_mtime(obj_name) != mtime:
+                    del self.part_category_name_cache[part_name]
+                    self._part_category_names_dirty = True
+                    return (False, None)
+            self._part_category_names_checked.add(part_name)
+            self._trace_objects([obj_name for obj_name, mtime in sources])
+        return (True, name)
+
+    @staticmethod
+    def _match_rules(compiled, text):
+        """
+        Matches `text` against a set of `compiled` rules (from `_compile_rules()`),
+        returning the matched label or `None`.
+        """
+        regex, labels = compiled
+        match = regex.match(text)
+        if match:
+            return labels[int(match.lastgroup[1:])]
+        return None
+
     def guess_part_category_name(self, part_name, part_obj=None):
         """
         Given a `part_name`, try and guess what the category name is, for the parts category
@@ -548,121 +1284,83 @@ class WLData(object):
         always consistent.)  Optionally pass in an already-retrieved `part_obj` data
         structure, if you already have the object in-hand (though we cache those too,
         so it doesn't matter too much if we request it again here).
-        """
-
-        if part_name in self.part_category_name_cache:
-            return self.part_category_name_cache[part_name]
-
-        if not part_name or part_name == 'None':
-            return self._cache_part_category_name(part_name, None)
-
-        part_lower = part_name.lower()
-
-        # First, a hardcode for a part that we currently can't serialize
-        #if part_lower == '/game/gear/grenademods/_design/partsets/part_manufacturer/gm_part_manufacturer_06_pangolin':
-        #    return self._cache_part_category_name(part_name, 'MANUFACTURER')
-
-        # Hardcodes for some barrel types -- they report as Barrel Mods, but they're
-        # actually fully-fledged barrels.  (The Cryo barrel here is actually set
-        # properly, but we'll just do 'em all anyway.)
-        if part_name.endswith('/Part_SM_TED_Barrel_Magic_Lightning') \
-                or part_name.endswith('/Part_SM_TED_Barrel_Magic_Cryo') \
-                or part_name.endswith('/Part_SM_TED_Barrel_Magic_Dark') \
-                or part_name.endswith('/Part_SM_TED_Barrel_Magic_Fire') \
-                or part_name.endswith('/Part_SM_TED_Barrel_Magic_Poison'):
-            return self._cache_part_category_name(part_name, 'BARREL')
-
-        # Grab the data itself and see if we can do anything with it.
-        if part_obj is None:
-            part_obj = self.get_data(part_name)
-        for export in part_obj:
-            if export['export_type'].startswith('BPInvPart_'):
-                if 'PartInspectionTitleOverride' in export:
-                    title_name = export['PartInspectionTitleOverride'][0][1]
-                    title_obj = self.get_data(title_name)
-                    ui_label = re.sub(r'\[/?.*?\]', '', title_obj[0]['Text']['string'])
-
-                    # Some hardcoded overrides here
-                    if ui_label.startswith('TRACKING '):
-                        return self._cache_part_category_name(part_name, 'TRACKING METHOD')
-                    elif ui_label.endswith(' WARD'):
-                        return self._cache_part_category_name(part_name, 'WARD TYPE')
-                    elif ui_label.endswith(' MODULE'):
-                        return self._cache_part_category_name(part_name, 'RELOAD TYPE')
-                    elif ui_label.startswith('UNDERBARREL '):
-                        return self._cache_part_category_name(part_name, 'UNDERBARREL TYPE')
-                    else:
-                        return self._cache_part_category_name(part_name, ui_label)
-
-                elif 'material' in part_lower or '_mat_' in part_lower \
-                        or part_lower.endswith('_mat'):
-                    return self._cache_part_category_name(part_name, 'MATERIAL')
-
-                elif 'slidecap' in part_lower:
-                    return self._cache_part_category_name(part_name, 'CAPS')
-
-                elif 'underbarrel' in part_lower:
-                    return self._cache_part_category_name(part_name, 'UNDERBARREL TYPE')
 
-                elif 'magazine' in part_lower or '_mag_' in part_lower:
-                    return self._cache_part_category_name(part_name, 'MAGAZINE')
-
-                elif '_sight_' in part_lower:
-                    return self._cache_part_category_name(part_name, 'SIGHT')
-
-                elif '_trigger_' in part_lower:
-                    return self._cache_part_category_name(part_name, 'BODY ACCESSORY')
-
-                elif part_lower.endswith('/part_ar_cov_scopemount'):
-                    return self._cache_part_category_name(part_name, 'RAIL')
-
-                elif part_lower.endswith('/part_sg_jak_body') \
-                        or part_lower.endswith('/part_ps_mal_body') \
-                        or part_lower.endswith('/part_ps_vla_body'):
-                    return self._cache_part_category_name(part_name, 'BODY')
-
-                # These have the potential to match on stuff it shouldn't, will have
-                # to be careful.  Material parts seem to already show MATERIAL properly,
-                # which is good 'cause they'd match these otherwise.
-                elif part_lower.endswith('_01_common') \
-                        or part_lower.endswith('_02_uncommon') \
-                        or part_lower.endswith('_03_rare') \
-                        or part_lower.endswith('_04_veryrare') \
-                        or part_lower.endswith('_05_legendary'):
-                    return self._cache_part_category_name(part_name, 'RARITY')
-
-                elif '_pincushiontype_' in part_lower or '_pincuhiontype_' in part_lower:
-                    return self._cache_part_category_name(part_name, 'PINCUSHION')
-
-                elif part_lower.endswith('/part_sr_hyp_tootherator'):
-                    return self._cache_part_category_name(part_name, 'TOOTHERATOR')
-
-                # This one's super annoying; looks like they're all visual pieces.
-                # Found on Balance_AR_VLA_01_Common and probably other Vladof gear.
-                elif part_lower.endswith('_frontsight') \
-                        or part_lower.endswith('_frontsight2') \
-                        or part_lower.endswith('_fs'):
-                    return self._cache_part_category_name(part_name, 'FRONT SIGHT')
-
-                elif part_lower.endswith('_ele_nonelemental') \
-                        or part_lower.endswith('_ele_none'):
-                    return self._cache_part_category_name(part_name, 'ELEMENTAL')
+        The actual heuristics live in the `part_category_*_rules` class attributes.
+        Results are cached on-disk, so subsequent runs won't have to load the part
+        data at all, unless the part (or its inspection title) has been
+        re-serialized since.
+        """
 
-                elif part_lower.endswith('/part_sm_dal_mode_whiterider'):
-                    return self._cache_part_category_name(part_name, 'WHITE RIDER')
+        return self.guess_part_category_names([part_name],
+                part_objs={part_name: part_obj} if part_obj is not None else None)[0]
 
-                elif part_lower.endswith('/part_m_blunt_shieldbash'):
-                    return self._cache_part_category_name(part_name, 'GREED WARDEN')
+    def guess_part_category_names(self, part_names, part_objs=None):
+        """
+        Bulk version of `guess_part_category_name()`: returns a list of guessed
+        category names, one for each of the given `part_names`.  `part_objs`,
+        if given, is a dict of already-retrieved part data.
+
+        Names which are already cached (in memory or on disk) are resolved
+        without loading any part data.  The rest are resolved together: each
+        part's data is loaded once, then each inspection-title object they
+        use, with each title only being matched against the rules once.
+        """
 
-                elif part_lower.endswith('/part_m_blunt_hammerquake'):
-                    return self._cache_part_category_name(part_name, 'PETTY TANTRUM')
+        self._load_part_category_names()
+        hardcode_rules, title_rules, name_rules = self._compiled_part_category_rules()
+        if part_objs is None:
+            part_objs = {}
 
-                elif part_lower.endswith('/part_axe_blade_ragehandle'):
-                    return self._cache_part_category_name(part_name, 'RAGE HANDLE')
+        # First, anything cached, plus any hardcodes which apply regardless
+        # of the part data
+        names = {}
+        to_load = []
+        for part_name in part_names:
+            if part_name in names:
+                continue
+            found, name = self._cached_part_category_name(part_name)
+            if found:
+                names[part_name] = name
+            elif not part_name or part_name == 'None':
+                names[part_name] = None
+            else:
+                label = self._match_rules(hardcode_rules, part_name)
+                if label is not None:
+                    names[part_name] = self._cache_part_category_name(part_name, label)
+                else:
+                    names[part_name] = None
+                    to_load.append(part_name)
+
+        # Next, grab the data for the rest and see what we can do with that.
+        # Parts with an inspection title get held until we've got the titles.
+        title_parts = {}
+        for part_name in to_load:
+            part_obj = part_objs.get(part_name)
+            if part_obj is None:
+                part_obj = self.get_data(part_name)
+            for export in part_obj:
+                if export['export_type'].startswith('BPInvPart_'):
+                    if 'PartInspectionTitleOverride' in export:
+                        title_parts.setdefault(export['PartInspectionTitleOverride'][0][1], []).append(part_name)
+                    else:
+                        names[part_name] = self._cache_part_category_name(part_name,
+                                self._match_rules(name_rules, part_name.lower()),
+                                [part_name])
+                    break
+            else:
+                self._cache_part_category_name(part_name, None, [part_name])
 
-                break
+        # Finally, the inspection titles
+        for title_name, title_part_names in title_parts.items():
+            title_obj = self.get_data(title_name)
+            ui_label = re.sub(r'\[/?.*?\]', '', title_obj[0]['Text']['string'])
+            label = self._match_rules(title_rules, ui_label)
+            if label is None:
+                label = ui_label
+            for part_name in title_part_names:
+                names[part_name] = self._cache_part_category_name(part_name, label, [part_name, title_name])
 
-        return self._cache_part_category_name(part_name, None)
+        return [names[part_name] for part_name in part_names]
 
     def get_parts_category_name(self, part_names, balance_name, cat_idx):
         """
@@ -686,8 +1384,7 @@ class WLData(object):
 
         # Construct a sort of label histogram
         valid_labels = {}
-        for part_name in part_names:
-            label = self.guess_part_category_name(part_name)
+        for label in self.guess_part_category_names(part_names):
             if label:
                 if label in valid_labels:
                     valid_labels[label] += 1
@@ -734,6 +1431,149 @@ class WLData(object):
         else:
             return label_text
 
+    @classmethod
+    def _extra_anoints_cache_version(cls):
+        """
+        Returns the version string for our on-disk extra-anointment cache,
+        which incorporates a hash of `generic_part_expansions` so that changes
+        to that list automatically invalidate it.
+        """
+        expansions_hash = hashlib.sha1(repr(
+            cls.generic_part_expansions,
+            ).encode('utf-8')).hexdigest()
+        return '{}-{}'.format(cls.extra_anoints_version, expansions_hash)
+
+    def _get_child_balance_collections(self, collection_names):
+        """
+        Given a list of `collection_names`, returns a set of those collections
+        plus all the InventoryBalanceCollectionData objects which descend from
+        them (via `ParentCollection`), to any depth.  Each level of the
+        hierarchy is resolved with a single batched refs query.
+        """
+        found = set(collection_names)
+        to_check = sorted(found)
+        while to_check:
+            refs = self.get_refs_to_many(to_check)
+            next_check = set()
+            for parent, children in refs.items():
+                for child in children:
+                    if child in found:
+                        continue
+                    child_data = self.get_data(child)
+                    if child_data \
+                            and child_data[0]['export_type'] == 'InventoryBalanceCollectionData' \
+                            and 'ParentCollection' in child_data[0] \
+                            and child_data[0]['ParentCollection'][1] == parent:
+                        found.add(child)
+                        next_check.add(child)
+            to_check = sorted(next_check)
+        return found
+
+    def build_extra_anoint_index(self):
+        """
+        Builds our index of which balances get extra anointments from the
+        GPartExpansion objects in `generic_part_expansions`, resolving all of
+        the balance-collection hierarchies involved in one pass.  Returns a
+        dict suitable for storing in our on-disk cache:
+
+          * `anoints`: maps each GPartExpansion to a list of `[part_name, weight]`
+            pairs, where `weight` is the raw BVC struct
+          * `balances`: maps each balance name to the list of GPartExpansions
+            which act on it
+          * `sources`: maps each GPartExpansion and balance collection we read
+            to its modification time (see `_obj_mtime()`)
+          * `db_mtime`: the modification time of the refs database (if any),
+            which is where the collection hierarchies came from
+        """
+
+        # Construct a list of anointments which each GPartExpansion provides,
+        # and note which balance collection each one acts on.
+        anoints = {}
+        expansion_collections = {}
+        for expansion_name in self.generic_part_expansions:
+            expansion_data = self.get_exports(expansion_name, 'InventoryGenericPartExpansionData')[0]
+            anoints[expansion_name] = [[part['PartData'][1], part['Weight']]
+                    for part in expansion_data['GenericParts']['Parts']]
+            expansion_collections[expansion_name] = expansion_data['InventoryBalanceCollection'][1]
+
+        # Resolve the collection hierarchies
+        collection_children = {}
+        for collection_name in set(expansion_collections.values()):
+            collection_children[collection_name] = self._get_child_balance_collections([collection_name])
+
+        # Grab the balances out of each collection
+        collection_balances = {}
+        for collection_name in set().union(*collection_children.values()):
+            collection_balances[collection_name] = []
+            collection = self.get_exports(collection_name, 'InventoryBalanceCollectionData')[0]
+            if 'InventoryBalanceList' in collection:
+                for bal in collection['InventoryBalanceList']:
+                    collection_balances[collection_name].append(bal['asset_path_name'].split('.')[0])
+
+        # Now loop through all the expansions and populate our dict
+        balances = {}
+        for expansion_name, root_collection in expansion_collections.items():
+            for collection_name in sorted(collection_children[root_collection]):
+                for balance_name in collection_balances[collection_name]:
+                    balances.setdefault(balance_name, []).append(expansion_name)
+
+        sources = {}
+        for obj_name in sorted(set(self.generic_part_expansions).union(*collection_children.values())):
+            sources[obj_name] = self._obj_mtime(obj_name)
+
+        return {
+                'anoints': anoints,
+                'balances': balances,
+                'sources': sources,
+                'db_mtime': self._db_mtime(),
+                }
+
+    def _extra_anoints_current(self, index):
+        """
+        Returns `True` if the extra-anointment `index` still matches the data:
+        none of the objects it was built from have changed, and neither has
+        the refs database.
+        """
+        if self._db_mtime() != index['db_mtime']:
+            return False
+        for obj_name, mtime in index['sources'].items():
+            if self._obj_mtime(obj_name) != mtime:
+                return False
+        return True
+
+    def _load_extra_anoints(self, rebuild=False):
+        """
+        Populates `balance_to_extra_anoints`, using our on-disk cache if
+        possible, or building (and saving) the index otherwise.  The cache
+        will also be rebuilt if any of the objects it was built from (or the
+        refs database) have changed, or if `rebuild` is `True`.
+        """
+        cache_version = self._extra_anoints_cache_version()
+        index = None
+        if not rebuild:
+            index = self._read_cache('extra_anoints', cache_version)
+            if index is not None and not self._extra_anoints_current(index):
+                index = None
+        if index is None:
+            index = self.build_extra_anoint_index()
+            self._write_cache('extra_anoints', cache_version, index)
+        self._extra_anoint_sources = {
+                'sources': index['sources'],
+                'db_mtime': index['db_mtime'],
+                }
+        self._trace_objects(index['sources'].keys())
+        if index['db_mtime'] is not None:
+            buildtrace.record('db', os.path.realpath(self.config['database']['dbfile']))
+
+        extra_anoints = {}
+        for expansion_name, parts in index['anoints'].items():
+            extra_anoints[expansion_name] = [(part_name, BVC.from_data_struct(weight))
+                    for part_name, weight in parts]
+        self.balance_to_extra_anoints = {}
+        for balance_name, expansion_names in index['balances'].items():
+            self.balance_to_extra_anoints[balance_name] = [(expansion_name, extra_anoints[expansion_name])
+                    for expansion_name in expansion_names]
+
     def get_extra_anoints(self, balance_name):
         """
         Given a `balance_name`, return a list of tuples, each with two elements:
@@ -743,37 +1583,8 @@ class WLData(object):
 
         # First, if we haven't read in the GPartExpansion data and created our lookup
         # object, do that.
-        if not self.balance_to_extra_anoints:
-
-            self.balance_to_extra_anoints = {}
-
-            for expansion_name in [
-                    # Nothing yet!
-                    ]:
-
-                # Construct a list of anointments which this GPartExpansion provides
-                extra_anoints = []
-                expansion_data = self.get_exports(expansion_name, 'InventoryGenericPartExpansionData')[0]
-                for part in expansion_data['GenericParts']['Parts']:
-                    extra_anoints.append((part['PartData'][1], BVC.from_data_struct(part['Weight'])))
-
-                # Grab a list of balance collections which define the gear this expansion acts on.
-                bal_collections = [expansion_data['InventoryBalanceCollection'][1]]
-                for (extra, extra_data) in self.get_refs_to_data(bal_collections[0]):
-                    if extra_data \
-                            and extra_data[0]['export_type'] == 'InventoryBalanceCollectionData' \
-                            and extra_data[0]['ParentCollection'][1] == bal_collections[0]:
-                        bal_collections.append(extra)
-
-                # Now loop through all balances and populate our dict
-                for bal_collection in bal_collections:
-                    collection = self.get_exports(bal_collection, 'InventoryBalanceCollectionData')[0]
-                    if 'InventoryBalanceList' in collection:
-                        for bal in collection['InventoryBalanceList']:
-                            this_balance = bal['asset_path_name'].split('.')[0]
-                            if this_balance not in self.balance_to_extra_anoints:
-                                self.balance_to_extra_anoints[this_balance] = []
-                            self.balance_to_extra_anoints[this_balance].append((expansion_name, extra_anoints))
+        if self.balance_to_extra_anoints is None:
+            self._load_extra_anoints()
 
         # Now, return the appropriate value
         if balance_name in self.balance_to_extra_anoints:
@@ -781,40 +1592,106 @@ class WLData(object):
         else:
             return []
 
-    def _load_expansions(self):
+    def _obj_mtime(self, obj_name):
         """
-        Loads in the new InventoryPartSetExpansionData/InventoryExcludersExpansionData
-        data from the 2022-08-11 Wonderlands patch, needed for our Balance object to
-        know about some gear properly.  This will look for objects prefixed with `EXPD_`
-        across the whole data tree.  For now it looks like that's both sufficient and
-        accurate enough for our needs, though if the data ever changes in the future,
-        we may need to be more clever.  Note that there does not appear to be any main
-        index of these expansion objects, so the recursive trawl seems necessary.
+        Returns the most recent modification time of any of the on-disk files
+        for `obj_name` (`.uasset`, `.umap`, or `.json`), or `None` if there
+        aren't any.
+        """
+        base_path = '{}{}'.format(self.data_dir, obj_name)
+        mtimes = []
+        for ext in ['uasset', 'umap', 'json']:
+            try:
+                mtimes.append(os.path.getmtime('{}.{}'.format(base_path, ext)))
+            except OSError:
+                pass
+        if mtimes:
+            return max(mtimes)
+        else:
+            return None
+
+    def _dir_mtime(self, dir_name):
+        """
+        Returns the modification time of the data directory `dir_name`, or
+        `None` if it doesn't exist.
+        """
+        try:
+            return os.path.getmtime('{}{}'.format(self.data_dir, dir_name))
+        except OSError:
+            return None
+
+    def _expansion_names(self):
+        """
+        Returns a sorted list of the names of every `EXPD_` object in the
+        data.  If the refs database is configured, this is a single query
+        against that (so the database should be from the same patch as the
+        data); otherwise we have to walk the whole data tree (though without
+        loading anything).  Only used when (re)scanning, since the walk is
+        slow.
+        """
+        if self._db_configured():
+            self._connect_db()
+            self.curs.execute("select name from ttwlobject where name like '%/EXPD\\_%' escape '\\'")
+            names = set(row[0] for row in self.curs.fetchall()
+                    if row[0].rsplit('/', 1)[-1].lower().startswith('expd_'))
+        else:
+            names = set(self.find('/', 'EXPD_'))
+        return sorted(names)
+
+    def _expansions_current(self, registry):
+        """
+        Returns `True` if the on-disk expansion `registry` still matches the
+        data: none of the `EXPD_` objects it was built from have changed, no
+        files have been added to or removed from the directories they live
+        in (or the top-level `/Game` and `/Game/PatchDLC` directories, where
+        new DLC content would show up), and the refs database (which lists
+        every `EXPD_` object, if it's configured) hasn't changed either.
+        This only needs a handful of `stat()` calls.
+        """
+        if self._db_mtime() != registry['db_mtime']:
+            return False
+        for obj_name, mtime in registry['files'].items():
+            if self._obj_mtime(obj_name) != mtime:
+                return False
+        for dir_name, mtime in registry['dirs'].items():
+            if self._dir_mtime(dir_name) != mtime:
+                return False
+        return True
+
+    def _scan_expansions(self):
+        """
+        Loads every object prefixed with `EXPD_` (see `_expansion_names()`),
+        and returns a registry dict suitable for storing in our on-disk cache.
+        Note that there does not appear to be any main index of these expansion
+        objects in the data itself.
 
         This function ignores ItemPoolExpansionData objects entirely, which have been
         used for all Wonderlands DLC to expand ItemPools.
         """
-
-        self._expansion_parts = {}
-        self._expansion_dependencies = {}
-        for obj_name, obj_data in sorted(self.find_data('/', 'EXPD_')):
+        registry = {
+                'names': self._expansion_names(),
+                'files': {},
+                'dirs': {},
+                'db_mtime': self._db_mtime(),
+                'parts': {},
+                'dependencies': {},
+                }
+        for obj_name in registry['names']:
+            obj_data = self.get_data(obj_name)
+            if not obj_data:
+                # Known to the refs database, but not in our extracted data
+                continue
             export = obj_data[0]
             # Would like to use match/case here but don't feel like forcing folks
             # to Python 3.10+
             if export['export_type'] == 'InventoryExcludersExpansionData':
                 # First up: dependency/excluder expansions
                 for target in export['TargetParts']:
-                    target_obj = target[1]
-                    if target_obj not in self._expansion_dependencies:
-                        self._expansion_dependencies[target_obj] = DependencyExpansion(target_obj)
-                    self._expansion_dependencies[target_obj].load_from_export(export)
+                    registry['dependencies'].setdefault(target[1], []).append([obj_name, export])
 
             elif export['export_type'] == 'InventoryPartSetExpansionData':
                 # Next: partset expansions
-                partset_name = export['InventoryPartSet'][1]
-                if partset_name not in self._expansion_parts:
-                    self._expansion_parts[partset_name] = PartSetExpansion(partset_name)
-                self._expansion_parts[partset_name].load_expansion_from_export(obj_name, export)
+                registry['parts'].setdefault(export['InventoryPartSet'][1], []).append([obj_name, export])
 
             elif export['export_type'] == 'ItemPoolExpansionData':
                 # Ignoring these entirely at the moment, since I don't really alter ItemPools
@@ -829,12 +1706,120 @@ class WLData(object):
                     obj_name,
                     ))
 
+            registry['files'][obj_name] = None
+
+        # Record timestamps to check against, next time.  We do this after the
+        # scan since the scan itself may have serialized some objects.
+        dir_names = {'/Game', '/Game/PatchDLC'}
+        for obj_name in registry['names']:
+            dir_names.add(obj_name.rsplit('/', 1)[0])
+        for obj_name in registry['files'].keys():
+            registry['files'][obj_name] = self._obj_mtime(obj_name)
+        for dir_name in sorted(dir_names):
+            registry['dirs'][dir_name] = self._dir_mtime(dir_name)
+
+        return registry
+
+    @staticmethod
+    def _build_dependency_expansion(part_name, entries):
+        """
+        Builds a DependencyExpansion for `part_name` out of a list of
+        `[obj_name, export]` pairs.
+        """
+        expansion = DependencyExpansion(part_name)
+        for obj_name, export in entries:
+            expansion.load_from_export(export)
+        return expansion
+
+    @staticmethod
+    def _build_partset_expansion(partset_name, entries):
+        """
+        Builds a PartSetExpansion for `partset_name` out of a list of
+        `[obj_name, export]` pairs.
+        """
+        expansion = PartSetExpansion(partset_name)
+        for obj_name, export in entries:
+            expansion.load_expansion_from_export(obj_name, export)
+        return expansion
+
+    def _load_expansions(self, rebuild=False):
+        """
+        Loads in the new InventoryPartSetExpansionData/InventoryExcludersExpansionData
+        data from the 2022-08-11 Wonderlands patch, needed for our Balance object to
+        know about some gear properly.  These are objects prefixed with `EXPD_`
+        across the whole data tree.  For now it looks like that's both sufficient and
+        accurate enough for our needs, though if the data ever changes in the future,
+        we may need to be more clever.
+
+        Finding and loading them all is slow, so the raw expansion data is
+        stored in our on-disk cache, and only re-scanned if `rebuild` is
+        `True`, or if `_expansions_current()` finds that anything's changed.
+        Without a refs database, that check can't see a brand-new `EXPD_`
+        object in a directory which has never held one (short of another
+        walk of the whole tree), so use `rebuild_expansion_index()` if that
+        happens.  The actual expansion objects are only constructed as
+        they're requested.
+        """
+
+        registry = None
+        if not rebuild:
+            registry = self._read_cache('expansions', self.expansions_version)
+            if registry is not None and not self._expansions_current(registry):
+                registry = None
+        if registry is None:
+            registry = self._scan_expansions()
+            self._write_cache('expansions', self.expansions_version, registry)
+        self._expansion_sources = {
+                'files': registry['files'],
+                'dirs': registry['dirs'],
+                'db_mtime': registry['db_mtime'],
+                }
+        self._trace_objects(registry['files'].keys())
+
+        self._expansion_parts = _ExpansionRegistry(registry['parts'],
+                self._build_partset_expansion)
+        self._expansion_dependencies = _ExpansionRegistry(registry['dependencies'],
+                self._build_dependency_expansion)
+
+    def rebuild_expansion_index(self):
+        """
+        Re-scans the whole data tree for `EXPD_` expansion objects, and
+        rebuilds our on-disk expansion registry from scratch.  This normally
+        happens automatically, but see `_load_expansions()` for the one case
+        which we can't detect cheaply.
+        """
+        self._load_expansions(rebuild=True)
+
+    def refresh_indexes(self):
+        """
+        Re-checks the expansion registry and extra-anointment index we've
+        loaded (if any) against the data, and drops whichever are out of date,
+        along with anything built from them, so that they'll be reloaded when
+        next needed.  A new WLData checks them as it loads them, but long-lived
+        ones (such as a daemon's) need this to pick up data updates.  Returns
+        `True` if anything was dropped.
+        """
+        refreshed = False
+        if self._expansion_sources is not None \
+                and not self._expansions_current(self._expansion_sources):
+            self._expansion_parts = None
+            self._expansion_dependencies = None
+            self._expansion_sources = None
+            self._merged_constraints = {}
+            refreshed = True
+        if self._extra_anoint_sources is not None \
+                and not self._extra_anoints_current(self._extra_anoint_sources):
+            self.balance_to_extra_anoints = None
+            self._extra_anoint_sources = None
+            refreshed = True
+        return refreshed
+
     @property
     def expansion_parts(self):
         """
-        Retrieve our parsed Expansion PartSet dict.  Keys will be the PartSet being
+        Retrieve our parsed Expansion PartSet mapping.  Keys will be the PartSet being
         expanded, and the values will be wlhotfixmod.PartSetExpansion objects.
-        Dynamically loads the data if we haven't already.
+        Dynamically loads the data if we haven't already (see `_load_expansions()`).
         """
         if self._expansion_parts is None:
             self._load_expansions()
@@ -843,9 +1828,10 @@ class WLData(object):
     @property
     def expansion_dependencies(self):
         """
-        Retrieve our parsed Expansion dependency/excluder dict.  Keys will be the
+        Retrieve our parsed Expansion dependency/excluder mapping.  Keys will be the
         Parts being expanded, and the values will be wlhotfixmod.DependencyExpansion
-        objects.  Dynamically loads the data if we haven't already.
+        objects.  Dynamically loads the data if we haven't already (see
+        `_load_expansions()`).
         """
         if self._expansion_dependencies is None:
             self._load_expansions()
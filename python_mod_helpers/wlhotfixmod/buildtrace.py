@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import sys
+import sysconfig
+
+# Support for recording what a mod-generation script depends on, for use by
+# the incremental build driver in `modbuild`.  If the environment variable
+# named by `TRACE_ENV` is set, `record()` appends entries to that file, one
+# tab-separated line per entry, with the kind of entry first:
+#
+#   data <path>                         - object loaded via WLData.get_data()
+#                                         (the path is minus its extension)
+#   find <data_dir> <base> <prefix> <exact>
+#                                       - WLData.find() search
+#   glob <data_dir> <pattern>           - WLData.glob() search
+#   db <dbfile>                         - the refs database was used
+#   output <filename>                   - mod file written by Mod
+#   module <filename>                   - Python source used by the script
+#
+# Writes go straight to the file (rather than being saved up for exit), so
+# that entries from forked worker processes are recorded too.  Each process
+# keeps its own line-buffered append handle open (a forked child opens a new
+# one, rather than sharing its parent's), and only records any given entry
+# once.  If the variable isn't set, `record()` does nothing.
+
+TRACE_ENV = 'WL_BUILD_TRACE'
+
+trace_file = os.environ.get(TRACE_ENV)
+_recorded = set()
+_handle = None
+_handle_pid = None
+
+def _trace_handle():
+    """
+    Returns our append handle for the trace file, opening it if we haven't
+    already done so in this process.
+    """
+    global _handle, _handle_pid
+    if _handle is None or _handle_pid != os.getpid():
+        _handle = open(trace_file, 'a', buffering=1)
+        _handle_pid = os.getpid()
+    return _handle
+
+def record(kind, *values):
+    """
+    Records a trace entry of the given `kind`, if tracing is enabled
+    """
+    if trace_file is None:
+        return
+    entry = (kind,) + tuple(str(v) for v in values)
+    if entry in _recorded:
+        return
+    _recorded.add(entry)
+    _trace_handle().write('\t'.join(entry) + '\n')
+
+def record_modules():
+    """
+    Records the source files of all the currently-loaded Python modules
+    which aren't part of Python itself (or installed packages), along with
+    the main script.
+    """
+    if trace_file is None:
+        return
+    system_dirs = set()
+    for name in ['stdlib', 'platstdlib', 'purelib', 'platlib']:
+        path = sysconfig.get_paths().get(name)
+        if path:
+            system_dirs.add(os.path.realpath(path) + os.sep)
+    for module in list(sys.modules.values()):
+        filename = getattr(module, '__file__', None)
+        if not filename or not filename.endswith('.py'):
+            continue
+        filename = os.path.realpath(filename)
+        if any(filename.startswith(d) for d in system_dirs):
+            continue
+        record('module', filename)
+
+def read_trace(filename):
+    """
+    Reads in the trace file `filename`, returning a dict mapping entry kinds
+    to sets of value tuples.
+    """
+    entries = {}
+    with open(filename) as df:
+        for line in df:
+            parts = line.rstrip('\n').split('\t')
+            entries.setdefault(parts[0], set()).add(tuple(parts[1:]))
+    return entries
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import sys
+import json
+import time
+import glob
+import hashlib
+import tempfile
+import subprocess
+import multiprocessing.pool
+
+from wlhotfixmod import buildtrace
+
+class ModBuilder(object):
+    """
+    Incremental build driver for mod-generation scripts (`gen_*.py`).  Each
+    script is run in its own directory with build tracing enabled (see
+    `buildtrace`), which records the Python source it used (the script
+    itself, plus `wlhotfixmod`/`wldata` and any other local modules), the
+    WLData objects and searches it needed, whether it used the refs database,
+    and the mod files it wrote.  Fingerprints for all of those are saved in
+    `state_file` (a JSON file).
+
+    On later builds, a script is only re-run if it's never been built
+    successfully, one of its outputs has gone missing, or any of its
+    recorded inputs has changed.  Source files are compared by hash (only
+    re-hashed if their size or mtime changed), data objects by their files'
+    sizes and mtimes, and `find()`/`glob()` searches by re-running them.
+    Stale scripts are run in parallel, using `jobs` processes.
+
+    Results which WLData serves from its own on-disk caches (such as the
+    part-constraint index or the expansion registry) are traced as the
+    objects they were derived from, so those get fingerprinted just as if
+    the script had loaded them itself.  Anything a script reads *without*
+    going through WLData isn't traced, though, so changes to its own input
+    files (CSVs, JSON, and the like) won't make it stale.  Use `force` to
+    rebuild in that case.
+    """
+
+    # Directories which never contain buildable generators
+    skip_dirs = {'deprecated_or_broken', 'dataprocessing', '__pycache__'}
+
+    def __init__(self, state_file, jobs=None):
+        self.state_file = state_file
+        self.jobs = jobs
+        self.state = {}
+        self._hash_cache = {}
+        self._search_cache = {}
+        if os.path.exists(state_file):
+            with open(state_file) as df:
+                self.state = json.load(df)
+
+    def save_state(self):
+        """
+        Writes our build state out to `state_file`
+        """
+        tmp_file = f'{self.state_file}.tmp'
+        with open(tmp_file, 'w') as df:
+            json.dump(self.state, df, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.state_file)
+
+    def discover(self, root):
+        """
+        Finds all the mod-generation scripts underneath `root`: `gen_*.py`
+        files which create a `Mod`.  Returns a sorted list of absolute paths.
+        """
+        scripts = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in self.skip_dirs and not d.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.startswith('gen_') and filename.endswith('.py'):
+                    path = os.path.realpath(os.path.join(dirpath, filename))
+                    with open(path, encoding='utf-8', errors='replace') as df:
+                        if 'Mod(' in df.read():
+                            scripts.append(path)
+        return scripts
+
+    def _file_hash(self, filename, prev=None):
+        """
+        Returns a `[size, mtime_ns, sha256]` fingerprint for `filename`, or
+        `None` if it doesn't exist.  If `prev` is a previous fingerprint whose
+        size and mtime still match, the hash is reused rather than recomputed.
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        if prev is not None and prev[0] == stat.st_size and prev[1] == stat.st_mtime_ns:
+            return prev
+        if filename not in self._hash_cache:
+            with open(filename, 'rb') as df:
+                self._hash_cache[filename] = hashlib.sha256(df.read()).hexdigest()
+        return [stat.st_size, stat.st_mtime_ns, self._hash_cache[filename]]
+
+    @staticmethod
+    def _data_stat(base_path):
+        """
+        Returns a fingerprint for a data object, given its path (minus
+        extension): the sizes and mtimes of whichever of its files exist.
+        """
+        stats = []
+        for ext in ['json', 'uasset', 'umap', 'uexp']:
+            try:
+                stat = os.stat(f'{base_path}.{ext}')
+                stats.append([ext, stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                pass
+        return stats
+
+    def _search(self, kind, values):
+        """
+        Re-runs a recorded `find` or `glob` search and returns a hash of its
+        results.  Searches are only run once per build.
+        """
+        key = (kind,) + tuple(values)
+        if key not in self._search_cache:
+            results = []
+            if kind == 'find':
+                data_dir, base, prefix, exact = values
+                prefix = prefix.lower()
+                for dirpath, dirnames, filenames in os.walk(f'{data_dir}{base}'):
+                    for filename in filenames:
+                        name, ext = os.path.splitext(filename)
+                        if ext not in ('.uasset', '.umap'):
+                            continue
+                        if (exact == 'True' and name.lower() == prefix) \
+                                or (exact != 'True' and name.lower().startswith(prefix)):
+                            results.append(os.path.join(dirpath, filename))
+            else:
+                data_dir, pattern = values
+                results = glob.glob(f'{data_dir}{pattern}')
+            self._search_cache[key] = hashlib.sha256('\n'.join(sorted(results)).encode('utf-8')).hexdigest()
+        return self._search_cache[key]
+
+    def _fingerprint(self, trace, prev=None):
+        """
+        Computes the fingerprints for everything in the build `trace` (a
+        dict as returned by `buildtrace.read_trace()`).  `prev` is the
+        previous fingerprint dict, if any, to avoid re-hashing unchanged
+        source files.
+        """
+        if prev is None:
+            prev = {}
+        prev_modules = prev.get('module', {})
+        fp = {
+                'module': {},
+                'data': {},
+                'search': {},
+                'db': {},
+                'output': sorted(v[0] for v in trace.get('output', set())),
+                }
+        for (filename,) in trace.get('module', set()):
+            fp['module'][filename] = self._file_hash(filename, prev_modules.get(filename))
+        for (base_path,) in trace.get('data', set()):
+            fp['data'][base_path] = self._data_stat(base_path)
+        for kind in ['find', 'glob']:
+            for values in trace.get(kind, set()):
+                fp['search']['\t'.join((kind,) + values)] = self._search(kind, values)
+        for (dbfile,) in trace.get('db', set()):
+            try:
+                stat = os.stat(dbfile)
+                fp['db'][dbfile] = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                fp['db'][dbfile] = None
+        return fp
+
+    def stale_reason(self, script):
+        """
+        Returns a string describing why `script` needs to be rebuilt, or
+        `None` if it's up to date.
+        """
+        if script not in self.state:
+            return 'never built'
+        entry = self.state[script]
+        if not entry.get('ok'):
+            return 'last build failed'
+        fp = entry['fingerprint']
+        if script not in fp['module']:
+            return 'script not traced'
+        for output in fp['output']:
+            if not os.path.exists(output):
+                return f'output missing: {output}'
+        for filename, prev in fp['module'].items():
+            cur = self._file_hash(filename, prev)
+            if cur is None or cur[2] != prev[2]:
+                return f'source changed: {filename}'
+            # Just touched; remember the new stat so we don't re-hash next time
+            fp['module'][filename] = cur
+        for base_path, prev in fp['data'].items():
+            if self._data_stat(base_path) != prev:
+                return f'data changed: {base_path}'
+        for search, prev in fp['search'].items():
+            kind, *values = search.split('\t')
+            if self._search(kind, tuple(values)) != prev:
+                return f'search results changed: {search}'
+        for dbfile, prev in fp['db'].items():
+            try:
+                stat = os.stat(dbfile)
+                cur = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                cur = None
+            if cur != prev:
+                return f'refs database changed: {dbfile}'
+        return None
+
+    @staticmethod
+    def _run(script):
+        """
+        Runs a single `script` with tracing enabled, returning a tuple of
+        `(script, success, trace, elapsed, output)`.
+        """
+        fd, trace_file = tempfile.mkstemp(prefix='wlbuild', suffix='.trace')
+        os.close(fd)
+        env = dict(os.environ)
+        env[buildtrace.TRACE_ENV] = trace_file
+        start_time = time.time()
+        try:
+            proc = subprocess.run([sys.executable, os.path.basename(script)],
+                    cwd=os.path.dirname(script),
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    stdin=subprocess.DEVNULL,
+                    )
+            trace = buildtrace.read_trace(trace_file)
+        finally:
+            os.unlink(trace_file)
+        return (script,
+                proc.returncode == 0,
+                trace,
+                time.time()-start_time,
+                proc.stdout.decode('utf-8', errors='replace'))
+
+    def build(self, scripts, force=False, report=print):
+        """
+        Rebuilds whichever of `scripts` are stale (or all of them, if `force`
+        is `True`), in parallel.  `report` is called with a line of text for
+        each script as it's skipped or finishes.  Returns a tuple of
+        `(built, skipped, failed)` lists of script paths.  The build state is
+        saved as each script finishes.
+        """
+        to_build = []
+        skipped = []
+        for script in scripts:
+            if force:
+                reason = 'forced'
+            else:
+                reason = self.stale_reason(script)
+            if reason is None:
+                skipped.append(script)
+                report(f'Up to date: {script}')
+            else:
+                to_build.append(script)
+                report(f'Building {script} ({reason})')
+
+        built = []
+        failed = []
+        if not to_build:
+            self.save_state()
+        else:
+            jobs = self.jobs
+            if jobs is None:
+                jobs = os.cpu_count() or 1
+            with multiprocessing.pool.ThreadPool(max(1, min(jobs, len(to_build)))) as pool:
+                for script, success, trace, elapsed, output in pool.imap_unordered(self._run, to_build):
+                    prev = self.state.get(script, {}).get('fingerprint')
+                    if success:
+                        built.append(script)
+                        self.state[script] = {
+                                'ok': True,
+                                'fingerprint': self._fingerprint(trace, prev),
+                                }
+                        report(f'Built {script} in {elapsed:.1f}s')
+                    else:
+                        failed.append(script)
+                        self.state[script] = {'ok': False}
+                        report(f'FAILED: {script}\n{output}')
+                    self.save_state()
+        return (built, skipped, failed)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import re
+import collections
+import multiprocessing
+
+from wlhotfixmod.wlhotfixmod import Mod, RegHotfix, TableHotfix, BytecodeHotfix
+from wlhotfixmod.modparser import parse_file
+
+# A single write to an attribute, as found in one mod file.  `attr_name` is the
+# attribute as written by this particular hotfix (which might be a parent or
+# child of the attribute that the conflict is keyed on), and `prev_val` will be
+# an empty string for unconditional hotfixes.
+HotfixWrite = collections.namedtuple('HotfixWrite', [
+    'filename',
+    'lineno',
+    'hf_type',
+    'package',
+    'attr_name',
+    'prev_val',
+    'new_val',
+    ])
+
+class Conflict(collections.namedtuple('Conflict', [
+        'obj_name', 'row_name', 'attr_name', 'writes',
+        ])):
+    """
+    A set of writes from more than one mod file to the same attribute (or to
+    overlapping attributes, such as `Foo` and `Foo.Bar`), with differing
+    values.  `row_name` is `None` for regular hotfixes, the row name for
+    table hotfixes, and the export name for bytecode hotfixes.  `writes` is a
+    list of `HotfixWrite`s, in load order.
+    """
+
+    __slots__ = ()
+
+    @property
+    def filenames(self):
+        """
+        The mod files involved in this conflict, in load order
+        """
+        seen = {}
+        for write in self.writes:
+            seen[write.filename] = True
+        return list(seen.keys())
+
+    @property
+    def winner(self):
+        """
+        The write which ends up "winning" with the current load order,
+        assuming that the hotfixes all fire at the same time.  Conditional
+        hotfixes (ones with a `prev_val`) can only win if the value they're
+        checking for is in place, so they're skipped unless everything is
+        conditional.
+        """
+        for write in reversed(self.writes):
+            if write.prev_val == '':
+                return write
+        return self.writes[-1]
+
+    def implications(self):
+        """
+        Returns a list of human-readable notes about how load order affects
+        this conflict.
+        """
+        notes = []
+        hf_types = set(w.hf_type for w in self.writes)
+        if len(hf_types) > 1:
+            notes.append('Mixed hotfix types ({}): these fire at different times, so load order alone may not decide the result'.format(
+                ', '.join(Mod.TYPE[t] for t in sorted(hf_types))))
+        packages = set(w.package for w in self.writes if w.package != '')
+        if len(packages) > 1:
+            notes.append('Targets different packages ({}): may only conflict in some maps'.format(
+                ', '.join(sorted(packages))))
+        winner = self.winner
+        notes.append('With this load order, {} (line {}) wins; loading any of the others after it would change the result'.format(
+            winner.filename, winner.lineno))
+        for write in self.writes:
+            if write.prev_val != '':
+                notes.append('{} (line {}) is conditional on the previous value, and will be skipped if an earlier mod has already changed it'.format(
+                    write.filename, write.lineno))
+        attr_names = set(w.attr_name.lower() for w in self.writes)
+        if len(attr_names) > 1:
+            notes.append('Writes overlapping attributes ({}): the more-specific write only survives if it comes later'.format(
+                ', '.join(sorted(set(w.attr_name for w in self.writes)))))
+        return notes
+
+# Splits an attribute path into its components, so that we can find parent
+# attributes (`Foo` and `Foo.Bar` are parents of `Foo.Bar[2]`).
+_attr_boundary_re = re.compile(r'[.\[]')
+
+def _attr_parents(attr_name):
+    """
+    Returns a list of the parent attribute paths of `attr_name`, from the
+    top level downwards (not including `attr_name` itself).
+    """
+    return [attr_name[:m.start()] for m in _attr_boundary_re.finditer(attr_name) if m.start() > 0]
+
+def _index_files(filenames):
+    """
+    Worker function for `ModIndex`: parses each of `filenames` and returns a
+    list of `(filename, writes, error)` tuples.  `writes` maps a
+    `(kind, obj_name, row_name, attr_name)` key (lowercased, since the engine
+    doesn't care about case) to a list of `(obj_name, row_name, write)`
+    tuples.  Only the last write per key/type/package in each file is kept,
+    since that's the one which counts.
+    """
+    results = []
+    for filename in filenames:
+        last = {}
+        try:
+            for lineno, record in parse_file(filename, linenos=True):
+                rtype = type(record)
+                if rtype == RegHotfix:
+                    row_name = None
+                    attr_name = record.attr_name
+                    kind = 'attr'
+                elif rtype == TableHotfix:
+                    row_name = record.row_name
+                    attr_name = record.attr_name
+                    kind = 'attr'
+                elif rtype == BytecodeHotfix:
+                    row_name = record.export_name
+                    attr_name = '[{}]'.format(','.join(record.indexes))
+                    kind = 'bytecode'
+                else:
+                    # Comments, tags, and also mesh/streaming hotfixes, which
+                    # add new things rather than overwriting anything.
+                    continue
+                if kind == 'bytecode':
+                    prev_val = record.from_val
+                    new_val = record.to_val
+                else:
+                    prev_val = record.prev_val
+                    new_val = record.new_val
+                obj_name = record.obj_name
+                key = (kind,
+                        obj_name.lower(),
+                        None if row_name is None else row_name.lower(),
+                        attr_name.lower())
+                last[(key, record.hf_type, record.package)] = (
+                        obj_name,
+                        row_name,
+                        HotfixWrite(filename, lineno, record.hf_type, record.package,
+                            attr_name, prev_val, new_val.strip()))
+        except (OSError, UnicodeDecodeError) as e:
+            results.append((filename, {}, str(e)))
+            continue
+        writes = {}
+        for (key, hf_type, package), value in last.items():
+            writes.setdefault(key, []).append(value)
+        results.append((filename, writes, None))
+    return results
+
+class ModIndex(object):
+    """
+    Index of the hotfixes in a collection of mod files, used to find
+    conflicts between mods: places where more than one mod writes different
+    values to the same attribute (or table row, or bytecode index).
+
+    Files are added with `add_files()` (or `add_tree()`, to find all the
+    `.wlhotfix` files under a directory), and are parsed in parallel using
+    `jobs` processes.  The order that files are added is taken to be their
+    load order.  `find_conflicts()` then returns a list of `Conflict`s.
+
+    Writes to overlapping attributes are also reported, so a mod which sets
+    `BalancedItems` will conflict with one which sets
+    `BalancedItems[2].Weight`.  Mesh and streaming hotfixes only ever add
+    objects, so they're not indexed.
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs
+        self.files = []
+        self.errors = {}
+        # Maps (kind, obj_name, row_name, attr_name) keys to lists of
+        # (file_index, obj_name, row_name, HotfixWrite) tuples
+        self.index = {}
+
+    def add_tree(self, path):
+        """
+        Adds all `.wlhotfix` files found underneath `path`, in sorted order.
+        Returns the number of files added.
+        """
+        filenames = []
+        for dirpath, dirnames, dir_filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(dir_filenames):
+                if filename.endswith('.wlhotfix'):
+                    filenames.append(os.path.join(dirpath, filename))
+        self.add_files(filenames)
+        return len(filenames)
+
+    def add_files(self, filenames):
+        """
+        Parses and indexes the given list of mod `filenames`, which are
+        appended to our load order.
+        """
+        file_indexes = {}
+        for filename in filenames:
+            file_indexes[filename] = len(self.files)
+            self.files.append(filename)
+        for results in self._map_parallel(_index_files, list(filenames)):
+            for filename, writes, error in results:
+                if error is not None:
+                    self.errors[filename] = error
+                    continue
+                file_idx = file_indexes[filename]
+                for key, values in writes.items():
+                    entries = self.index.setdefault(key, [])
+                    for obj_name, row_name, write in values:
+                        entries.append((file_idx, obj_name, row_name, write))
+
+    def _map_parallel(self, func, items, chunk_size=20):
+        """
+        Runs `func` over chunks of `items` in a pool of `jobs` worker
+        processes, yielding the results for each chunk (in no particular
+        order).  Falls back to running in-process if we only have one job, or
+        if we can't fork.
+        """
+        chunks = [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+        jobs = self.jobs
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        jobs = min(jobs, len(chunks))
+        if jobs <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            for chunk in chunks:
+                yield func(chunk)
+        else:
+            with multiprocessing.get_context('fork').Pool(jobs) as pool:
+                for result in pool.imap_unordered(func, chunks):
+                    yield result
+
+    def find_conflicts(self):
+        """
+        Returns a list of `Conflict`s, sorted by object/row/attribute name.
+        A conflict is only reported if at least two different mod files are
+        involved, and they don't all agree on the value.
+        """
+
+        # Figure out which keys have parent attributes in the index, so that
+        # writes to `Foo` get grouped in with writes to `Foo.Bar`.  Writes are
+        # grouped under the top-most attribute which was written to.
+        groups = {}
+        for key, entries in self.index.items():
+            kind, obj_key, row_key, attr_key = key
+            group_key = key
+            if kind == 'attr':
+                for parent in _attr_parents(attr_key):
+                    parent_key = (kind, obj_key, row_key, parent)
+                    if parent_key in self.index:
+                        group_key = parent_key
+                        break
+            groups.setdefault(group_key, []).extend(entries)
+
+        conflicts = []
+        for group_key, entries in groups.items():
+            if len(entries) < 2:
+                continue
+            file_idxs = set(e[0] for e in entries)
+            if len(file_idxs) < 2:
+                continue
+            if len(set((e[3].attr_name.lower(), e[3].new_val) for e in entries)) < 2:
+                continue
+            entries.sort(key=lambda e: (e[0], e[3].lineno))
+            main_entry = self.index.get(group_key, entries)[0]
+            conflicts.append(Conflict(main_entry[1],
+                main_entry[2],
+                main_entry[3].attr_name,
+                [e[3] for e in entries]))
+
+        conflicts.sort(key=lambda c: (c.obj_name.lower(), (c.row_name or '').lower(), c.attr_name.lower()))
+        return conflicts
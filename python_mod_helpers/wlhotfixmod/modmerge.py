@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import collections
+
+from wlhotfixmod.wlhotfixmod import Mod, RegHotfix, TableHotfix, MeshHotfix, StreamingHotfix, BytecodeHotfix
+from wlhotfixmod.modparser import parse_file, Tag, Unknown
+
+# Where a line in a merged mod came from.  `lineno` is the line number in the
+# merged mod, and `source_filename`/`source_lineno` point at the original.
+Provenance = collections.namedtuple('Provenance', [
+    'lineno',
+    'source_filename',
+    'source_lineno',
+    ])
+
+class ModMerger(object):
+    """
+    Merges a list of mod files (in load order) into a single mod, written out
+    via `Mod`.  Later hotfixes win: any hotfix which is completely overwritten
+    by a later one (from the same mod or a later mod) is dropped, using the
+    same rules as `Mod.compact()`.  Mesh and streaming hotfixes are always
+    kept, as are any `Spark*` lines we couldn't parse, since those might be
+    hotfixes which the parser doesn't understand.
+
+    The original mods' tags are always dropped (the merged mod gets its own
+    header, via `Mod`).  Comments, blank lines, and other unknown lines are
+    dropped unless `comments` is `True`, in which case they're kept, along
+    with a header comment marking where each source mod begins.
+
+    Usage is just `add_file()` for each mod, followed by `write()`.
+    """
+
+    hotfix_types = {RegHotfix, TableHotfix, MeshHotfix, StreamingHotfix, BytecodeHotfix}
+
+    def __init__(self, comments=False):
+        self.comments = comments
+        self.filenames = []
+        # List of `(filename, lineno, record)` tuples, in load order.  Records
+        # are either hotfix records or plain strings.  `filename` and `lineno`
+        # are only filled in for hotfixes (including unparsed lines), which
+        # are the only things we track provenance for.
+        self.entries = []
+
+    def add_file(self, filename):
+        """
+        Reads in the mod `filename`, adding its contents to the end of our
+        load order.  Returns the number of hotfixes read.
+        """
+        self.filenames.append(filename)
+        if self.comments:
+            self.entries.append((None, None, '###'))
+            self.entries.append((None, None, '### Merged from: {}'.format(filename)))
+            self.entries.append((None, None, '###'))
+            self.entries.append((None, None, ''))
+        count = 0
+        for lineno, record in parse_file(filename, linenos=True):
+            record_type = type(record)
+            if record_type in self.hotfix_types:
+                self.entries.append((filename, lineno, record))
+                count += 1
+            elif record_type == Unknown and record.line.startswith('Spark'):
+                self.entries.append((filename, lineno, record.line))
+                count += 1
+            elif record_type == Tag:
+                continue
+            elif self.comments:
+                self.entries.append((None, None, record.line))
+        if self.comments:
+            self.entries.append((None, None, ''))
+        return count
+
+    def write(self, filename, title, author, description, **mod_args):
+        """
+        Writes out the merged mod to `filename`.  `title`, `author`,
+        `description`, and any other keyword arguments are passed through to
+        `Mod`.  Returns a tuple of `(provenance, removed)`, where `provenance`
+        is a list of `Provenance` tuples for every hotfix (or unparsed line)
+        in the merged mod, and `removed` is the list of `CompactedHotfix` tuples from
+        `Mod.compact()`, describing the hotfixes which were dropped.
+        """
+        mod = Mod(filename, title, author, description, **mod_args)
+        sources = {}
+        for source_filename, source_lineno, record in self.entries:
+            if type(record) == str:
+                if record == '':
+                    mod.newline()
+                else:
+                    mod.raw_line(record)
+                    mod.last_was_newline = False
+            else:
+                mod.add_record(record)
+            if source_filename is not None:
+                sources[id(record)] = (source_filename, source_lineno, record)
+        removed = mod.compact()
+        mod.close()
+
+        provenance = []
+        for idx, record in enumerate(mod.records):
+            source = sources.get(id(record))
+            if source is not None and source[2] is record:
+                provenance.append(Provenance(idx+1, source[0], source[1]))
+        return (provenance, removed)
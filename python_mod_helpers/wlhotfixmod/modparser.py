@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# vim: set expandtab tabstop=4 shiftwidth=4:
+
+# Copyright 2023 Christopher J. Kucera
+# <cj@apocalyptech.com>
+# <http://apocalyptech.com/contact.php>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of the development team nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CJ KUCERA BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import gzip
+import collections
+
+from wlhotfixmod.wlhotfixmod import Mod, RegHotfix, TableHotfix, MeshHotfix, StreamingHotfix, BytecodeHotfix
+
+# Non-hotfix lines.  Each of these keeps the original `line` (minus its
+# trailing newline) so that they can be written back out exactly.
+
+class Tag(collections.namedtuple('Tag', ['name', 'value', 'line'])):
+    """
+    A BLIMP tag, such as `@title` (`name` will be `title`, without the `@`)
+    """
+    __slots__ = ()
+
+    def render(self):
+        return self.line
+
+class Comment(collections.namedtuple('Comment', ['line'])):
+    """
+    A comment line, starting with `#`
+    """
+    __slots__ = ()
+
+    def render(self):
+        return self.line
+
+class Blank(collections.namedtuple('Blank', ['line'])):
+    """
+    An empty (or whitespace-only) line
+    """
+    __slots__ = ()
+
+    def render(self):
+        return self.line
+
+class Unknown(collections.namedtuple('Unknown', ['line'])):
+    """
+    Any line we don't recognize, including hotfixes whose format we couldn't
+    parse.
+    """
+    __slots__ = ()
+
+    def render(self):
+        return self.line
+
+# Mapping of hotfix type names (`SparkPatchEntry`, etc) to our `Mod` constants
+TYPE_LOOKUP = {v: k for k, v in Mod.TYPE.items()}
+
+# Notification flags, as they appear in the hotfix prefix
+NOTIFY = {'0': False, '1': True}
+
+# Constructing our namedtuples via `tuple.__new__` skips the keyword-argument
+# handling of the generated `__new__`, which is a noticeable chunk of our
+# per-line cost.
+_new = tuple.__new__
+
+def _parse_hotfix(line):
+    """
+    Parses a hotfix `line`, returning one of the hotfix record types from
+    `wlhotfixmod` (`RegHotfix`, `TableHotfix`, etc).  Raises `ValueError`
+    (or `IndexError`/`KeyError`) if the line doesn't match the format that
+    `Mod` writes.
+    """
+
+    # Regular hotfixes are by far the most common, and only need this one
+    # split.  The other types get re-split as needed.
+    parts = line.split(',', 8)
+    if parts[1] != '(1':
+        raise ValueError('Unknown hotfix prefix')
+    hf_type = TYPE_LOOKUP[parts[0]]
+    code = parts[2]
+    notify = NOTIFY[parts[3]]
+    if code == '1':
+        prev_len = int(parts[7])
+        rest = parts[8]
+        if rest[prev_len] != ',':
+            raise ValueError('Previous-value length mismatch')
+        return _new(RegHotfix, (hf_type, notify, parts[4][:-1],
+                parts[5],
+                parts[6],
+                rest[:prev_len],
+                rest[prev_len+1:]))
+    elif code == '2':
+        parts = line.split(',', 9)
+        prev_len = int(parts[8])
+        rest = parts[9]
+        if rest[prev_len] != ',':
+            raise ValueError('Previous-value length mismatch')
+        return _new(TableHotfix, (hf_type, notify, parts[4][:-1],
+                parts[5],
+                parts[6],
+                parts[7],
+                rest[:prev_len],
+                rest[prev_len+1:]))
+    elif code == '6':
+        parts = line.split(',', 9)
+        coord_len = int(parts[8])
+        rest = parts[9]
+        if rest[0] != '"' or rest[coord_len+1:coord_len+3] != '",':
+            raise ValueError('Coordinate length mismatch')
+        transparent = rest[coord_len+3:]
+        if transparent != '0' and transparent != '1':
+            raise ValueError('Unknown transparency flag')
+        return _new(MeshHotfix, (hf_type, notify,
+                parts[5],
+                parts[4][:-1],
+                parts[6],
+                parts[7],
+                rest[1:coord_len+1],
+                transparent == '1'))
+    elif code == '11':
+        parts = line.split(',', 9)
+        coord_len = int(parts[8])
+        rest = parts[9]
+        if len(rest) != coord_len+2 or rest[0] != '"' or rest[-1] != '"':
+            raise ValueError('Coordinate length mismatch')
+        return _new(StreamingHotfix, (hf_type, notify,
+                parts[5],
+                parts[4][:-1],
+                parts[6],
+                parts[7],
+                rest[1:-1]))
+    elif code == '7':
+        parts = line.split(',', 10)
+        if parts[6] != '0' or parts[7] != '1':
+            raise ValueError('Unknown bytecode hotfix flags')
+        num_indexes = int(parts[9])
+        indexes = parts[10].split(',', num_indexes)
+        rest = indexes.pop()
+        from_len, rest = rest.split(':', 1)
+        from_len = int(from_len)
+        if rest[from_len] != ',':
+            raise ValueError('From-value length mismatch')
+        from_val = rest[:from_len]
+        to_len, to_val = rest[from_len+1:].split(':', 1)
+        if int(to_len) != len(to_val):
+            raise ValueError('To-value length mismatch')
+        return _new(BytecodeHotfix, (hf_type, notify, parts[4][:-1],
+                parts[5],
+                parts[8],
+                tuple(indexes),
+                from_val,
+                to_val))
+    else:
+        raise ValueError('Unknown hotfix type: {}'.format(code))
+
+def _line_chunks(df, chunk_size):
+    """
+    Generator which reads the open text file `df` in chunks of roughly
+    `chunk_size` characters, yielding lists of lines (without their line
+    endings).  Splitting a whole chunk at once is quite a bit faster than
+    iterating over the file line-by-line.
+    """
+    remainder = ''
+    while True:
+        chunk = df.read(chunk_size)
+        if not chunk:
+            break
+        if '\r' in chunk:
+            if chunk[-1] == '\r':
+                # Make sure we don't split a `\r\n` across chunks
+                chunk += df.read(1)
+            chunk = chunk.replace('\r\n', '\n')
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        yield lines
+    if remainder:
+        yield [remainder]
+
+def iter_records(df, linenos=False, chunk_size=4*1024*1024):
+    """
+    Generator which parses the open mod file `df` (or any other iterable of
+    lines) and yields a record for each line: `Tag`, `Comment`, `Blank`, or
+    `Unknown` for non-hotfix lines, and `RegHotfix`, `TableHotfix`,
+    `MeshHotfix`, `StreamingHotfix`, or `BytecodeHotfix` for hotfixes.  Every
+    record has a `render()` method which returns the original line (minus
+    its line ending), so writing them all back out reproduces the file.  If
+    `linenos` is `True`, yields tuples of `(lineno, record)` instead, with
+    one-based line numbers.
+
+    Tags are recognized either on their own (`@title Foo`) or inside comments
+    (`### @title Foo`), though commented tags are only recognized up until
+    the first hotfix, as per the BLIMP spec.  Files are read `chunk_size`
+    characters at a time, so arbitrarily large files can be parsed.
+    """
+    if hasattr(df, 'read'):
+        chunks = _line_chunks(df, chunk_size)
+    else:
+        chunks = ([line.rstrip('\r\n')] for line in df)
+    in_header = True
+    lineno = 0
+    for lines in chunks:
+        for line in lines:
+            lineno += 1
+            first = line[:1]
+            if first == 'S':
+                try:
+                    record = _parse_hotfix(line)
+                    in_header = False
+                except (ValueError, IndexError, KeyError):
+                    record = Unknown(line)
+            elif first == '#':
+                stripped = line.lstrip('#').strip()
+                if in_header and stripped[:1] == '@':
+                    record = _tag(stripped, line)
+                else:
+                    record = Comment(line)
+            elif first == '@':
+                record = _tag(line.strip(), line)
+            elif line.strip() == '':
+                record = Blank(line)
+            else:
+                record = Unknown(line)
+            if linenos:
+                yield (lineno, record)
+            else:
+                yield record
+
+def _tag(tag_text, line):
+    """
+    Constructs a `Tag` record from `tag_text` (which starts with `@`)
+    """
+    parts = tag_text[1:].split(None, 1)
+    if len(parts) == 0:
+        return Tag('', '', line)
+    elif len(parts) == 1:
+        return Tag(parts[0], '', line)
+    else:
+        return Tag(parts[0], parts[1], line)
+
+def parse_file(filename, linenos=False):
+    """
+    Generator which parses the mod file `filename` (which may be
+    gzip-compressed, if it ends in `.gz`).  See `iter_records()` for details.
+    """
+    if filename.endswith('.gz'):
+        df = gzip.open(filename, 'rt', encoding='utf-8', errors='surrogateescape', newline='')
+    else:
+        df = open(filename, encoding='utf-8', errors='surrogateescape', newline='')
+    with df:
+        yield from iter_records(df, linenos=linenos)
@@ -30,8 +30,12 @@
 import os
 import sys
 import gzip
+import re
 import struct
 import itertools
+import collections
+
+from wlhotfixmod import buildtrace
 
 class _StreamingBlueprintPosition:
     """
@@ -222,6 +226,88 @@ class _StreamingBlueprintHelper:
             self.positions = []
             self.mod.newline()
 
+class RegHotfix(collections.namedtuple('RegHotfix', [
+        'hf_type', 'notify', 'package', 'obj_name', 'attr_name', 'prev_val', 'new_val',
+        ])):
+    """
+    A regular (type 1) hotfix, as recorded by `Mod.reg_hotfix()`.  `obj_name`
+    is the full object name, and `new_val` has already been through
+    `Mod._process_value()`.
+    """
+
+    __slots__ = ()
+
+    def render(self):
+        return f'{Mod.TYPE[self.hf_type]},(1,1,{self.notify:d},{self.package}),{self.obj_name},{self.attr_name},{len(self.prev_val)},{self.prev_val},{self.new_val}'
+
+class TableHotfix(collections.namedtuple('TableHotfix', [
+        'hf_type', 'notify', 'package', 'obj_name', 'row_name', 'attr_name', 'prev_val', 'new_val',
+        ])):
+    """
+    A table (type 2) hotfix, as recorded by `Mod.table_hotfix()`
+    """
+
+    __slots__ = ()
+
+    def render(self):
+        return f'{Mod.TYPE[self.hf_type]},(1,2,{self.notify:d},{self.package}),{self.obj_name},{self.row_name},{self.attr_name},{len(self.prev_val)},{self.prev_val},{self.new_val}'
+
+class MeshHotfix(collections.namedtuple('MeshHotfix', [
+        'hf_type', 'notify', 'map_first', 'map_last', 'mesh_first', 'mesh_last', 'coord_field', 'transparent',
+        ])):
+    """
+    A SpawnMesh (type 6) hotfix, as recorded by `Mod.mesh_hotfix()`
+    """
+
+    __slots__ = ()
+
+    def render(self):
+        return f'{Mod.TYPE[self.hf_type]},(1,6,{self.notify:d},{self.map_last}),{self.map_first},{self.mesh_first},{self.mesh_last},{len(self.coord_field)},"{self.coord_field}",{self.transparent:d}'
+
+class StreamingHotfix(collections.namedtuple('StreamingHotfix', [
+        'hf_type', 'notify', 'map_first', 'map_last', 'obj_first', 'obj_last', 'coord_field',
+        ])):
+    """
+    A Streaming Blueprint (type 11) hotfix, as recorded by `Mod.streaming_hotfix()`
+    """
+
+    __slots__ = ()
+
+    def render(self):
+        return f'{Mod.TYPE[self.hf_type]},(1,11,{self.notify:d},{self.map_last}),{self.map_first},{self.obj_first},{self.obj_last},{len(self.coord_field)},"{self.coord_field}"'
+
+class BytecodeHotfix(collections.namedtuple('BytecodeHotfix', [
+        'hf_type', 'notify', 'package', 'obj_name', 'export_name', 'indexes', 'from_val', 'to_val',
+        ])):
+    """
+    A Blueprint Bytecode (type 7) hotfix, as recorded by `Mod.bytecode_hotfix()`.
+    `indexes` is a tuple of strings, and `from_val`/`to_val` are strings.
+    """
+
+    __slots__ = ()
+
+    def render(self):
+        return ','.join([
+            Mod.TYPE[self.hf_type],
+            f'(1,7,{self.notify:d},{self.package})',
+            self.obj_name,
+            '0',
+            '1',
+            self.export_name,
+            str(len(self.indexes)),
+            *self.indexes,
+            '{}:{}'.format(len(self.from_val), self.from_val),
+            '{}:{}'.format(len(self.to_val), self.to_val),
+            ])
+
+# A hotfix removed by `Mod.compact()`.  `reason` is either `duplicate` or
+# `superseded`, and `replaced_by` is the record which made it redundant.
+CompactedHotfix = collections.namedtuple('CompactedHotfix', [
+    'record',
+    'reason',
+    'replaced_by',
+    ])
+
 class Mod(object):
     """
     Helper class for writing hotfix-injection mods for WL
@@ -290,6 +376,14 @@ class Mod(object):
                 'https://creativecommons.org/publicdomain/zero/1.0/'),
             }
 
+    # Objects which `compact()` will never touch.  Our StaticMesh/Streaming
+    # Blueprint helpers set these temporarily just to get assets loaded, so
+    # the "superseded" values are actually important.
+    COMPACT_EXCLUDE = {
+            '/Game/Gear/Game/Resonator/_Design/BP_Eridian_Resonator.Default__BP_Eridian_Resonator_C',
+            '/Game/Pickups/Ammo/BPAmmoItem_Pistol.Default__BPAmmoItem_Pistol_C',
+            }
+
     def __init__(self, filename, title, author, description,
             v=None, lic=None, cats=None,
             ss=None, videos=None, urls=None,
@@ -299,9 +393,13 @@ class Mod(object):
             quiet_meshes=False, quiet_streaming=False,
             aggressive_streaming=False,
             comment_tags=False,
+            compact=False,
+            narrow_levels=None,
+            validate=None,
             ):
         """
-        Initializes ourselves and starts writing the mod.
+        Initializes ourselves and starts recording the mod.  Nothing is actually
+        written to `filename` until `close()` is called.
 
         First up, parameters which mostly just alter the mod header:
 
@@ -350,9 +448,19 @@ class Mod(object):
             either.  If `False`, the default, the tags will be printed on their
             own.  If `True`, the tags will be printed after the usual hashes.
             `True` more closely resembles the "old-style" tags we used to use.
+        `compact` - If `True`, redundant hotfixes will be removed when the mod
+            is closed, and a summary reported.  See `compact()` for details.
+        `narrow_levels` - If set, `MatchAll` level hotfixes will be rewritten
+            to target specific levels when the mod is closed, using this as the
+            `locate` function.  See `narrow_matchall()` for details.
+        `validate` - If set to a `WLData` object, all the objects targeted by
+            the mod's hotfixes will be checked when the mod is closed, and
+            warnings printed for any which look wrong.  See `validate_targets()`
+            for details.
 
         """
         self.filename = filename
+        buildtrace.record('output', os.path.realpath(filename))
         self.title = title
         self.author = author
         self.description = description
@@ -374,10 +482,19 @@ class Mod(object):
         self.quiet_streaming = quiet_streaming
         self.aggressive_streaming = aggressive_streaming
         self.comment_tags = comment_tags
+        self.compact_on_close = compact
+        self.narrow_levels = narrow_levels
+        self.validate = validate
 
         # Some vars to help out with type-11 (streaming blueprint) hotfixes
         self.streaming_helpers = {}
 
+        # Everything written to the mod is recorded here, and only rendered out
+        # to the file when we're closed.  Entries are either plain strings (for
+        # comments, blank lines, and the like), or one of our hotfix records
+        # (`RegHotfix`, `TableHotfix`, etc).
+        self.records = []
+
         self.source = os.path.basename(sys.argv[0])
 
         if self.filename.endswith('.gz'):
@@ -391,33 +508,33 @@ class Mod(object):
             comment_prefix = '### '
         else:
             comment_prefix = ''
-        print(comment_prefix.strip(), file=self.df)
-        print(f'{comment_prefix}@title {self.title}', file=self.df)
+        self.records.append(comment_prefix.strip())
+        self.records.append(f'{comment_prefix}@title {self.title}')
         if self.version is not None:
-            print(f'{comment_prefix}@version {self.version}', file=self.df)
-        print(f'{comment_prefix}@author {self.author}', file=self.df)
+            self.records.append(f'{comment_prefix}@version {self.version}')
+        self.records.append(f'{comment_prefix}@author {self.author}')
         if self.contact:
-            print(f'{comment_prefix}@contact {self.contact}', file=self.df)
+            self.records.append(f'{comment_prefix}@contact {self.contact}')
         if self.contact_email:
-            print(f'{comment_prefix}@contact-email {self.contact_email}', file=self.df)
+            self.records.append(f'{comment_prefix}@contact-email {self.contact_email}')
         if self.contact_discord:
-            print(f'{comment_prefix}@contact-discord {self.contact_discord}', file=self.df)
+            self.records.append(f'{comment_prefix}@contact-discord {self.contact_discord}')
         if self.homepage:
-            print(f'{comment_prefix}@homepage {self.homepage}', file=self.df)
+            self.records.append(f'{comment_prefix}@homepage {self.homepage}')
         if self.categories:
             if type(self.categories) == list:
-                print('{}@categories {}'.format(comment_prefix, ', '.join(self.categories)), file=self.df)
+                self.records.append('{}@categories {}'.format(comment_prefix, ', '.join(self.categories)))
             else:
-                print(f'{comment_prefix}@categories {self.categories}', file=self.df)
-        print(comment_prefix.strip(), file=self.df)
+                self.records.append(f'{comment_prefix}@categories {self.categories}')
+        self.records.append(comment_prefix.strip())
 
         # Pakfile, if we have it
         if self.pakfile is not None:
             if type(self.pakfile) == str:
                 self.pakfile = [self.pakfile]
             for pakfile in self.pakfile:
-                print(f'{comment_prefix}@pakfile {pakfile}', file=self.df)
-            print(comment_prefix.strip(), file=self.df)
+                self.records.append(f'{comment_prefix}@pakfile {pakfile}')
+            self.records.append(comment_prefix.strip())
 
         # Process license information, if it's been specified (complaint to the user
         # if it hasn't!)
@@ -441,11 +558,11 @@ class Mod(object):
         else:
             if self.lic in Mod.LIC_INFO:
                 lic_name, lic_url = Mod.LIC_INFO[self.lic]
-                print(f'{comment_prefix}@license {lic_name}', file=self.df)
-                print(f'{comment_prefix}@license-url {lic_url}', file=self.df)
+                self.records.append(f'{comment_prefix}@license {lic_name}')
+                self.records.append(f'{comment_prefix}@license-url {lic_url}')
             else:
-                print(f'{comment_prefix}@license {self.lic}', file=self.df)
-            print(comment_prefix.strip(), file=self.df)
+                self.records.append(f'{comment_prefix}@license {self.lic}')
+            self.records.append(comment_prefix.strip())
 
         # Media links
         if ss or videos or urls or nexus:
@@ -453,35 +570,35 @@ class Mod(object):
                 if type(ss) != list:
                     ss = [ss]
                 for shot in ss:
-                    print(f'{comment_prefix}@screenshot {shot}', file=self.df)
+                    self.records.append(f'{comment_prefix}@screenshot {shot}')
             if videos:
                 if type(videos) != list:
                     videos = [videos]
                 for video in videos:
-                    print(f'{comment_prefix}@video {video}', file=self.df)
+                    self.records.append(f'{comment_prefix}@video {video}')
             if urls:
                 if type(urls) != list:
                     urls = [urls]
                 for url in urls:
-                    print(f'{comment_prefix}@url {url}', file=self.df)
+                    self.records.append(f'{comment_prefix}@url {url}')
             if nexus:
-                print(f'{comment_prefix}@nexus {nexus}', file=self.df)
-            print(comment_prefix.strip(), file=self.df)
+                self.records.append(f'{comment_prefix}@nexus {nexus}')
+            self.records.append(comment_prefix.strip())
 
         # Now continue on (basically just the description from here on out)
         if self.comment_tags:
-            print('', file=self.df)
-        print('###', file=self.df)
+            self.records.append('')
+        self.records.append('###')
         for desc in self.description:
             if desc == '':
-                print('###', file=self.df)
+                self.records.append('###')
             else:
-                print('### {}'.format(desc), file=self.df)
+                self.records.append('### {}'.format(desc))
         if len(self.description) > 0:
-            print('###', file=self.df)
-        print('### Generated by {}'.format(self.source), file=self.df)
-        print('###', file=self.df)
-        print('', file=self.df)
+            self.records.append('###')
+        self.records.append('### Generated by {}'.format(self.source))
+        self.records.append('###')
+        self.records.append('')
 
     @staticmethod
     def get_full(object_name, data_type=None):
@@ -489,12 +606,9 @@ class Mod(object):
         Gets the "full" object name from one whose full reference just repeats the
         last component.
         """
-        expanded_obj = '{}.{}'.format(object_name, object_name.split('/')[-1])
+        expanded_obj = f'{object_name}.{object_name.rsplit("/", 1)[-1]}'
         if data_type:
-            return '{}\'"{}"\''.format(
-                    data_type,
-                    expanded_obj,
-                    )
+            return f'{data_type}\'"{expanded_obj}"\''
         else:
             return expanded_obj
 
@@ -523,7 +637,7 @@ class Mod(object):
         """
         Writes a newline to the mod fil
         """
-        print('', file=self.df)
+        self.records.append('')
         self.last_was_newline = True
 
     def comment(self, comment_str, weight=1):
@@ -532,9 +646,9 @@ class Mod(object):
         """
         stripped = comment_str.strip()
         if len(stripped) > 0:
-            print('{} {}'.format('#'*weight, stripped), file=self.df)
+            self.records.append('{} {}'.format('#'*weight, stripped))
         else:
-            print('{}'.format('#'*weight), file=self.df)
+            self.records.append('#'*weight)
         self.last_was_newline = False
 
     def header_lines(self, lines):
@@ -558,54 +672,51 @@ class Mod(object):
         Processes the new value given to a hotfix so that it's valid in the exported
         JSON
         """
-        return ''.join([l.strip() for l in str(value).splitlines()])
+        lines = str(value).splitlines()
+        if len(lines) == 1:
+            # By far the most common case; skip building a new list
+            return lines[0].strip()
+        return ''.join([l.strip() for l in lines])
 
     def raw_line(self, line):
         """
         Outputs the line to the modfile entirely as-written.  Could be useful to support hotfix types
         which haven't been added into the library yet.
         """
-        print(line, file=self.df)
+        self.records.append(str(line))
+
+    def add_record(self, record):
+        """
+        Adds an already-constructed hotfix record (`RegHotfix`, `TableHotfix`,
+        etc) to the mod, such as one read in from another mod by `modparser`.
+        The record is written out as-is.
+        """
+        self.records.append(record)
+        self.last_was_newline = False
 
     def reg_hotfix(self, hf_type, package, obj_name, attr_name, new_val, prev_val='', notify=False):
         """
         Writes a regular hotfix to the mod file
         """
-        if notify:
-            notification_flag=1
-        else:
-            notification_flag=0
-        print('{hf_type},(1,1,{notification_flag},{package}),{obj_name},{attr_name},{prev_val_len},{prev_val},{new_val}'.format(
-            hf_type=Mod.TYPE[hf_type],
-            notification_flag=notification_flag,
-            package=package,
-            obj_name=Mod.get_full_cond(obj_name),
-            attr_name=attr_name,
-            prev_val_len=len(prev_val),
-            prev_val=prev_val,
-            new_val=self._process_value(new_val),
-            ), file=self.df)
+        self.records.append(RegHotfix(hf_type, bool(notify), package,
+            Mod.get_full_cond(obj_name),
+            attr_name,
+            prev_val,
+            self._process_value(new_val),
+            ))
         self.last_was_newline = False
 
     def table_hotfix(self, hf_type, package, obj_name, row_name, attr_name, new_val, prev_val='', notify=False):
         """
         Writes a regular hotfix to the mod file
         """
-        if notify:
-            notification_flag=1
-        else:
-            notification_flag=0
-        print('{hf_type},(1,2,{notification_flag},{package}),{obj_name},{row_name},{attr_name},{prev_val_len},{prev_val},{new_val}'.format(
-            hf_type=Mod.TYPE[hf_type],
-            notification_flag=notification_flag,
-            package=package,
-            obj_name=Mod.get_full_cond(obj_name),
-            row_name=row_name,
-            attr_name=attr_name,
-            prev_val_len=len(prev_val),
-            prev_val=prev_val,
-            new_val=self._process_value(new_val),
-            ), file=self.df)
+        self.records.append(TableHotfix(hf_type, bool(notify), package,
+            Mod.get_full_cond(obj_name),
+            row_name,
+            attr_name,
+            prev_val,
+            self._process_value(new_val),
+            ))
         self.last_was_newline = False
 
     def _reset_meshes(self):
@@ -725,12 +836,6 @@ class Mod(object):
         if ensure:
             self._ensure_mesh(mesh_path, hf_type, map_last)
 
-        # Notify flag
-        if notify:
-            notification_flag=1
-        else:
-            notification_flag=0
-
         # Coordinates/transforms
         coord_parts = []
         for coords in [location, rotation, scale]:
@@ -739,23 +844,14 @@ class Mod(object):
                 ]))
         coord_field = '|'.join(coord_parts)
 
-        # Transparent-or-visible
-        if transparent:
-            transparent_flag = 1
-        else:
-            transparent_flag = 0
-
-        print('{hf_type},(1,6,{notification_flag},{map_last}),{map_first},{mesh_first},{mesh_last},{coord_len},"{coord_field}",{transparent_flag}'.format(
-            hf_type=Mod.TYPE[hf_type],
-            notification_flag=notification_flag,
-            map_first=map_first,
-            map_last=map_last,
-            mesh_first=mesh_first,
-            mesh_last=mesh_last,
-            coord_len=len(coord_field),
-            coord_field=coord_field,
-            transparent_flag=transparent_flag,
-            ), file=self.df)
+        self.records.append(MeshHotfix(hf_type, bool(notify),
+            map_first,
+            map_last,
+            mesh_first,
+            mesh_last,
+            coord_field,
+            bool(transparent),
+            ))
 
     def streaming_hotfix(self, map_path, obj_path,
             index=None,
@@ -803,12 +899,6 @@ class Mod(object):
         # Object path
         obj_first, obj_last = obj_path.rsplit('/', 1)
 
-        # Notify flag
-        if notify:
-            notification_flag=1
-        else:
-            notification_flag=0
-
         # Coordinates/transforms - these values are actually ignored by type-11 hotfixes, so
         # we're just putting in the defaults, to make that more obvious to anyone looking
         # at the mod file
@@ -820,16 +910,13 @@ class Mod(object):
         coord_field = '|'.join(coord_parts)
 
         # First the hotfix to add it to the map
-        print('{hf_type},(1,11,{notification_flag},{map_last}),{map_first},{obj_first},{obj_last},{coord_len},"{coord_field}"'.format(
-            hf_type=Mod.TYPE[Mod.EARLYLEVEL],
-            notification_flag=notification_flag,
-            map_first=map_first,
-            map_last=map_last,
-            obj_first=obj_first,
-            obj_last=obj_last,
-            coord_len=len(coord_field),
-            coord_field=coord_field,
-            ), file=self.df)
+        self.records.append(StreamingHotfix(Mod.EARLYLEVEL, bool(notify),
+            map_first,
+            map_last,
+            obj_first,
+            obj_last,
+            coord_field,
+            ))
 
         # Get our _StreamingBlueprintHelper (or create a new one)
         map_lower = map_last.lower()
@@ -897,28 +984,17 @@ class Mod(object):
         """
         if '.' not in obj_name:
             obj_name = self.get_full_cond(obj_name) + '_C'
-        if notify:
-            notification_flag=1
-        else:
-            notification_flag=0
         if type(index) == list:
-            indexes = [str(i) for i in index]
+            indexes = tuple([str(i) for i in index])
         else:
-            indexes = [str(index)]
-        from_val = str(from_val)
-        to_val = str(to_val)
-        print(','.join([
-            Mod.TYPE[hf_type],
-            f'(1,7,{notification_flag},{package})',
+            indexes = (str(index),)
+        self.records.append(BytecodeHotfix(hf_type, bool(notify), package,
             obj_name,
-            '0',
-            '1',
             export_name,
-            str(len(indexes)),
-            *indexes,
-            '{}:{}'.format(len(from_val), from_val),
-            '{}:{}'.format(len(to_val), to_val),
-            ]), file=self.df)
+            indexes,
+            str(from_val),
+            str(to_val),
+            ))
         self.last_was_newline = False
 
     def _guid_to_ints(self, guid):
@@ -983,6 +1059,259 @@ class Mod(object):
             if not self.last_was_newline:
                 self.newline()
 
+    @staticmethod
+    def _compact_keys(record):
+        """
+        Returns a tuple of `(group, key, conditional)` for `record`, for use
+        by `compact()`.  `group` identifies the object being hotfixed (and
+        when), `key` identifies the specific attribute within that, and
+        `conditional` is `True` if the hotfix only applies when the current
+        value matches.  Returns `None` for records which can't be compacted.
+        """
+        record_type = type(record)
+        if record_type == RegHotfix:
+            return ((record.hf_type, record.package, record.obj_name),
+                    (1, record.attr_name),
+                    record.prev_val != '')
+        elif record_type == TableHotfix:
+            return ((record.hf_type, record.package, record.obj_name),
+                    (2, record.row_name, record.attr_name),
+                    record.prev_val != '')
+        elif record_type == BytecodeHotfix:
+            return ((record.hf_type, record.package, record.obj_name),
+                    (7, record.export_name, record.indexes),
+                    True)
+        else:
+            return None
+
+    def compact(self):
+        """
+        Removes redundant hotfixes from the records we've got so far, and
+        returns a list of `CompactedHotfix` tuples describing what was removed.
+        Two kinds of hotfixes are removed:
+
+          * Unconditional (no `prev_val`) regular/table hotfixes which are
+            later overwritten by another unconditional hotfix with the same
+            type, package, object, and attribute (and row), so long as there
+            are no conditional hotfixes on that object in between (whose
+            outcome might depend on the earlier value).  These are reported
+            as `superseded` (or `duplicate`, if the later hotfix is identical).
+          * Conditional hotfixes (including bytecode hotfixes) which exactly
+            repeat the previous hotfix on that object, and are therefore
+            no-ops.  These are reported as `duplicate`.
+
+        This assumes that the only effect of a hotfix is the value it leaves
+        behind, which won't be true for hotfixes used to force assets to load
+        (our own helper hotfixes for that are excluded via `COMPACT_EXCLUDE`).
+        Mesh and Streaming Blueprint additions are never touched.  Comments
+        are left alone, even if the hotfixes they describe are removed.
+        """
+        removed = {}
+
+        # First pass, forwards: repeated conditional hotfixes
+        last_in_group = {}
+        for idx, record in enumerate(self.records):
+            keys = self._compact_keys(record)
+            if keys is None or record.obj_name in Mod.COMPACT_EXCLUDE:
+                continue
+            group, key, conditional = keys
+            if conditional and last_in_group.get(group) == record:
+                removed[idx] = CompactedHotfix(record, 'duplicate', last_in_group[group])
+            else:
+                last_in_group[group] = record
+
+        # Second pass, backwards: superseded unconditional hotfixes
+        later_writes = {}
+        for idx in range(len(self.records)-1, -1, -1):
+            if idx in removed:
+                continue
+            record = self.records[idx]
+            keys = self._compact_keys(record)
+            if keys is None or record.obj_name in Mod.COMPACT_EXCLUDE:
+                continue
+            group, key, conditional = keys
+            if conditional:
+                # Earlier values in this group might matter to this hotfix
+                later_writes.pop(group, None)
+                continue
+            group_writes = later_writes.setdefault(group, {})
+            if key in group_writes:
+                later = group_writes[key]
+                if later == record:
+                    reason = 'duplicate'
+                else:
+                    reason = 'superseded'
+                removed[idx] = CompactedHotfix(record, reason, later)
+            else:
+                group_writes[key] = record
+
+        if removed:
+            self.records = [r for idx, r in enumerate(self.records) if idx not in removed]
+        return [removed[idx] for idx in sorted(removed.keys())]
+
+    def narrow_matchall(self, locate, max_levels=5):
+        """
+        Rewrites `MatchAll` level hotfixes (`LEVEL` and `EARLYLEVEL`
+        regular/table hotfixes) so that they only target the levels where the
+        hotfixed object can actually be loaded, so the game doesn't have to
+        re-apply them on every level load.  `locate` is a function which takes
+        an object name and returns a collection of level names (such as
+        `Intro_P`), or `None` if the levels aren't known -- the
+        `wldata.levellocator.LevelLocator` class can be used for this.
+        Hotfixes whose objects show up in more than `max_levels` levels are
+        left alone, since at that point the extra hotfixes aren't worth it.
+
+        Each narrowed hotfix is replaced with one hotfix per level, in level
+        name order.  Returns the number of hotfixes which were narrowed.
+        """
+        located = {}
+        new_records = []
+        narrowed = 0
+        for record in self.records:
+            record_type = type(record)
+            if (record_type == RegHotfix or record_type == TableHotfix) \
+                    and (record.hf_type == Mod.LEVEL or record.hf_type == Mod.EARLYLEVEL) \
+                    and record.package.lower() == 'matchall':
+                if record.obj_name not in located:
+                    levels = locate(record.obj_name)
+                    if levels is not None:
+                        levels = sorted(levels)
+                    located[record.obj_name] = levels
+                levels = located[record.obj_name]
+                if levels and len(levels) <= max_levels:
+                    for level in levels:
+                        new_records.append(record._replace(package=level))
+                    narrowed += 1
+                    continue
+            new_records.append(record)
+        self.records = new_records
+        return narrowed
+
+    @staticmethod
+    def _path_problem(obj_name):
+        """
+        Checks a hotfix target `obj_name` for obvious problems which don't
+        need any data to spot.  Returns a description of the problem, or
+        `None`.
+        """
+        if not obj_name.startswith('/'):
+            return 'Not an absolute object path'
+        if obj_name != obj_name.strip() or ' ' in obj_name:
+            return 'Object path contains whitespace'
+        if '//' in obj_name:
+            return 'Object path contains an empty component'
+        return None
+
+    @staticmethod
+    def _export_name(obj_name):
+        """
+        Returns the top-level export name referenced by `obj_name` (the part
+        after the package name, up to any further `.` or `:`), or `None` if
+        the object name has no subobject, or uses one of the names every
+        package is expected to provide (`Foo`, `Foo_C`, or `Default__Foo_C`
+        for a package `/Game/.../Foo`), which we don't bother looking up.
+        """
+        if '.' not in obj_name:
+            return None
+        package, subobject = obj_name.split('.', 1)
+        export_name = re.split(r'[.:]', subobject, 1)[0]
+        short_name = package.rsplit('/', 1)[-1].lower()
+        if export_name.lower() in {short_name,
+                f'{short_name}_c',
+                f'default__{short_name}',
+                f'default__{short_name}_c'}:
+            return None
+        return export_name
+
+    def validate_targets(self, data):
+        """
+        Checks all the objects targeted by our hotfixes (including the maps,
+        meshes, and blueprints used by mesh and streaming hotfixes), and
+        returns a list of `(obj_name, problem)` tuples for any which look
+        wrong: either the object doesn't exist according to `data` (a
+        `WLData` object), or it names an export which its package doesn't
+        have.  `Mod.ADDED` hotfixes are skipped, since their targets are
+        relative to the level they're added to.  Each unique object is only
+        checked once, and the existence checks are done in bulk via
+        `WLData.objects_exist()`.  Packages are only loaded to check export
+        names which aren't the usual `Foo`/`Foo_C`/`Default__Foo_C` ones, and
+        if a package's serialization isn't available, its exports aren't
+        checked.  Only `/Game/` objects are checked.
+        """
+        targets = set()
+        for record in self.records:
+            record_type = type(record)
+            if record_type == RegHotfix or record_type == TableHotfix or record_type == BytecodeHotfix:
+                if record.hf_type != Mod.ADDED:
+                    targets.add(record.obj_name)
+            elif record_type == MeshHotfix:
+                targets.add(f'{record.map_first}/{record.map_last}')
+                targets.add(f'{record.mesh_first}/{record.mesh_last}')
+            elif record_type == StreamingHotfix:
+                targets.add(f'{record.map_first}/{record.map_last}')
+                targets.add(f'{record.obj_first}/{record.obj_last}')
+        targets.discard('None')
+
+        problems = []
+        packages = {}
+        for obj_name in targets:
+            problem = Mod._path_problem(obj_name)
+            if problem is not None:
+                problems.append((obj_name, problem))
+            else:
+                package = obj_name.split('.', 1)[0]
+                if package.startswith('/Game/'):
+                    packages.setdefault(package, []).append(obj_name)
+        existing = data.objects_exist(packages.keys())
+        for package, obj_names in packages.items():
+            if package not in existing:
+                for obj_name in obj_names:
+                    problems.append((obj_name, 'Object not found'))
+                continue
+            to_check = [(obj_name, Mod._export_name(obj_name)) for obj_name in obj_names]
+            to_check = [(obj_name, export_name) for obj_name, export_name in to_check if export_name is not None]
+            if not to_check:
+                continue
+            exports = data.get_data(package)
+            if not exports:
+                continue
+            export_names = {export.get('_jwp_object_name', '').lower() for export in exports}
+            for obj_name, export_name in to_check:
+                if export_name.lower() not in export_names:
+                    problems.append((obj_name, f'Export {export_name} not found in package'))
+        problems.sort()
+        return problems
+
+    def render_records(self):
+        """
+        Generator which yields each line of the mod, as rendered from our
+        recorded contents.
+        """
+        for record in self.records:
+            if type(record) == str:
+                yield record
+            else:
+                yield record.render()
+
+    def write_records(self, df, chunk_size=10000):
+        """
+        Writes our rendered contents to the open file `df`, in chunks of
+        `chunk_size` lines.
+        """
+        lines = []
+        for record in self.records:
+            if type(record) == str:
+                lines.append(record)
+            else:
+                lines.append(record.render())
+            if len(lines) >= chunk_size:
+                lines.append('')
+                df.write('\n'.join(lines))
+                lines = []
+        if lines:
+            lines.append('')
+            df.write('\n'.join(lines))
+
     def close(self):
         """
         Closes us out
@@ -999,8 +1328,34 @@ class Mod(object):
         # See if we have any streaming blueprint (type 11) hotfixes to finish
         self.finish_streaming()
 
-        # Now close out and report
+        # Check our hotfix targets, if we've been told to
+        if self.validate is not None:
+            for obj_name, problem in self.validate_targets(self.validate):
+                print('WARNING: {}: {}'.format(problem, obj_name))
+
+        # Narrow down MatchAll hotfixes, if we've been told to
+        if self.narrow_levels is not None:
+            narrowed = self.narrow_matchall(self.narrow_levels)
+            if narrowed:
+                print('Narrowed {} MatchAll hotfix{} to specific levels'.format(
+                    narrowed,
+                    '' if narrowed == 1 else 'es',
+                    ))
+
+        # Remove redundant hotfixes, if we've been told to
+        if self.compact_on_close:
+            removed = self.compact()
+            if removed:
+                print('Compacted mod: removed {} duplicate and {} superseded hotfix{}'.format(
+                    sum(1 for r in removed if r.reason == 'duplicate'),
+                    sum(1 for r in removed if r.reason == 'superseded'),
+                    '' if len(removed) == 1 else 'es',
+                    ))
+
+        # Now render everything out, close, and report
+        self.write_records(self.df)
         self.df.close()
+        buildtrace.record_modules()
         print('Wrote mod to {}'.format(self.filename))
 
     @staticmethod
@@ -1021,9 +1376,11 @@ class DataTableValue(object):
     Class to make dealing with datatable values (inside BVC tuples) easier
     """
 
+    __slots__ = ('table', 'row', 'value')
+
     def __init__(self, table=None, row='', value=''):
         if table:
-            self.table = table
+            self.table = sys.intern(table)
         else:
             self.table = 'None'
         self.row = row
@@ -1036,6 +1393,10 @@ class DataTableValue(object):
                 self.value,
                 )
 
+# An "empty" DataTableValue which gets shared by every BVC which doesn't
+# specify one.  Don't alter its attributes!
+_EMPTY_DTV = DataTableValue()
+
 class BVC(object):
     """
     Class to make dealing with BVC tuples/structures/whatever a bit easier.  By
@@ -1045,26 +1406,53 @@ class BVC(object):
     you're overwriting an existing tuple and want to be sure to reset all
     attributes).
 
+    When loading in every balance in the game, we end up with millions of these
+    (mostly with nothing but a BaseValueConstant), so the class uses `__slots__`,
+    and `from_data_struct()` and `Part` hand out shared instances (via `shared()`)
+    for the trivial ones.  Treat BVC objects as read-only once they've been
+    handed to a Part -- assign a new BVC instead of altering one in-place.
+
     Very arguably this should exist in wldata instead of wlhotfixmod...
     """
 
+    __slots__ = ('full', 'bvc', 'dtv', 'bva', 'ai', 'bvs')
+
+    # Cache of shared trivial instances; see `shared()`
+    _shared = {}
+
     def __init__(self, bvc=1, dtv=None, bva=None, ai=None, bvs=1, full=False):
         self.full = full
         self.bvc = bvc
         if dtv:
             self.dtv = dtv
         else:
-            self.dtv = DataTableValue()
+            self.dtv = _EMPTY_DTV
         if bva:
-            self.bva = bva
+            self.bva = sys.intern(bva)
         else:
             self.bva = 'None'
         if ai:
-            self.ai = ai
+            self.ai = sys.intern(ai)
         else:
             self.ai = 'None'
         self.bvs = bvs
 
+    @staticmethod
+    def shared(bvc=1, bvs=1):
+        """
+        Returns a shared BVC instance which only has a BaseValueConstant and
+        BaseValueScale (which is what the vast majority of part weights look
+        like).  The type of the values is part of the cache key, since `1` and
+        `1.0` format differently in hotfixes.
+        """
+        key = (type(bvc), bvc, type(bvs), bvs)
+        try:
+            return BVC._shared[key]
+        except KeyError:
+            new_bvc = BVC(bvc=bvc, bvs=bvs)
+            BVC._shared[key] = new_bvc
+            return new_bvc
+
     @staticmethod
     def from_data_struct(data, cur_dt=None):
         """
@@ -1119,6 +1507,10 @@ class BVC(object):
         else:
             bvs = 1
 
+        # Most weights are just plain constants; share those.
+        if dtv is None and bva is None and ai is None:
+            return BVC.shared(bvc=bvc, bvs=bvs)
+
         return BVC(bvc=bvc,
                 dtv=dtv,
                 bva=bva,
@@ -1157,6 +1549,8 @@ class BVCF(BVC):
     Very arguably this should exist in wldata instead of wlhotfixmod...
     """
 
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super().__init__(full=True, **kwargs)
 
@@ -1285,18 +1679,35 @@ class ItemPool(object):
 class Part(object):
     """
     Class to hold info about a single Part for an item/weapon.  Just the object name
-    and its weight, basically a glorified dict.
+    and its weight, basically a glorified dict.  Object names are interned, since
+    the same parts show up in a great many balances.
 
     Very arguably this should exist in wldata instead of wlhotfixmod...
     """
 
+    __slots__ = ('part_name', 'weight', '_short_name')
+
     def __init__(self, part_name, weight=1):
-        self.part_name = part_name
-        self.short_name = part_name.split('/')[-1]
+        self.part_name = sys.intern(part_name)
+        self._short_name = None
         if type(weight) == BVC or type(weight) == BVCF:
             self.weight = weight
         else:
-            self.weight = BVC(bvc=weight)
+            self.weight = BVC.shared(bvc=weight)
+
+    @property
+    def short_name(self):
+        """
+        The last path component of our part name (computed on-demand, unless
+        it's been explicitly set)
+        """
+        if self._short_name is None:
+            return self.part_name.split('/')[-1]
+        return self._short_name
+
+    @short_name.setter
+    def short_name(self, value):
+        self._short_name = value
 
     def __str__(self):
         return '(PartData={},Weight={})'.format(
@@ -1313,6 +1724,10 @@ class PartCategory(object):
     Very arguably this should exist in wldata instead of wlhotfixmod...
     """
 
+    __slots__ = ('num_min', 'num_max', 'index', 'part_type_enum',
+            'select_multiple', 'use_weight_with_mult', 'enabled',
+            'has_expansion', 'is_expansion', 'partlist')
+
     def __init__(self, num_min=1, num_max=1,
             index=0,
             partlist=None,
@@ -1325,7 +1740,10 @@ class PartCategory(object):
         self.num_min = num_min
         self.num_max = num_max
         self.index = index
-        self.part_type_enum = part_type_enum
+        if part_type_enum:
+            self.part_type_enum = sys.intern(part_type_enum)
+        else:
+            self.part_type_enum = part_type_enum
         self.select_multiple = select_multiple
         if num_min > 1 or num_max > 1 or num_min != num_max:
             self.select_multiple = True
@@ -1786,32 +2204,36 @@ class Balance(object):
                     'PartLists',
                     '({})'.format(','.join([str(c) for c in self.partset_expansion.categories])))
 
-    def hotfix_balance_full(self, mod, hf_type=Mod.PATCH, hf_package=''):
+    def runtime_partlist_values(self):
         """
-        Generates hotfixes to completely set the Balance portion.
+        Returns a tuple containing the hotfix values for our
+        `RuntimePartList.PartTypeTOC` and `RuntimePartList.AllParts`
+        attributes.  Both are built in a single pass through our categories,
+        without assembling an intermediate combined PartCategory.
         """
-
-        # Generate the TOC
         cur_idx = 0
         toc = []
+        all_parts = []
         for cat in self.categories:
-            toc.append((cur_idx, len(cat)))
-            cur_idx += len(cat)
+            num_parts = len(cat)
+            toc.append('(StartIndex={},NumParts={})'.format(cur_idx, num_parts))
+            all_parts.extend([str(p) for p in cat.partlist])
+            cur_idx += num_parts
+        return ('({})'.format(','.join(toc)), '({})'.format(','.join(all_parts)))
+
+    def hotfix_balance_full(self, mod, hf_type=Mod.PATCH, hf_package=''):
+        """
+        Generates hotfixes to completely set the Balance portion.
+        """
+        toc, all_parts = self.runtime_partlist_values()
         mod.reg_hotfix(hf_type, hf_package,
                 self.bal_name,
                 'RuntimePartList.PartTypeTOC',
-                '({})'.format(
-                    ','.join([
-                        '(StartIndex={},NumParts={})'.format(t[0], t[1]) for t in toc
-                        ])
-                    ))
-
-        # Now the AllParts list
-        all_parts = sum(self.categories)
+                toc)
         mod.reg_hotfix(hf_type, hf_package,
                 self.bal_name,
                 'RuntimePartList.AllParts',
-                '({})'.format(','.join([str(p) for p in all_parts.partlist])))
+                all_parts)
 
     def hotfix_full(self, mod, hf_type=Mod.PATCH, hf_package=''):
         """
@@ -1823,6 +2245,25 @@ class Balance(object):
             # the sorts of things we're handling in this class.
             self.hotfix_balance_full(mod, hf_type, hf_package)
 
+    @staticmethod
+    def hotfix_many(mod, balances, hf_type=Mod.PATCH, hf_package='', partsets=True):
+        """
+        Generates full hotfixes for each Balance in the iterable `balances`,
+        writing them into `mod` as they're generated, so that bulk tools can
+        emit a large number of Balances without holding them all in memory.
+        If `partsets` is `False`, only the Balance portion of each object will
+        be hotfixed (as with `hotfix_balance_full`), regardless of PartSet
+        expansions.  Returns the number of Balances processed.
+        """
+        count = 0
+        for bal in balances:
+            if partsets:
+                bal.hotfix_full(mod, hf_type, hf_package)
+            else:
+                bal.hotfix_balance_full(mod, hf_type, hf_package)
+            count += 1
+        return count
+
 class DependencyExpansion:
     """
     A representation of the InventoryExcludersExpansionData objects introduced